@@ -0,0 +1,365 @@
+"""Wsadowe tłumaczenie plików PDF bez interfejsu (np. nocne przetwarzanie archiwum skanów).
+
+Przykłady:
+    OPENROUTER_API_KEY=... python batch_translate.py skany/ -o wyniki/ --source eng --target Polish
+    python batch_translate.py lista.jsonl -o wyniki/ --formats md docx pdf --jobs 4
+    python batch_translate.py skany/ -o wyniki/ --formats md bilingual   # PDF dwujęzyczny w układzie oryginału
+
+Wejście to katalog (pliki *.pdf), pojedyncze pliki PDF albo manifest: plik tekstowy
+z jedną ścieżką na linię lub JSONL z obiektami {"path", "pages", "source", "target"}.
+
+Dla każdego pliku obok wyników zapisywany jest punkt kontrolny <nazwa>.checkpoint.json
+(strony do PDF dwujęzycznego - w osobnym pliku <nazwa>.bilingual-pages.jsonl).
+Po przerwaniu wystarczy uruchomić to samo polecenie ponownie: gotowe pliki są pomijane,
+a przetłumaczone, lecz niewyeksportowane - tylko eksportowane. Plik przerwany w trakcie
+tłumaczenia jest przetwarzany od nowa, ale strony i segmenty zrobione wcześniej
+trafiają w cache OCR i pamięć tłumaczeń, więc ich koszt się nie powtarza.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import core
+from export_service import BILINGUAL_FORMAT, FILE_EXTENSIONS, FORMATS, export_bytes
+from ocr_cache import document_hash
+from pdf_overlay import read_pages_file, write_bilingual_pdf, write_pages_file
+from telemetry import METRICS_PORT, start_metrics_server
+from token_budget import tokenizer_name
+from translator import TRANSLATION_MODEL
+
+# --- Konfiguracja ---
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+BILINGUAL_PAGES_SUFFIX = ".bilingual-pages.jsonl"
+
+STATUS_TRANSLATED = "translated" # Tłumaczenie zapisane w punkcie kontrolnym, eksport niedokończony
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+
+# --- Lista zadań ---
+
+def _job(path, output_base, pages="", source=None, target=None):
+    return {"path": path, "output_base": output_base, "pages": pages or "", "source": source, "target": target}
+
+
+def jobs_from_directory(directory, output_dir, recursive=False):
+    """Zadania dla plików *.pdf w katalogu (wyniki w tej samej strukturze podkatalogów)."""
+    jobs = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                path = os.path.join(root, name)
+                rel_base = os.path.splitext(os.path.relpath(path, directory))[0]
+                jobs.append(_job(path, os.path.join(output_dir, rel_base)))
+        if not recursive:
+            break
+    return jobs
+
+
+def jobs_from_manifest(manifest_path, output_dir):
+    """Zadania z manifestu: ścieżka na linię lub JSONL z opcjami per plik (ścieżki względem manifestu)."""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{manifest_path}:{line_no}: niepoprawny JSON: {e}")
+            else:
+                entry = {"path": line}
+            path = os.path.join(base_dir, entry["path"])
+            output = entry.get("output") or os.path.splitext(os.path.basename(path))[0]
+            jobs.append(_job(path, os.path.join(output_dir, output), entry.get("pages"),
+                             entry.get("source"), entry.get("target")))
+    return jobs
+
+
+def collect_jobs(inputs, output_dir, recursive=False):
+    """Buduje listę zadań z katalogów, plików PDF i manifestów."""
+    jobs = []
+    for item in inputs:
+        if os.path.isdir(item):
+            jobs.extend(jobs_from_directory(item, output_dir, recursive))
+        elif item.lower().endswith(".pdf"):
+            jobs.append(_job(item, os.path.join(output_dir, os.path.splitext(os.path.basename(item))[0])))
+        else:
+            jobs.extend(jobs_from_manifest(item, output_dir))
+    return jobs
+
+
+# --- Punkty kontrolne ---
+
+def write_atomic(path, data):
+    """Zapis atomowy (plik tymczasowy + os.replace) - przerwanie nie zostawia połowy pliku."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_bilingual_pages(path, pages):
+    """Strony do PDF dwujęzycznego (JSON Lines) - zapis atomowy, strona po stronie."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write_pages_file(pages, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_bilingual(path, source_path, checkpoint):
+    """Dwujęzyczny PDF (pdf_overlay) - strony dopisywane do pliku tymczasowego, potem os.replace."""
+    pages = checkpoint.get("bilingual_pages") # Ścieżka pliku stron (wcześniej: lista stron)
+    if isinstance(pages, str):
+        if not os.path.exists(pages):
+            raise ValueError(f"Brak pliku stron {pages} - usuń punkt kontrolny, aby przetworzyć plik ponownie.")
+        pages = read_pages_file(pages)
+    elif pages is None:
+        raise ValueError("Punkt kontrolny sprzed eksportu dwujęzycznego - usuń go, aby przetworzyć plik ponownie.")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write_bilingual_pdf(source_path, pages, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_checkpoint(path, checkpoint):
+    write_atomic(path, json.dumps(checkpoint, ensure_ascii=False, indent=1).encode("utf-8"))
+
+
+def checkpoint_matches(checkpoint, identity):
+    """Punkt kontrolny pasuje, jeśli dotyczy tych samych bajtów PDF, stron, języków i modelu."""
+    return (checkpoint is not None and checkpoint.get("version") == CHECKPOINT_VERSION
+            and all(checkpoint.get(key) == value for key, value in identity.items()))
+
+
+# --- Przetwarzanie ---
+
+def process_job(job, args, system_messages, api_key):
+    """Przetwarza jeden plik z uwzględnieniem punktu kontrolnego. Zwraca statystyki pliku."""
+    started = time.perf_counter()
+    checkpoint_path = job["output_base"] + CHECKPOINT_SUFFIX
+    source = core.resolve_language(job["source"] or args.source)
+    target = core.resolve_language(job["target"] or args.target)
+    target_llm = core.LANGUAGES[target][1]
+
+    with open(job["path"], "rb") as f:
+        pdf_bytes = f.read()
+    identity = {"doc_hash": document_hash(pdf_bytes), "pages_selection": job["pages"],
+                "source": source, "target": target, "model": TRANSLATION_MODEL}
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    if not checkpoint_matches(checkpoint, identity):
+        checkpoint = {"version": CHECKPOINT_VERSION, "path": job["path"], **identity, "outputs": {}}
+
+    # Strony liczone do przepustowości tylko, gdy zostały przetworzone w tym uruchomieniu
+    stats = {"path": job["path"], "pages": 0, "resumed": False, "skipped": False, "methods": {},
+             "prompt_tokens": 0, "completion_tokens": 0, "requests": 0, "stages": {}}
+    was_done = checkpoint.get("status") == STATUS_DONE
+    if checkpoint.get("status") in (STATUS_TRANSLATED, STATUS_DONE):
+        stats["resumed"] = True
+    else:
+        result = core.process_document(
+            pdf_bytes, source, target_llm, api_key, page_selection=job["pages"],
+            system_messages=system_messages, max_workers=args.ocr_workers,
+        )
+        bilingual_pages_path = job["output_base"] + BILINGUAL_PAGES_SUFFIX
+        save_bilingual_pages(bilingual_pages_path, result["bilingual_pages"])
+        checkpoint.update({
+            "status": STATUS_TRANSLATED, "error": None, "pages": result["pages"],
+            "page_methods": result["page_methods"], "translation": result["translation"],
+            "ocr_text": result["ocr_text"], "translate_seconds": round(time.perf_counter() - started, 3),
+            "usage": result["usage"], "timeline": result["timeline"],
+            "bilingual_pages": bilingual_pages_path, # Ścieżka pliku stron, nie same strony
+        })
+        save_checkpoint(checkpoint_path, checkpoint)
+        stats["pages"] = len(result["pages"])
+        for key in ("prompt_tokens", "completion_tokens", "requests"):
+            stats[key] = result["usage"][key]
+        stats["stages"] = result["timeline"]
+        for _, method, cached in result["page_methods"]:
+            key = f"{method} (cache)" if cached else method
+            stats["methods"][key] = stats["methods"].get(key, 0) + 1
+
+    # Eksport brakujących formatów (po przerwaniu w trakcie eksportu - tylko tych)
+    exported = 0
+    for fmt in args.formats:
+        output_path = f"{job['output_base']}.{FILE_EXTENSIONS.get(fmt, fmt)}"
+        if checkpoint["outputs"].get(fmt) == output_path and os.path.exists(output_path):
+            continue
+        if fmt == BILINGUAL_FORMAT:
+            write_bilingual(output_path, job["path"], checkpoint)
+        else:
+            write_atomic(output_path, export_bytes(checkpoint["translation"], fmt))
+        checkpoint["outputs"][fmt] = output_path
+        save_checkpoint(checkpoint_path, checkpoint)
+        exported += 1
+
+    stats["skipped"] = was_done and not exported
+    checkpoint["status"] = STATUS_DONE
+    save_checkpoint(checkpoint_path, checkpoint)
+
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def record_failure(job, error):
+    """Zapisuje błąd w punkcie kontrolnym (plik zostanie ponowiony przy następnym uruchomieniu)."""
+    checkpoint_path = job["output_base"] + CHECKPOINT_SUFFIX
+    checkpoint = load_checkpoint(checkpoint_path) or {"version": CHECKPOINT_VERSION, "path": job["path"], "outputs": {}}
+    # Gotowe tłumaczenie zostaje - po błędzie eksportu wznowienie zaczyna od eksportu
+    checkpoint["status"] = STATUS_TRANSLATED if checkpoint.get("translation") is not None else STATUS_FAILED
+    checkpoint["error"] = f"{type(error).__name__}: {error}"
+    try:
+        save_checkpoint(checkpoint_path, checkpoint)
+    except OSError:
+        pass
+
+
+def print_summary(results, failures, wall_seconds):
+    processed = [r for r in results if not r["skipped"]]
+    pages = sum(r["pages"] for r in processed)
+    methods = {}
+    for r in processed:
+        for key, count in r["methods"].items():
+            methods[key] = methods.get(key, 0) + count
+    minutes = wall_seconds / 60 or 1e-9
+    log("")
+    log(f"Pliki: {len(processed)} przetworzone, {len(results) - len(processed)} pominięte (gotowe), "
+        f"{len(failures)} z błędem")
+    log(f"Strony: {pages} ({', '.join(f'{k}: {v}' for k, v in sorted(methods.items())) or '-'})")
+    prompt_tokens = sum(r["prompt_tokens"] for r in processed)
+    completion_tokens = sum(r["completion_tokens"] for r in processed)
+    log(f"Tokeny: {prompt_tokens} promptu + {completion_tokens} odpowiedzi "
+        f"w {sum(r['requests'] for r in processed)} zapytaniach (tokenizer: {tokenizer_name()})")
+    stages = {}
+    for r in processed:
+        for stage, entry in r["stages"].items():
+            stages[stage] = stages.get(stage, 0.0) + entry["total_s"]
+    if stages:
+        log("Etapy (suma czasów): " + ", ".join(f"{k}: {v:.1f} s" for k, v in sorted(stages.items(), key=lambda x: -x[1])))
+    log(f"Czas: {wall_seconds:.1f} s | {pages / minutes:.1f} stron/min | {len(processed) / minutes:.2f} plików/min"
+        + (f" | {wall_seconds / pages:.2f} s/stronę" if pages else ""))
+    for job, error in failures:
+        log(f"  BŁĄD {job['path']}: {error}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Wsadowe OCR i tłumaczenie plików PDF.")
+    parser.add_argument("inputs", nargs="+", help="Katalogi, pliki PDF lub manifesty (lista ścieżek / JSONL)")
+    parser.add_argument("-o", "--output-dir", required=True, help="Katalog wyników")
+    parser.add_argument("--source", default="Angielski", help="Język źródłowy (nazwa, kod Tesseract lub nazwa angielska)")
+    parser.add_argument("--target", default="Polski", help="Język docelowy")
+    parser.add_argument("--pages", default="", help="Wybór stron dla wszystkich plików, np. '1-3,5' (domyślnie wszystkie)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS + (BILINGUAL_FORMAT,), default=["md", "docx"], help="Formaty wyników")
+    parser.add_argument("--jobs", type=int, default=2, help="Liczba plików przetwarzanych równolegle")
+    parser.add_argument("--ocr-workers", type=int, default=None,
+                        help="Procesy OCR na plik (domyślnie liczba rdzeni / --jobs)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Przeszukuj podkatalogi")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Port endpointu /metrics (Prometheus) na czas przetwarzania (0 = wyłączony)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    api_key = core.get_api_key()
+    if not api_key:
+        log("Ustaw zmienną środowiskową OPENROUTER_API_KEY.")
+        return 2
+    if not core.tesseract_available():
+        log("Tesseract nie jest zainstalowany lub nie ma go w ścieżce systemowej (PATH).")
+        return 2
+    try:
+        core.resolve_language(args.source)
+        core.resolve_language(args.target)
+        jobs = collect_jobs(args.inputs, args.output_dir, args.recursive)
+    except (OSError, ValueError) as e:
+        log(f"Błąd: {e}")
+        return 2
+    for job in jobs:
+        if not job["pages"]:
+            job["pages"] = args.pages
+    if args.ocr_workers is None:
+        # Każdy plik ma własną pulę procesów OCR - dzielimy rdzenie między równoległe pliki
+        args.ocr_workers = max(1, (os.cpu_count() or 1) // max(1, args.jobs))
+    system_messages = core.load_system_messages()
+    try:
+        start_metrics_server(args.metrics_port)
+    except OSError as e:
+        log(f"Nie udało się uruchomić endpointu metryk: {e}")
+
+    log(f"Plików do przetworzenia: {len(jobs)} (równolegle: {args.jobs}, procesy OCR na plik: {args.ocr_workers})")
+    results, failures = [], []
+    started = time.perf_counter()
+    # Wątki wystarczą: OCR działa w osobnych procesach, a tłumaczenie czeka na sieć
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {executor.submit(process_job, job, args, system_messages, api_key): job for job in jobs}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                failures.append((job, e))
+                record_failure(job, e)
+                log(f"[{done_count}/{len(jobs)}] BŁĄD {job['path']}: {e}")
+                continue
+            results.append(stats)
+            if stats["skipped"]:
+                log(f"[{done_count}/{len(jobs)}] {job['path']}: gotowe wcześniej, pominięto")
+            elif stats["resumed"]:
+                log(f"[{done_count}/{len(jobs)}] {job['path']}: wznowiono - tylko eksport ({stats['seconds']:.1f} s)")
+            else:
+                rate = stats["pages"] / stats["seconds"] * 60 if stats["seconds"] else 0
+                log(f"[{done_count}/{len(jobs)}] {job['path']}: {stats['pages']} stron w {stats['seconds']:.1f} s "
+                    f"({rate:.1f} stron/min)")
+    print_summary(results, failures, time.perf_counter() - started)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
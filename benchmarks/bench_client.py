@@ -0,0 +1,85 @@
+"""Benchmark opóźnień ogonowych klienta API: ponawianie (429 z Retry-After) i zapytania zabezpieczające.
+
+Mock API odpowiada błędem w części zapytań i w części ma bardzo długi czas do
+pierwszego tokenu. Porównuje p50/p95/p99 TTFT i czasu całkowitego bez hedgingu
+i z hedgingiem po różnych progach. Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.bench_client --requests 200 --slow-rate 0.05 --error-rate 0.05 --hedge-after 0 0.5 1
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.bench_e2e import percentile
+from benchmarks.mock_openai_server import start_in_background
+from llm_client import LlmClient
+
+
+async def one_request(client, endpoints, index):
+    messages = [{"role": "user", "content": f"Translate below text to Polish:\n\nParagraph {index}. "
+                                            f"{'The court rules as follows. ' * 10}\n\nTranslation to Polish:"}]
+    stats = {}
+    started = time.perf_counter()
+    ttft = None
+    try:
+        _, stream, events = await client.open_stream("mock", endpoints, messages, stats)
+        try:
+            async for event in events:
+                if ttft is None and event.choices and event.choices[0].delta.content:
+                    ttft = time.perf_counter() - started
+        finally:
+            await stream.close()
+    except Exception:
+        return None, None, stats
+    return ttft, time.perf_counter() - started, stats
+
+
+async def run_batch(client, endpoints, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(i):
+        async with semaphore:
+            return await one_request(client, endpoints, i)
+
+    return await asyncio.gather(*(limited(i) for i in range(requests)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.001)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Odsetek zapytań z długim TTFT")
+    parser.add_argument("--slow-ttft", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Odsetek odpowiedzi 429")
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--hedge-after", type=float, nargs="+", default=[0, 0.5, 1.0],
+                        help="Progi hedgingu do porównania [s] (0 = bez hedgingu)")
+    args = parser.parse_args()
+
+    server, base_url = start_in_background(
+        ttft=args.ttft, token_delay=args.token_delay, error_rate=args.error_rate, retry_after=args.retry_after,
+        slow_rate=args.slow_rate, slow_ttft=args.slow_ttft,
+    )
+    endpoints = [(base_url, "mock")]
+    print(f"{args.requests} zapytań, współbieżność {args.concurrency}, wolne {args.slow_rate:.0%} "
+          f"(TTFT {args.slow_ttft} s), błędy 429 {args.error_rate:.0%}")
+    print(f"{'hedge [s]':>9} {'TTFT p50':>9} {'p95':>7} {'p99':>7} {'czas p50':>9} {'p95':>7} {'p99':>7} "
+          f"{'ponowienia':>10} {'hedged':>7} {'błędy':>6}")
+    for hedge_after in args.hedge_after:
+        client = LlmClient(hedge_after=hedge_after)
+        results = client.run(run_batch(client, endpoints, args.requests, args.concurrency)).result()
+        ttfts = [r[0] for r in results if r[0] is not None]
+        totals = [r[1] for r in results if r[1] is not None]
+        retries = sum(r[2].get("retries", 0) for r in results)
+        hedged = sum(1 for r in results if r[2].get("hedged"))
+        failed = sum(1 for r in results if r[1] is None)
+        print(f"{hedge_after or '-':>9} {percentile(ttfts, 50):>9.2f} {percentile(ttfts, 95):>7.2f} "
+              f"{percentile(ttfts, 99):>7.2f} {percentile(totals, 50):>9.2f} {percentile(totals, 95):>7.2f} "
+              f"{percentile(totals, 99):>7.2f} {retries:>10} {hedged:>7} {failed:>6}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
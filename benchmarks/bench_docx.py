@@ -0,0 +1,152 @@
+"""Benchmark eksportu DOCX: dotychczasowy (Markdown -> HTML -> BeautifulSoup) vs drzewo Markdown -> python-docx.
+
+Na syntetycznym tłumaczeniu (nagłówki, akapity z pogrubieniem i kursywą, listy
+zagnieżdżone, tabele) mierzy czas eksportu, rozmiar pliku i wierność formatowania
+(ile znaków pogrubionych / kursywą ma wynik względem tekstu źródłowego). Wariant
+"przyrostowy" dokłada kolejne kompletne bloki (jak w trakcie tłumaczenia).
+Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.bench_docx --pages 100 --repeat 3
+"""
+
+import argparse
+import io
+import random
+import re
+import time
+
+import markdown
+from bs4 import BeautifulSoup
+from docx import Document
+from docx.shared import Pt
+
+from docx_export import DocxBuilder, markdown_to_docx_bytes
+from markdown_stream import MarkdownBlocks
+
+WORDS = ("sąd", "wyrok", "strona", "umowa", "pozwany", "powód", "odszkodowanie", "termin", "przepis", "ustawa",
+         "postępowanie", "dowód", "świadek", "opinia", "biegły", "koszty", "apelacja", "uzasadnienie")
+
+
+def legacy_markdown_to_docx(markdown_text):
+    """Dotychczasowy eksport (do porównania): HTML + find_all po znacznikach."""
+    html = markdown.markdown(markdown_text)
+    doc = Document()
+    style = doc.styles['Normal']
+    style.font.name = 'Arial'
+    style.font.size = Pt(11)
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'blockquote']):
+        if element.name.startswith('h'):
+            doc.add_heading(element.get_text(), level=int(element.name[1]))
+        elif element.name == 'p':
+            p = doc.add_paragraph(element.get_text())
+            for child in element.children:
+                if child.name == 'strong' or child.name == 'b':
+                    for run in p.runs:
+                        run.bold = True
+                elif child.name == 'em' or child.name == 'i':
+                    for run in p.runs:
+                        run.italic = True
+        elif element.name == 'ul':
+            for li in element.find_all('li', recursive=False):
+                doc.add_paragraph(li.get_text(), style='List Bullet')
+        elif element.name == 'ol':
+            for li in element.find_all('li', recursive=False):
+                doc.add_paragraph(li.get_text(), style='List Number')
+        elif element.name == 'blockquote':
+            doc.add_paragraph(element.get_text()).style = 'Quote'
+    output = io.BytesIO()
+    doc.save(output)
+    output.seek(0)
+    return output
+
+
+def sentence(rng, words=12):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def formatted_paragraph(rng):
+    parts = []
+    for _ in range(rng.randint(3, 5)):
+        s = sentence(rng)
+        kind = rng.random()
+        if kind < 0.2:
+            s = f"**{s}**"
+        elif kind < 0.35:
+            s = f"*{s}*"
+        parts.append(s)
+    return " ".join(parts)
+
+
+def make_translation(pages, seed=0):
+    """Syntetyczne tłumaczenie w Markdown, ok. jednej strony A4 na stronę."""
+    rng = random.Random(seed)
+    blocks = []
+    for page in range(1, pages + 1):
+        blocks.append(f"## Strona {page}")
+        blocks += [formatted_paragraph(rng) for _ in range(3)]
+        blocks.append("\n".join(
+            f"{i}. {sentence(rng, 6)}\n    - {sentence(rng, 4)}\n    - *{sentence(rng, 4)}*" for i in range(1, 4)))
+        if page % 5 == 0:
+            rows = [f"| {sentence(rng, 2)} | {rng.randint(1, 999)} | **{sentence(rng, 2)}** |" for _ in range(6)]
+            blocks.append("\n".join(["| Pozycja | Kwota | Uwagi |", "|---|--:|---|"] + rows))
+        blocks.append(f"> {sentence(rng)}")
+    return "\n\n".join(blocks)
+
+
+def expected_chars(text, marker):
+    pattern = r"\*\*(.+?)\*\*" if marker == "bold" else r"(?<!\*)\*([^*]+?)\*(?!\*)"
+    return sum(len(m) for m in re.findall(pattern, text))
+
+
+def formatted_chars(docx_bytes):
+    doc = Document(docx_bytes)
+    paragraphs = [p for p in doc.paragraphs if not p.style.name.startswith("Heading")]
+    paragraphs += [p for table in doc.tables for row in table.rows for cell in row.cells for p in cell.paragraphs]
+    bold = sum(len(r.text) for p in paragraphs for r in p.runs if r.bold)
+    italic = sum(len(r.text) for p in paragraphs for r in p.runs if r.italic)
+    return bold, italic, len(doc.paragraphs), len(doc.tables)
+
+
+def incremental(text):
+    """Tekst podawany porcjami (jak fragmenty tłumaczenia) i dokładany blokami."""
+    builder = DocxBuilder()
+    blocks = MarkdownBlocks()
+    for start in range(0, len(text), 400):
+        for block in blocks.feed(text[start:start + 400]):
+            builder.add(block)
+    for block in blocks.finish():
+        builder.add(block)
+    return builder.save()
+
+
+EXPORTERS = {
+    "html+bs4 (dotychczas)": legacy_markdown_to_docx,
+    "drzewo markdown": markdown_to_docx_bytes,
+    "przyrostowo (bloki)": incremental,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = make_translation(args.pages)
+    bold_expected, italic_expected = expected_chars(text, "bold"), expected_chars(text, "italic")
+    print(f"{args.pages} stron, {len(text)} znaków Markdown; pogrubione {bold_expected}, kursywa {italic_expected} znaków")
+    print(f"{'eksport':>22} {'czas [s]':>9} {'KB':>7} {'akapity':>8} {'tabele':>7} {'pogrub.':>8} {'kursywa':>8}")
+    for name, export in EXPORTERS.items():
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            output = export(text)
+            times.append(time.perf_counter() - start)
+        bold, italic, paragraphs, tables = formatted_chars(output)
+        print(f"{name:>22} {min(times):>9.3f} {len(output.getvalue()) / 1024:>7.0f} {paragraphs:>8} {tables:>7} "
+              f"{bold:>8} {italic:>8}")
+
+
+if __name__ == "__main__":
+    main()
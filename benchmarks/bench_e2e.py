@@ -0,0 +1,308 @@
+"""Benchmark end-to-end: syntetyczne skany -> render -> OCR -> tłumaczenie (lokalny mock API) -> eksport.
+
+Dla każdego scenariusza (język z core.LANGUAGES x liczba stron) generuje offline PDF
+ze stronami w różnych DPI i orientacjach, przepuszcza go przez DocumentPipeline z
+tłumaczeniem na lokalnym serwerze mock_openai_server i eksportuje wynik. Cache OCR
+i pamięć tłumaczeń są wyłączone, więc każdy przebieg jest "na zimno".
+
+Każdy scenariusz działa w osobnym procesie, więc szczytowe RSS dotyczy tylko jego.
+Wynik: tabela oraz JSON (--output) z przepustowością i p50/p95 czasów etapów
+(z telemetry.Timeline); --compare pokazuje zmiany względem poprzedniego pliku JSON.
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.bench_e2e --pages 1 10 --output wyniki.json
+    python -m benchmarks.bench_e2e --langs eng pol --pages 500 --dpis 150 300 --rotations 0 90 180 270
+    python -m benchmarks.bench_e2e --compare wyniki.json --output nowe.json
+    python -m benchmarks.bench_e2e --text-layer-every 1   # bez Tesseract (strony z warstwą tekstową)
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows - bez pomiaru RSS
+    resource = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Etapy pokazywane w tabeli i porównaniu (pełna lista etapów jest w JSON)
+KEY_STAGES = ("render_ocr", "ocr", "ttft", "translate", "export_docx")
+
+
+def percentile(values, q):
+    """Percentyl q (0..100) z interpolacją liniową."""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def stage_stats(spans):
+    """Statystyki etapów z osi czasu: liczba, suma, p50/p95/maks. [s] i przepustowość [op./s pracy]."""
+    durations = {}
+    for span in spans:
+        durations.setdefault(span["stage"], []).append(span["duration_s"])
+    stats = {}
+    for stage, values in durations.items():
+        total = sum(values)
+        stats[stage] = {
+            "count": len(values), "total_s": round(total, 4),
+            "p50_s": round(percentile(values, 50), 4), "p95_s": round(percentile(values, 95), 4),
+            "max_s": round(max(values), 4), "per_s": round(len(values) / total, 2) if total else None,
+        }
+    return stats
+
+
+def peak_rss_mb():
+    """Szczytowe RSS procesu i największego zakończonego procesu potomnego (pula OCR) [MB]."""
+    if resource is None:
+        return None, None
+    scale = 1 if sys.platform == "darwin" else 1024 # ru_maxrss: bajty na macOS, kB na Linuksie
+    to_mb = lambda usage: round(usage.ru_maxrss * scale / 2**20, 1)
+    return to_mb(resource.getrusage(resource.RUSAGE_SELF)), to_mb(resource.getrusage(resource.RUSAGE_CHILDREN))
+
+
+# --- Scenariusz (w osobnym procesie) ---
+
+def run_scenario(scenario, base_url):
+    """Wykonuje jeden scenariusz i zwraca słownik wyników (patrz --output)."""
+    import fitz  # PyMuPDF
+
+    import core
+    from benchmarks.synthetic import char_accuracy, font_name, make_document
+    from pdf_overlay import write_bilingual_pdf
+    from pipeline import DocumentPipeline
+    from telemetry import Timeline, timed
+    from token_budget import summarize_usage
+    from translator import ChunkedTranslator, event_text
+
+    lang = scenario["lang"]
+    target_llm = core.LANGUAGES[scenario["target"]][1]
+    result = {"scenario": scenario, "font": font_name(lang), "errors": {}}
+
+    started = time.perf_counter()
+    pdf_bytes, references = make_document(
+        scenario["pages"], lang, dpis=scenario["dpis"], rotations=scenario["rotations"],
+        text_layer_every=scenario["text_layer_every"], seed=scenario["seed"],
+    )
+    result["generate_s"] = round(time.perf_counter() - started, 3)
+    result["pdf_mb"] = round(len(pdf_bytes) / 2**20, 2)
+
+    timeline = Timeline()
+    translator = ChunkedTranslator(
+        "mock", target_llm, core.get_system_message(core.load_system_messages(), target_llm),
+        base_url=base_url, max_concurrency=scenario["concurrency"],
+        wrap_fn=core.wrap_stream_for_markdown, timeline=timeline,
+    )
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    pipeline = DocumentPipeline(doc, range(1, scenario["pages"] + 1), lang, translator,
+                                max_workers=scenario["workers"], timeline=timeline)
+
+    started = time.perf_counter()
+    ttft = None
+    parts = []
+    for event in pipeline.stream_translation():
+        text = event_text(event)
+        if text and ttft is None:
+            ttft = time.perf_counter() - started
+        parts.append(text)
+    wall = time.perf_counter() - started
+    translation = "".join(parts)
+
+    for fmt in scenario["exports"]:
+        try:
+            with timed(f"export_{fmt}", timeline):
+                if fmt == "bilingual":
+                    with tempfile.TemporaryDirectory() as tmp_dir:
+                        source_path = os.path.join(tmp_dir, "source.pdf")
+                        with open(source_path, "wb") as f:
+                            f.write(pdf_bytes)
+                        write_bilingual_pdf(source_path, pipeline.bilingual_pages(), os.path.join(tmp_dir, "out.pdf"))
+                else:
+                    (core.markdown_to_docx if fmt == "docx" else core.markdown_to_pdf)(translation)
+        except Exception as e: # np. WeasyPrint bez bibliotek systemowych
+            result["errors"][f"export_{fmt}"] = f"{type(e).__name__}: {e}"
+
+    methods = {}
+    accuracy = []
+    for r in pipeline.ocr_results:
+        methods[r["method"]] = methods.get(r["method"], 0) + 1
+        if r["method"] == "ocr":
+            accuracy.append(char_accuracy(r["text"], references[r["index"]]))
+    rss, rss_children = peak_rss_mb()
+    result.update({
+        "wall_s": round(wall, 3),
+        "pages_per_min": round(scenario["pages"] / wall * 60, 1) if wall else None,
+        "ttft_s": round(ttft, 3) if ttft is not None else None,
+        "page_methods": methods,
+        "ocr_accuracy": round(sum(accuracy) / len(accuracy), 3) if accuracy else None,
+        "translation_chars": len(translation),
+        "requests": summarize_usage(translator.usage),
+        "stages": stage_stats(timeline.spans()),
+        "peak_rss_mb": rss,
+        "peak_rss_children_mb": rss_children,
+    })
+    return result
+
+
+def run_isolated(scenario, base_url):
+    """Uruchamia scenariusz w nowym procesie Pythona (osobne szczytowe RSS)."""
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING") # Bez logu każdego zapytania na stderr
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_e2e", "--run-scenario", json.dumps(scenario), "--base-url", base_url],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"scenario": scenario, "failed": (completed.stderr.strip().splitlines() or ["?"])[-1]}
+    return json.loads(lines[-1])
+
+
+# --- Raport ---
+
+def environment_info(args):
+    def git_commit():
+        try:
+            return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def tesseract_version():
+        try:
+            import pytesseract
+            return str(pytesseract.get_tesseract_version())
+        except Exception:
+            return None
+
+    from ocr_engine import OCR_ORIENTATION
+    from render_policy import OCR_RENDER_MODE
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+        "cpu_count": os.cpu_count(), "tesseract": tesseract_version(),
+        "ocr_orientation": OCR_ORIENTATION, "ocr_render_mode": OCR_RENDER_MODE,
+        "ocr_backend": os.environ.get("OCR_BACKEND"),
+        "mock_ttft_s": args.ttft, "mock_token_delay_s": args.token_delay,
+    }
+
+
+def scenario_key(result):
+    s = result["scenario"]
+    return f"{s['lang']}/{s['pages']}"
+
+
+def _fmt(value, spec=".2f"):
+    return "-" if value is None else format(value, spec)
+
+
+def print_table(results):
+    header = f"{'scenariusz':>14} {'czas [s]':>9} {'str./min':>9} {'TTFT [s]':>9} "
+    header += " ".join(f"{stage + ' p50/p95':>22}" for stage in KEY_STAGES[:4])
+    print(header + f" {'RSS [MB]':>9} {'OCR dokł.':>9}")
+    for r in results:
+        if "failed" in r:
+            print(f"{scenario_key(r):>14} BŁĄD: {r['failed']}")
+            continue
+        cells = []
+        for stage in KEY_STAGES[:4]:
+            s = r["stages"].get(stage)
+            cells.append(f"{_fmt(s['p50_s'], '.3f') + ' / ' + _fmt(s['p95_s'], '.3f') if s else '-':>22}")
+        rss = max(filter(None, (r["peak_rss_mb"], r["peak_rss_children_mb"])), default=None)
+        print(f"{scenario_key(r):>14} {r['wall_s']:>9.2f} {_fmt(r['pages_per_min'], '.1f'):>9} "
+              f"{_fmt(r['ttft_s']):>9} " + " ".join(cells) + f" {_fmt(rss, '.0f'):>9} {_fmt(r['ocr_accuracy'], '.3f'):>9}")
+        for name, error in r["errors"].items():
+            print(f"{'':>14} {name}: {error}")
+
+
+def compare(results, baseline):
+    """Zmiana [%] kluczowych wskaźników względem wyników bazowych (ujemna = szybciej / mniej pamięci)."""
+    base = {scenario_key(r): r for r in baseline["results"] if "failed" not in r}
+    print(f"\nPorównanie z {baseline['meta'].get('git_commit')} ({baseline['meta'].get('timestamp')}):")
+    for r in results:
+        old = base.get(scenario_key(r))
+        if old is None or "failed" in r:
+            continue
+        metrics = [("czas", r["wall_s"], old["wall_s"]), ("TTFT", r["ttft_s"], old["ttft_s"]),
+                   ("RSS", r["peak_rss_mb"], old["peak_rss_mb"])]
+        for stage in KEY_STAGES:
+            if stage in r["stages"] and stage in old["stages"]:
+                metrics.append((f"{stage} p95", r["stages"][stage]["p95_s"], old["stages"][stage]["p95_s"]))
+        changes = [f"{name} {(new - prev) / prev * 100:+.0f}%" for name, new, prev in metrics if new is not None and prev]
+        print(f"{scenario_key(r):>14} " + ", ".join(changes))
+
+
+def build_scenarios(args):
+    return [
+        {"lang": lang, "pages": pages, "target": args.target, "dpis": args.dpis, "rotations": args.rotations,
+         "text_layer_every": args.text_layer_every, "seed": args.seed, "workers": args.workers,
+         "concurrency": args.concurrency, "exports": args.exports}
+        for lang in args.langs for pages in args.pages
+    ]
+
+
+def main():
+    from core import LANGUAGES
+    lang_codes = [code for code, _ in LANGUAGES.values()]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--langs", nargs="+", default=lang_codes, choices=lang_codes, help="Języki źródłowe (kody Tesseract)")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10], help="Liczby stron dokumentów (1-500)")
+    parser.add_argument("--target", default="Polski", choices=list(LANGUAGES), help="Język docelowy tłumaczenia")
+    parser.add_argument("--dpis", type=int, nargs="+", default=[150, 200, 300], help="DPI skanów (cyklicznie po stronach)")
+    parser.add_argument("--rotations", type=int, nargs="+", default=[0, 0, 0, 90, 0, 180, 0, 270],
+                        choices=[0, 90, 180, 270], help="Obroty stron (cyklicznie po stronach)")
+    parser.add_argument("--text-layer-every", type=int, default=0,
+                        help="Co która strona ma warstwę tekstową (0 = same skany, 1 = bez OCR)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesy OCR (domyślnie OCR_WORKERS)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Równoległe zapytania tłumaczenia")
+    parser.add_argument("--exports", nargs="*", default=["docx", "pdf"], choices=["docx", "pdf", "bilingual"])
+    parser.add_argument("--ttft", type=float, default=0.2, help="Opóźnienie mock API przed pierwszym tokenem [s]")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Opóźnienie mock API między tokenami [s]")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-isolate", action="store_true", help="Scenariusze w jednym procesie (RSS narastająco)")
+    parser.add_argument("--output", help="Plik JSON z wynikami")
+    parser.add_argument("--compare", help="Plik JSON z poprzedniego uruchomienia do porównania")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS) # Tryb procesu potomnego
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        print(json.dumps(run_scenario(json.loads(args.run_scenario), args.base_url), ensure_ascii=False))
+        return
+    if any(not 1 <= pages <= 500 for pages in args.pages):
+        parser.error("--pages: od 1 do 500 stron")
+
+    from benchmarks.mock_openai_server import start_in_background
+    server, base_url = start_in_background(ttft=args.ttft, token_delay=args.token_delay)
+    results = []
+    try:
+        for scenario in build_scenarios(args):
+            print(f"{scenario['lang']}/{scenario['pages']}...", file=sys.stderr, flush=True)
+            results.append(run_scenario(scenario, base_url) if args.no_isolate else run_isolated(scenario, base_url))
+    finally:
+        server.shutdown()
+
+    report = {"meta": environment_info(args), "results": results}
+    print_table(results)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Mikrobenchmark narzutu przekazania strony do Tesseract (bez samego rozpoznawania).
+
+"przed": pix.tobytes("png") -> Image.open (dekodowanie) -> zapis PNG do pliku
+tymczasowego (tak robi pytesseract przed uruchomieniem binarki).
+"po": Image.frombuffer(pix.samples_mv) -> nagłówek PNM + surowe piksele dla stdin.
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.bench_handoff --pages 5 --dpi 300
+    python -m benchmarks.bench_handoff --ocr     # dodatkowo pełny OCR każdym dostępnym backendem
+"""
+
+import argparse
+import io
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from benchmarks.synthetic import make_page_image, make_scanned_pdf
+from ocr_backends import BACKENDS, get_backend, image_to_pnm
+from render_policy import pixmap_to_image
+
+
+def handoff_before(pix):
+    img = Image.open(io.BytesIO(pix.tobytes("png")))
+    img.load()
+    # pytesseract zapisuje obraz do pliku tymczasowego przed wywołaniem tesseract
+    with tempfile.NamedTemporaryFile(suffix=".png") as tmp:
+        img.save(tmp, format="PNG")
+    return img
+
+
+def handoff_after(pix):
+    img = pixmap_to_image(pix)
+    image_to_pnm(img) # To, co trafia na stdin binarki
+    return img
+
+
+def timed(fn, pixmaps, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for pix in pixmaps:
+            fn(pix)
+    return (time.perf_counter() - start) / (repeat * len(pixmaps))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ocr", action="store_true", help="Zmierz też pełny OCR dla każdego backendu")
+    parser.add_argument("--lang", default="eng")
+    args = parser.parse_args()
+
+    pdf = make_scanned_pdf([make_page_image(i + 1, dpi=args.dpi) for i in range(args.pages)])
+    doc = fitz.open(stream=pdf, filetype="pdf")
+    for colorspace, label in ((fitz.csGRAY, "gray"), (fitz.csRGB, "rgb")):
+        pixmaps = [page.get_pixmap(dpi=args.dpi, colorspace=colorspace, alpha=False) for page in doc]
+        before = timed(handoff_before, pixmaps, args.repeat)
+        after = timed(handoff_after, pixmaps, args.repeat)
+        print(f"{label:>5}: przed {before * 1000:8.1f} ms/str.  po {after * 1000:8.1f} ms/str.  ({before / after:.1f}x)")
+
+    if args.ocr:
+        pix = doc[0].get_pixmap(dpi=args.dpi, colorspace=fitz.csGRAY, alpha=False)
+        img = pixmap_to_image(pix)
+        for name in BACKENDS:
+            try:
+                backend = get_backend(name)
+                backend.ocr_data(img, args.lang) # Rozgrzewka (np. inicjalizacja API)
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    backend.ocr_data(img, args.lang) # Jak w ocr_engine: jeden przebieg z danymi TSV
+                print(f"OCR {name:>11}: {(time.perf_counter() - start) / args.repeat:.2f} s/str.")
+            except Exception as e:
+                print(f"OCR {name:>11}: niedostępny ({e})")
+    doc.close()
+
+
+if __name__ == "__main__":
+    main()
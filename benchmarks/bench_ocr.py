@@ -0,0 +1,49 @@
+"""Benchmark OCR: ścieżka szeregowa (1 proces) vs pula procesów ocr_engine oraz strategie orientacji.
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.bench_ocr --pages 32 --workers 1 4 8 16
+    python -m benchmarks.bench_ocr --workers 4 --orientation osd osd-downscaled confidence
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks.synthetic import make_pages
+from ocr_engine import ORIENTATION_STRATEGIES, ocr_pages
+
+
+def run(pages, lang_code, workers, orientation):
+    start = time.perf_counter()
+    results = ocr_pages(pages, lang_code, max_workers=workers, orientation=orientation)
+    elapsed = time.perf_counter() - start
+    chars = sum(len(r["text"]) for r in results)
+    return elapsed, chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=16, help="Liczba syntetycznych stron")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--lang", default="eng", help="Kod języka Tesseract")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="Liczby procesów do porównania (1 = ścieżka szeregowa)")
+    parser.add_argument("--orientation", nargs="+", default=["osd"], choices=ORIENTATION_STRATEGIES,
+                        help="Strategie wykrywania orientacji do porównania (osd = dotychczasowa)")
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages, dpi=args.dpi, rotate_every=5)
+    print(f"{args.pages} stron, {args.dpi} DPI, CPU: {os.cpu_count()}")
+    print(f"{'orientacja':>15} {'procesy':>8} {'czas [s]':>10} {'strony/s':>10} {'przysp.':>8} {'znaki':>8}")
+
+    baseline = None
+    for orientation in args.orientation:
+        for workers in args.workers:
+            elapsed, chars = run(pages, args.lang, workers, orientation)
+            baseline = baseline or elapsed
+            print(f"{orientation:>15} {workers:>8} {elapsed:>10.2f} {args.pages / elapsed:>10.2f} "
+                  f"{baseline / elapsed:>7.2f}x {chars:>8}")
+
+
+if __name__ == "__main__":
+    main()
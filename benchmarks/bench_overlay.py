@@ -0,0 +1,160 @@
+"""Benchmark dwujęzycznego PDF (pdf_overlay): czas na stronę, szczytowe RSS i rozmiar pliku względem liczby stron.
+
+Na syntetycznym skanie (benchmarks.synthetic) z układem stron zbudowanym z obrazu
+(ramki linii i akapitów jak z OCR) albo z warstwą tekstową (--text-layer) składa
+PDF z tłumaczeniem w układzie oryginału. Warianty różnią się liczbą stron składanych
+w pamięci przed przeniesieniem do dokumentu wynikowego (BILINGUAL_BATCH_PAGES;
+0 = cały dokument naraz). Każdy pomiar działa w osobnym procesie, więc szczytowe RSS
+dotyczy tylko jego.
+Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.bench_overlay --pages 20 200 --batch 0 1 16
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows - bez pomiaru RSS
+    resource = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_layout(img, reference, dpi):
+    """Układ strony (PageLayout.to_dict()) z pasów ciemnych wierszy obrazu - zamiast Tesseract."""
+    from ocr_layout import PageLayout
+
+    dark = np.asarray(img.convert("L")) < 128
+    edges = np.flatnonzero(np.diff(dark.any(axis=1).astype(np.int8)))
+    tops, bottoms = edges[::2] + 1, edges[1::2] + 1
+    lines = reference.split("\n")[:len(bottoms)]
+    boxes, pars, previous_bottom = [], [], None
+    for top, bottom in zip(tops[:len(lines)], bottoms):
+        columns = np.flatnonzero(dark[top:bottom].any(axis=0))
+        boxes.append([columns[0], top, columns[-1], bottom])
+        # Odstęp większy niż wysokość linii rozpoczyna nowy akapit
+        new_par = previous_bottom is None or top - previous_bottom > (bottom - top) * 1.2
+        pars.append(pars[-1] + new_par if pars else 0)
+        previous_bottom = bottom
+    offsets = np.zeros(len(lines) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(line) + 1 for line in lines])
+    return PageLayout(img.width, img.height, dpi, "\n".join(lines), offsets, boxes, [90.0] * len(lines),
+                      [len(line.split()) for line in lines], [0] * len(lines), pars).to_dict()
+
+
+def translated(reference):
+    """Udawane tłumaczenie: akapity oryginału z dopiskiem (tłumaczenia są zwykle dłuższe od źródła)."""
+    paragraphs = reference.split("\n")
+    return "\n\n".join(f"**{paragraphs[0]}**" if i == 0 else f"{line} (przetłumaczono: zażółć gęślą jaźń)"
+                       for i, line in enumerate(paragraphs))
+
+
+def make_input(pages, dpi, text_layer, seed, work_dir):
+    """Zapisuje PDF i trójki stron (numer, tłumaczenie, układ; JSON Lines) do work_dir. Zwraca ścieżki."""
+    import fitz  # PyMuPDF
+
+    from benchmarks.synthetic import _add_image_page, make_page
+    from pdf_overlay import write_pages_file
+
+    doc = fitz.open()
+    entries = []
+    for page_no in range(1, pages + 1):
+        img, reference = make_page(page_no, dpi=dpi, seed=seed)
+        page = _add_image_page(doc, img, jpeg_quality=85)
+        if text_layer:
+            # Akapit na linię - bloki warstwy tekstowej odpowiadają akapitom tłumaczenia
+            line_height = page.rect.height / img.height * 11 * dpi / 72 * 1.4
+            for i, line in enumerate(reference.split("\n")):
+                page.insert_text((72, 72 + (i + 1) * line_height), line, fontsize=9, render_mode=3)
+            layout = None
+        else:
+            layout = synthetic_layout(img, reference, dpi)
+        entries.append((page_no, translated(reference), layout))
+    pdf_path = os.path.join(work_dir, "source.pdf")
+    doc.save(pdf_path, garbage=3, deflate=True)
+    doc.close()
+    pages_path = os.path.join(work_dir, "pages.jsonl")
+    write_pages_file(entries, pages_path)
+    return pdf_path, pages_path
+
+
+def peak_rss_mb():
+    """Szczytowe RSS procesu [MB] lub None.
+
+    Na Linuksie z /proc (VmHWM) - ru_maxrss przechodzi przez fork i exec z procesu
+    rodzica, więc pokazywałby pamięć procesu, który wygenerował dane wejściowe.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024 # ru_maxrss: bajty na macOS, kB na Linuksie
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+def run_variant(pdf_path, pages_path, batch_pages, output_path):
+    """Jeden pomiar (w procesie potomnym): czas, szczytowe RSS i rozmiar wyniku."""
+    from pdf_overlay import read_pages_file, write_bilingual_pdf
+
+    started = time.perf_counter()
+    # Strony czytane z pliku na bieżąco, PDF źródłowy ze ścieżki - jak w ExportService
+    count = write_bilingual_pdf(pdf_path, read_pages_file(pages_path), output_path,
+                                batch_pages=batch_pages or float("inf"))
+    seconds = time.perf_counter() - started
+    return {"pages": count, "seconds": seconds, "rss_mb": peak_rss_mb(),
+            "size_mb": os.path.getsize(output_path) / 2**20}
+
+
+def run_isolated(pdf_path, pages_path, batch_pages, output_path):
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_overlay", "--run", json.dumps([pdf_path, pages_path, batch_pages,
+                                                                                output_path])],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError((completed.stderr.strip().splitlines() or ["?"])[-1])
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--batch", type=int, nargs="+", default=[0, 16],
+                        help="Stron w pamięci przed przeniesieniem do wyniku (0 = cały dokument naraz)")
+    parser.add_argument("--dpi", type=int, default=150, help="DPI syntetycznych skanów")
+    parser.add_argument("--text-layer", action="store_true", help="Strony z warstwą tekstową zamiast układu OCR")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--run", help=argparse.SUPPRESS) # Tryb procesu potomnego
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_variant(*json.loads(args.run))))
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="bench-overlay-")
+    print(f"{'strony':>7} {'partia':>7} {'ms/stronę':>10} {'RSS [MB]':>9} {'plik [MB]':>10} {'źródło [MB]':>12}")
+    for pages in args.pages:
+        pdf_path, pages_path = make_input(pages, args.dpi, args.text_layer, args.seed, work_dir)
+        for batch_pages in args.batch:
+            result = run_isolated(pdf_path, pages_path, batch_pages, os.path.join(work_dir, "bilingual.pdf"))
+            rss = "-" if result["rss_mb"] is None else f"{result['rss_mb']:.0f}"
+            print(f"{pages:>7} {batch_pages or 'całość':>7} {result['seconds'] / pages * 1000:>10.1f} {rss:>9} "
+                  f"{result['size_mb']:>10.2f} {os.path.getsize(pdf_path) / 2**20:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
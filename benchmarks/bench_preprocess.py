@@ -0,0 +1,71 @@
+"""Benchmark wstępnej obróbki obrazu przed OCR (image_preprocess) na syntetycznych, postarzonych skanach.
+
+Dla każdego zestawu kroków mierzy czas obróbki i OCR na stronę oraz dokładność znakową
+względem tekstu wzorcowego (zmiana względem OCR surowego obrazu). Strony mają przekos,
+nierówne oświetlenie, szum, plamki i ciemne pasy przy brzegach (synthetic.degrade_page).
+Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.bench_preprocess --pages 6 --dpi 200 300
+    python -m benchmarks.bench_preprocess --no-ocr   # tylko czas obróbki (bez Tesseract)
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic import char_accuracy, degrade_page, make_page
+from image_preprocess import PREPROCESS_STEPS, preprocess
+
+VARIANTS = {
+    "bez obróbki": (),
+    "crop+deskew": ("crop", "deskew"),
+    "wszystkie": PREPROCESS_STEPS,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--dpi", type=int, nargs="+", default=[200, 300])
+    parser.add_argument("--lang", default="eng")
+    parser.add_argument("--skew", type=float, default=2.0, help="Maksymalny przekos stron [°]")
+    parser.add_argument("--noise", type=float, default=25.0)
+    parser.add_argument("--speckle", type=float, default=0.01)
+    parser.add_argument("--no-ocr", action="store_true", help="Pomiń OCR (tylko czas obróbki)")
+    args = parser.parse_args()
+    if not args.no_ocr:
+        from ocr_backends import get_backend # Import na żądanie: wymaga Tesseract
+        from ocr_layout import PageLayout
+        backend = get_backend()
+
+    print(f"{'DPI':>5} {'kroki':>12} {'obróbka [ms]':>13} {'OCR [s]':>8} {'dokładność':>10} {'zmiana':>7}")
+    for dpi in args.dpi:
+        pages = []
+        for i in range(args.pages):
+            img, reference = make_page(i + 1, dpi=dpi)
+            img.info["dpi"] = (dpi, dpi)
+            pages.append((degrade_page(img, seed=i, skew=args.skew, noise=args.noise, speckle=args.speckle),
+                          reference))
+        baseline = None
+        for name, steps in VARIANTS.items():
+            prep_time = ocr_time = 0.0
+            accuracy = []
+            for img, reference in pages:
+                start = time.perf_counter()
+                prepared = preprocess(img, steps)
+                prep_time += time.perf_counter() - start
+                if not args.no_ocr:
+                    start = time.perf_counter()
+                    text = PageLayout.from_tsv(backend.ocr_data(prepared, args.lang)).to_text()
+                    ocr_time += time.perf_counter() - start
+                    accuracy.append(char_accuracy(text, reference))
+            if accuracy:
+                mean_accuracy = sum(accuracy) / len(accuracy)
+                baseline = mean_accuracy if baseline is None else baseline
+                acc, delta = f"{mean_accuracy:>10.3f}", f"{mean_accuracy - baseline:>+7.3f}"
+                ocr = f"{ocr_time / args.pages:>8.2f}"
+            else:
+                acc, delta, ocr = f"{'-':>10}", f"{'-':>7}", f"{'-':>8}"
+            print(f"{dpi:>5} {name:>12} {prep_time / args.pages * 1000:>13.1f} {ocr} {acc} {delta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark polityki renderowania: stałe 300 DPI RGB (dotychczas) vs adaptacyjne DPI w skali szarości / binarnie.
+
+Mierzy czas renderowania, rozmiar obrazu w pamięci, czas OCR oraz dokładność znakową
+na syntetycznych skanach (różne DPI skanera). Uruchomienie z katalogu głównego:
+    python -m benchmarks.bench_render --pages 6 --scan-dpi 200 300
+    python -m benchmarks.bench_render --no-ocr   # tylko renderowanie (bez Tesseract)
+"""
+
+import argparse
+import time
+
+import fitz  # PyMuPDF
+import pytesseract
+
+from benchmarks.synthetic import char_accuracy, make_page, make_scanned_pdf
+from render_policy import choose_ocr_dpi, pixmap_to_image, render_for_ocr
+
+POLICIES = {
+    "300dpi-rgb": lambda page: pixmap_to_image(page.get_pixmap(dpi=300)),
+    "adaptive-gray": lambda page: render_for_ocr(page, mode="gray"),
+    "adaptive-binary": lambda page: render_for_ocr(page, mode="binary"),
+}
+
+
+def image_bytes(img):
+    bits = {"1": 8, "L": 8, "RGB": 24, "RGBA": 32}[img.mode] # PIL trzyma tryb "1" jako bajt na piksel
+    return img.width * img.height * bits // 8
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--scan-dpi", type=int, nargs="+", default=[200, 300])
+    parser.add_argument("--lang", default="eng")
+    parser.add_argument("--no-ocr", action="store_true", help="Pomiń OCR (tylko renderowanie)")
+    args = parser.parse_args()
+
+    print(f"{'skan DPI':>8} {'polityka':>16} {'DPI':>5} {'render [ms]':>11} {'MB/str.':>8} {'OCR [s]':>8} {'dokładność':>10}")
+    for scan_dpi in args.scan_dpi:
+        pages = [make_page(i + 1, dpi=scan_dpi) for i in range(args.pages)]
+        doc = fitz.open(stream=make_scanned_pdf([img for img, _ in pages], jpeg_quality=85), filetype="pdf")
+        for name, render in POLICIES.items():
+            render_time = ocr_time = 0.0
+            size = 0
+            accuracy = []
+            for page, (_, reference) in zip(doc, pages):
+                start = time.perf_counter()
+                img = render(page)
+                render_time += time.perf_counter() - start
+                size += image_bytes(img)
+                if not args.no_ocr:
+                    start = time.perf_counter()
+                    text = pytesseract.image_to_string(img, lang=args.lang)
+                    ocr_time += time.perf_counter() - start
+                    accuracy.append(char_accuracy(text, reference))
+            dpi = 300 if name.startswith("300") else choose_ocr_dpi(doc[0])
+            acc = f"{sum(accuracy) / len(accuracy):>10.3f}" if accuracy else f"{'-':>10}"
+            ocr = f"{ocr_time / args.pages:>8.2f}" if not args.no_ocr else f"{'-':>8}"
+            print(f"{scan_dpi:>8} {name:>16} {dpi:>5} {render_time / args.pages * 1000:>11.1f} "
+                  f"{size / args.pages / 2**20:>8.1f} {ocr} {acc}")
+        doc.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark startu i przebiegów skryptu interfejsu: czas importu modułów app.py i opóźnienie ponownego przebiegu.
+
+- import: modułów, które app.py importuje na starcie (osobny proces na pomiar, mediana),
+  oraz najwolniejsze moduły według python -X importtime,
+- przebieg: app.py w streamlit.testing (AppTest) - pierwszy przebieg i kolejne
+  (jak po kliknięciu przycisku), bez dokumentu i z wynikiem zakończonego zadania.
+Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.bench_startup --repeat 5 --reruns 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Moduły importowane przez app.py (bez samego skryptu, który wymaga st.secrets)
+APP_IMPORTS = "import streamlit, core, export_service, jobs, markdown_stream, telemetry, token_budget"
+
+
+def import_seconds(repeat):
+    code = f"import time; t = time.perf_counter(); {APP_IMPORTS}; print(time.perf_counter() - t)"
+    times = [float(subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                                  check=True).stdout.split()[-1]) for _ in range(repeat)]
+    return statistics.median(times)
+
+
+def slowest_imports(top):
+    """Moduły z największym łącznym czasem importu (bez samego streamlit) [s]."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", APP_IMPORTS], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if "." not in name.strip() and not name.strip().startswith("streamlit"):
+            entries.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def finished_job(jobs_dir):
+    """Zakończone zadanie na dysku (jak po restarcie serwera) - wynik do wyświetlenia i eksportu."""
+    job_id = "b" * 32
+    translation = "\n\n".join(f"## Strona {i}\n\nAkapit **{i}** z *kursywą*.\n\n- punkt\n- punkt"
+                              for i in range(1, 51))
+    now = time.time()
+    state = {
+        "id": job_id, "filename": "bench.pdf", "status": "done", "error": None, "doc_hash": "bench",
+        "pages": list(range(1, 51)), "source_lang": "Angielski", "target_lang_llm": "Polish",
+        "progress": {"total": 50, "render": 50, "ocr": 50, "translate": 50}, "translation": translation,
+        "ocr_text": translation, "page_methods": [[i, "text", False] for i in range(1, 51)], "usage": None,
+        "requests": [], "timeline": {}, "spans": [], "created_at": now, "updated_at": now,
+        "started_at": now, "finished_at": now,
+    }
+    with open(os.path.join(jobs_dir, f"{job_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    return job_id
+
+
+def rerun_seconds(reruns, job_id=None):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    app.secrets["Openrouter_key"] = "sk-bench"
+    if job_id:
+        app.query_params["job"] = job_id
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        times.append(time.perf_counter() - start)
+    return first, statistics.median(times), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Pomiary importu (osobne procesy)")
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    # Stan zadań i eksportów w katalogu tymczasowym (przed importem app.py)
+    work_dir = tempfile.mkdtemp(prefix="bench-startup-")
+    os.environ["JOBS_DIR"] = os.path.join(work_dir, "jobs")
+    os.environ["EXPORTS_DIR"] = os.path.join(work_dir, "exports")
+    os.makedirs(os.environ["JOBS_DIR"])
+
+    print(f"Import modułów app.py: {import_seconds(args.repeat):.3f} s (mediana z {args.repeat})")
+    for seconds, name in slowest_imports(args.top):
+        print(f"  {name:<24} {seconds:.3f} s")
+    sys.path.insert(0, ROOT)
+    print(f"{'scenariusz':>16} {'1. przebieg [s]':>16} {'kolejny, mediana [ms]':>22} {'maks. [ms]':>11}")
+    for name, job_id in (("bez dokumentu", None), ("wynik zadania", finished_job(os.environ["JOBS_DIR"]))):
+        first, median, worst = rerun_seconds(args.reruns, job_id)
+        print(f"{name:>16} {first:>16.3f} {median * 1000:>22.1f} {worst * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark tłumaczenia fragmentami vs współbieżność, na lokalnym serwerze zgodnym z OpenAI.
+
+Uruchomienie z katalogu głównego repozytorium (serwer startuje automatycznie):
+    python -m benchmarks.bench_translation --paragraphs 40 --concurrency 1 4 8
+"""
+
+import argparse
+import time
+
+from benchmarks.mock_openai_server import start_in_background
+from translator import ChunkedTranslator
+
+
+def content_only(stream):
+    """Wyciąga tekst ze zdarzeń strumienia (bez usuwania bloku ```markdown)."""
+    for event in stream:
+        if event.choices and event.choices[0].delta.content:
+            yield event.choices[0].delta.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--chunk-tokens", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--ttft", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    server, base_url = start_in_background(ttft=args.ttft, token_delay=args.token_delay)
+    text = "\n\n".join(f"Paragraph {i}. " + "The court rules as follows. " * 20 for i in range(args.paragraphs))
+
+    print(f"{'współb.':>8} {'TTFT [s]':>9} {'czas [s]':>9}")
+    for concurrency in args.concurrency:
+        translator = ChunkedTranslator("mock", "Polish", "", base_url=base_url, max_concurrency=concurrency,
+                                       max_chunk_tokens=args.chunk_tokens, wrap_fn=content_only)
+        start = time.perf_counter()
+        ttft = None
+        for _ in translator.translate_stream(text):
+            ttft = ttft or time.perf_counter() - start
+        print(f"{concurrency:>8} {ttft:>9.2f} {time.perf_counter() - start:>9.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
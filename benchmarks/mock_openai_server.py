@@ -0,0 +1,170 @@
+"""Lokalny serwer zgodny z OpenAI (/v1/chat/completions) do testów i benchmarków tłumaczenia.
+
+Zwraca "tłumaczenie" będące echem tekstu z promptu, strumieniowane słowo po słowie
+z konfigurowalnym opóźnieniem. Uruchomienie:
+    python -m benchmarks.mock_openai_server --port 8000 --ttft 0.5 --token-delay 0.01
+a następnie w aplikacji: OPENROUTER_BASE_URL=http://127.0.0.1:8000/v1
+
+Do testów ponawiania i hedgingu: --error-rate (odsetek odpowiedzi z błędem --error-status
+i nagłówkiem Retry-After) oraz --slow-rate / --slow-ttft (odsetek zapytań z długim
+czasem do pierwszego tokenu, jak ogon opóźnień u dostawcy). Testy używają --fail-first
+(pierwsze N zapytań kończy się błędem - deterministycznie) i liczników serwera (stats).
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROMPT_RE = re.compile(r"Translate below text to (?P<lang>.+?):\n\n(?P<text>.*)\n\nTranslation to ", re.S)
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Ustawiane przez make_server
+    ttft = 0.0
+    token_delay = 0.0
+    markdown_fence = True
+    error_rate = 0.0
+    error_status = 429
+    retry_after = None
+    slow_rate = 0.0
+    slow_ttft = 5.0
+    fail_first = 0
+    stats = None # {"requests", "aborted"} - liczniki serwera (wspólne dla wątków obsługi)
+    lock = None
+
+    def log_message(self, format, *args):
+        pass # Bez logowania każdego zapytania
+
+    def _reply_text(self, messages):
+        prompt = messages[-1]["content"] if messages else ""
+        match = PROMPT_RE.search(prompt)
+        if not match:
+            return prompt
+        return f"[{match.group('lang')}] {match.group('text')}"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        text = self._reply_text(request.get("messages", []))
+        model = request.get("model", "mock")
+        created = int(time.time())
+
+        with self.lock:
+            self.stats["requests"] += 1
+            failing = self.stats["requests"] <= self.fail_first
+        if failing or random.random() < self.error_rate:
+            self.send_response(self.error_status)
+            body = json.dumps({"error": {"message": f"mock error {self.error_status}"}}).encode("utf-8")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if self.retry_after is not None:
+                self.send_header("Retry-After", str(self.retry_after))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        time.sleep(self.slow_ttft if random.random() < self.slow_rate else self.ttft)
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": "mock", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(content, finish_reason=None):
+            return json.dumps({
+                "id": "mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"content": content} if content is not None else {},
+                             "finish_reason": finish_reason}],
+            })
+
+        tokens = re.findall(r"\S+\s*|\s+", text)
+        if self.markdown_fence:
+            tokens = ["```", "markdown\n"] + tokens + ["\n``", "`"] # Jak modele: otwarcie i zamknięcie bloku
+        try:
+            for token in tokens:
+                send_event(chunk(token))
+                time.sleep(self.token_delay)
+            send_event(chunk(None, "stop"))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True # Klient przerwał strumień (np. przegrane zapytanie zabezpieczające)
+            with self.lock:
+                self.stats["aborted"] += 1
+
+
+def make_server(host="127.0.0.1", port=0, ttft=0.0, token_delay=0.0, markdown_fence=True, error_rate=0.0,
+                error_status=429, retry_after=None, slow_rate=0.0, slow_ttft=5.0, fail_first=0):
+    """Tworzy serwer (port=0 wybiera wolny port). Adres bazowy: f"http://{host}:{server.server_port}/v1".
+
+    Liczniki zapytań: server.RequestHandlerClass.stats.
+    """
+    handler = type("ConfiguredMockOpenAIHandler", (MockOpenAIHandler,), {
+        "ttft": ttft, "token_delay": token_delay, "markdown_fence": markdown_fence, "error_rate": error_rate,
+        "error_status": error_status, "retry_after": retry_after, "slow_rate": slow_rate, "slow_ttft": slow_ttft,
+        "fail_first": fail_first, "stats": {"requests": 0, "aborted": 0}, "lock": threading.Lock(),
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_in_background(**kwargs):
+    """Uruchamia serwer w wątku w tle. Zwraca (serwer, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--ttft", type=float, default=0.5, help="Opóźnienie przed pierwszym tokenem [s]")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Opóźnienie między tokenami [s]")
+    parser.add_argument("--no-fence", action="store_true", help="Nie otaczaj odpowiedzi blokiem ```markdown ... ```")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Odsetek zapytań kończonych błędem (0-1)")
+    parser.add_argument("--error-status", type=int, default=429, help="Kod HTTP zwracanego błędu")
+    parser.add_argument("--retry-after", type=float, default=None, help="Wartość nagłówka Retry-After przy błędzie [s]")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Odsetek zapytań z długim TTFT (0-1)")
+    parser.add_argument("--slow-ttft", type=float, default=5.0, help="TTFT wolnych zapytań [s]")
+    parser.add_argument("--fail-first", type=int, default=0, help="Liczba pierwszych zapytań kończonych błędem")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.ttft, args.token_delay, not args.no_fence, args.error_rate,
+                         args.error_status, args.retry_after, args.slow_rate, args.slow_ttft, args.fail_first)
+    print(f"Mock OpenAI: http://{args.host}:{server.server_port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Generowanie syntetycznych "zeskanowanych" stron do benchmarków (offline, bez plików wejściowych)."""
+
+import difflib
+import io
+import os
+import random
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Przykładowy tekst prawniczy - powtarzalny, aby wyniki były porównywalne między uruchomieniami
+SAMPLE_PARAGRAPHS = [
+    "The parties agree that this agreement shall be governed by the laws of the Republic of Poland.",
+    "Any disputes arising out of or in connection with this agreement shall be settled by the competent court.",
+    "The court, having examined the case file and heard the parties, rules as follows.",
+    "This document has been drawn up in two identical copies, one for each party.",
+]
+
+A4_POINTS = (595, 842) # Szerokość i wysokość A4 w punktach (1/72 cala)
+
+# Teksty w językach z core.LANGUAGES (klucz: kod Tesseract)
+LANGUAGE_PARAGRAPHS = {
+    "eng": SAMPLE_PARAGRAPHS,
+    "deu": [
+        "Die Parteien vereinbaren, dass dieser Vertrag dem Recht der Republik Polen unterliegt.",
+        "Das Gericht hat nach Prüfung der Akten und Anhörung der Parteien wie folgt entschieden.",
+    ],
+    "pol": [
+        "Strony zgodnie postanawiają, że umowa podlega prawu Rzeczypospolitej Polskiej.",
+        "Sąd, po rozpoznaniu sprawy i wysłuchaniu stron, orzeka, co następuje.",
+    ],
+    "kat": [
+        "მხარეები თანხმდებიან, რომ ეს ხელშეკრულება რეგულირდება პოლონეთის რესპუბლიკის კანონმდებლობით.",
+        "სასამართლომ, საქმის მასალების შესწავლის შემდეგ, გადაწყვიტა შემდეგი.",
+    ],
+    "ukr": [
+        "Сторони погоджуються, що цей договір регулюється законодавством Республіки Польща.",
+        "Суд, розглянувши матеріали справи та заслухавши сторони, ухвалив таке рішення.",
+    ],
+    "chi-sim": [
+        "双方同意本协议受波兰共和国法律管辖。",
+        "法院审查案卷并听取双方意见后，判决如下。",
+    ],
+    "chi-tra": [
+        "雙方同意本協議受波蘭共和國法律管轄。",
+        "法院審查案卷並聽取雙方意見後，判決如下。",
+    ],
+    "fra": [
+        "Les parties conviennent que le présent contrat est régi par le droit de la République de Pologne.",
+        "Le tribunal, après examen du dossier et audition des parties, statue comme suit.",
+    ],
+    "spa": [
+        "Las partes acuerdan que el presente contrato se rige por la legislación de la República de Polonia.",
+        "El tribunal, tras examinar el expediente y oír a las partes, resuelve lo siguiente.",
+    ],
+    "hin": [
+        "पक्षकार सहमत हैं कि यह अनुबंध पोलैंड गणराज्य के कानूनों द्वारा शासित होगा।",
+        "न्यायालय ने मामले की फ़ाइल की जांच करने के बाद निम्नलिखित निर्णय दिया।",
+    ],
+    "tur": [
+        "Taraflar, bu sözleşmenin Polonya Cumhuriyeti hukukuna tabi olduğunu kabul eder.",
+        "Mahkeme, dosyayı inceledikten ve tarafları dinledikten sonra aşağıdaki kararı vermiştir.",
+    ],
+}
+
+# Czcionki z pokryciem danego pisma (pierwsza dostępna); pozostałe języki - DEFAULT_FONTS
+DEFAULT_FONTS = ("DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Regular.ttf")
+SCRIPT_FONTS = {
+    "chi-sim": ("NotoSansCJK-Regular.ttc", "NotoSansSC-Regular.otf", "wqy-microhei.ttc", "wqy-zenhei.ttc"),
+    "chi-tra": ("NotoSansCJK-Regular.ttc", "NotoSansTC-Regular.otf", "wqy-microhei.ttc", "wqy-zenhei.ttc"),
+    "hin": ("NotoSansDevanagari-Regular.ttf", "Lohit-Devanagari.ttf", "gargi.ttf"),
+}
+
+
+def load_font(size, lang=None):
+    """Zwraca czcionkę TrueType dla pisma języka, jeśli jest dostępna, w przeciwnym razie wbudowaną czcionkę Pillow."""
+    for name in SCRIPT_FONTS.get(lang, ()) + DEFAULT_FONTS:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def font_name(lang=None):
+    """Nazwa czcionki użytej dla języka (do metadanych benchmarku - brak czcionki pisma zaniża dokładność OCR)."""
+    font = load_font(12, lang)
+    return getattr(font, "path", None) or "pillow-default"
+
+
+def make_page(page_no, dpi=300, rotation=0, paragraphs=None, seed=0, lang=None):
+    """Rysuje stronę A4 z tekstem, opcjonalnie obróconą o `rotation` stopni.
+
+    Zwraca (obraz RGB, tekst wzorcowy) - tekst służy do pomiaru dokładności OCR.
+    lang (kod Tesseract) wybiera tekst z LANGUAGE_PARAGRAPHS i czcionkę dla jego pisma.
+    """
+    rng = random.Random(seed + page_no)
+    width = int(A4_POINTS[0] * dpi / 72)
+    height = int(A4_POINTS[1] * dpi / 72)
+    font_size = max(8, int(11 * dpi / 72)) # ~11 pt
+    font = load_font(font_size, lang)
+
+    img = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(img)
+    margin = int(width * 0.1)
+    y = margin
+    lines = [f"Page {page_no}"]
+    draw.text((margin, y), lines[0], fill=0, font=font)
+    y += font_size * 2
+
+    paragraphs = paragraphs or LANGUAGE_PARAGRAPHS.get(lang, SAMPLE_PARAGRAPHS)
+    while y < height - margin - font_size:
+        line = rng.choice(paragraphs)
+        # Prosty podział na linie, by tekst mieścił się w marginesach (pisma bez spacji - po znakach)
+        spaced = " " in line
+        words, current = (line.split() if spaced else list(line)), ""
+        for word in words:
+            candidate = (f"{current} {word}" if spaced else current + word).strip()
+            if draw.textlength(candidate, font=font) > width - 2 * margin:
+                draw.text((margin, y), current, fill=0, font=font)
+                lines.append(current)
+                y += int(font_size * 1.4)
+                current = word
+            else:
+                current = candidate
+        if current:
+            draw.text((margin, y), current, fill=0, font=font)
+            lines.append(current)
+            y += int(font_size * 1.4)
+        y += font_size # Odstęp między akapitami
+
+    if rotation:
+        img = img.rotate(rotation, expand=True, fillcolor=255)
+    return img.convert("RGB"), "\n".join(lines)
+
+
+def make_page_image(page_no, dpi=300, rotation=0, paragraphs=None, seed=0):
+    """Jak make_page, ale zwraca tylko obraz."""
+    return make_page(page_no, dpi, rotation, paragraphs, seed)[0]
+
+
+def make_pages(count, dpi=300, rotate_every=0, seed=0):
+    """Zwraca listę `count` syntetycznych stron; co `rotate_every` strona jest obrócona o 90°."""
+    pages = []
+    for i in range(count):
+        rotation = 90 if rotate_every and (i + 1) % rotate_every == 0 else 0
+        pages.append(make_page_image(i + 1, dpi=dpi, rotation=rotation, seed=seed))
+    return pages
+
+
+def degrade_page(img, seed=0, skew=2.0, noise=25.0, speckle=0.01, border=True):
+    """Postarza stronę jak skan faksu: przekos, nierówne oświetlenie, szum, plamki i ciemne pasy przy brzegach.
+
+    skew - maksymalny kąt przekosu [°] (losowy znak i wielkość), noise - odchylenie szumu,
+    speckle - ułamek pikseli zamienionych w czarne plamki. Zwraca obraz w skali szarości.
+    """
+    rng = np.random.default_rng(seed)
+    img = img.convert("L")
+    if skew:
+        img = img.rotate(rng.uniform(-skew, skew), resample=Image.BICUBIC, fillcolor=255)
+    pixels = np.asarray(img, dtype=np.float32)
+    height, width = pixels.shape
+    # Oświetlenie ciemniejsze w jednym rogu strony
+    shade = 1 - 0.3 * (np.linspace(0, 1, height)[:, None] + np.linspace(0, 1, width)[None, :]) / 2
+    pixels = pixels * shade + rng.normal(0, noise, pixels.shape)
+    pixels[rng.random(pixels.shape) < speckle] = 0
+    if border:
+        pixels[:int(height * rng.uniform(0.01, 0.03))] = 20
+        pixels[:, width - int(width * rng.uniform(0.01, 0.03)):] = 20
+    degraded = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    degraded.info.update(img.info)
+    return degraded
+
+
+def _add_image_page(doc, img, jpeg_quality=None):
+    # Orientacja strony zgodna z obrazem (obrócone skany dają stronę poziomą)
+    width, height = A4_POINTS if img.width <= img.height else A4_POINTS[::-1]
+    page = doc.new_page(width=width, height=height)
+    buffer = io.BytesIO()
+    if jpeg_quality:
+        img.convert("RGB").save(buffer, "JPEG", quality=jpeg_quality)
+    else:
+        img.save(buffer, "PNG")
+    page.insert_image(page.rect, stream=buffer.getvalue())
+    return page
+
+
+def make_scanned_pdf(images, jpeg_quality=None):
+    """Składa PDF, w którym każda strona A4 to pełnostronicowy obraz (jak ze skanera). Zwraca bajty PDF."""
+    doc = fitz.open()
+    for img in images:
+        _add_image_page(doc, img, jpeg_quality)
+    pdf_bytes = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return pdf_bytes
+
+
+def make_document(page_count, lang="eng", dpis=(300,), rotations=(0,), text_layer_every=0, seed=0,
+                  jpeg_quality=85):
+    """Syntetyczny skan wielostronicowy: kolejne strony cyklicznie z dpis i rotations.
+
+    Strony są generowane i kodowane po jednej, więc nawet 500 stron w 300 DPI nie trzyma
+    obrazów w pamięci. Co text_layer_every strona dostaje niewidoczną warstwę tekstową
+    (jak PDF po OCR), więc trafia na ścieżkę bez Tesseract. Zwraca (bajty PDF, teksty wzorcowe stron).
+    """
+    doc = fitz.open()
+    fontfile = font_name(lang)
+    references = []
+    for i in range(page_count):
+        img, reference = make_page(i + 1, dpi=dpis[i % len(dpis)], rotation=rotations[i % len(rotations)],
+                                   seed=seed, lang=lang)
+        page = _add_image_page(doc, img, jpeg_quality)
+        if text_layer_every and (i + 1) % text_layer_every == 0:
+            # render_mode=3 - tekst niewidoczny, jak warstwa OCR w zeskanowanych PDF
+            page.insert_textbox(page.rect + (36, 36, -36, -36), reference, fontsize=9, render_mode=3,
+                                **({"fontname": "F0", "fontfile": fontfile} if os.path.isfile(fontfile) else {}))
+        references.append(reference)
+    pdf_bytes = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return pdf_bytes, references
+
+
+def char_accuracy(recognized, reference):
+    """Dokładność znakowa OCR (0..1) - podobieństwo tekstów po normalizacji białych znaków."""
+    a = " ".join(recognized.split())
+    b = " ".join(reference.split())
+    if not b:
+        return 1.0 if not a else 0.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
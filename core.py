@@ -0,0 +1,315 @@
+"""Rdzeń przetwarzania niezależny od Streamlit: PDF -> OCR -> tłumaczenie -> eksport.
+
+Z tego modułu korzysta interfejs (app.py) i przetwarzanie wsadowe (batch_translate.py).
+Import nie czyta st.secrets ani nie wyświetla niczego - błędy są zgłaszane
+wyjątkami, a sposób ich pokazania zależy od wywołującego.
+"""
+
+import io
+import json
+import os
+
+import fitz  # PyMuPDF
+
+from markdown_stream import strip_fence_stream
+from ocr_cache import document_hash, get_ocr_cache, tesseract_version
+from ocr_engine import ocr_pages
+from ocr_layout import PageLayout
+from page_results import get_page_results
+from pipeline import DocumentPipeline
+from render_policy import render_for_ocr
+from telemetry import Timeline, timed
+from token_budget import summarize_usage
+from translator import ChunkedTranslator, event_text
+from translation_memory import get_translation_memory
+
+# --- Konfiguracja ---
+
+SYSTEM_MESSAGES_PATH = os.environ.get(
+    "SYSTEM_MESSAGES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "system_messages.json")
+)
+PLACEHOLDER_API_KEY = "sk-or-v1-..."
+
+# Dostępne języki (Wyświetlana nazwa: kod Tesseract / kod dla LLM)
+LANGUAGES = {
+    "Angielski": ("eng", "English"),
+    "Niemiecki": ("deu", "German"),
+    "Polski": ("pol", "Polish"),
+    "Gruziński": ("kat", "Georgian"),
+    "Ukraiński": ("ukr", "Ukrainian"),
+    "Chiński (Uproszczony)": ("chi-sim", "Simplified Chinese"),
+    "Chiński (Tradycyjny)": ("chi-tra", "Traditional Chinese"),
+    "Francuski": ("fra", "French"),
+    "Hiszpański": ("spa", "Spanish"),
+    "Hinduski": ("hin", "Hindi"),
+    "Turecki": ("tur", "Turkish"),
+}
+
+
+def get_api_key():
+    """Klucz API OpenRouter ze zmiennej środowiskowej OPENROUTER_API_KEY (poza Streamlit)."""
+    return os.environ.get("OPENROUTER_API_KEY")
+
+
+def load_system_messages(path=SYSTEM_MESSAGES_PATH):
+    """Wczytuje komunikaty systemowe (język docelowy -> prompt) z pliku JSON."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_system_message(system_messages, target_lang_llm):
+    """Komunikat systemowy dla języka docelowego (lub domyślny, lub pusty)."""
+    return system_messages.get(target_lang_llm, system_messages.get("default")) or ""
+
+
+def resolve_language(name):
+    """Zwraca wyświetlaną nazwę języka z LANGUAGES na podstawie nazwy, kodu Tesseract lub nazwy dla LLM."""
+    wanted = name.strip().lower()
+    for display_name, (tesseract_code, llm_name) in LANGUAGES.items():
+        if wanted in (display_name.lower(), tesseract_code.lower(), llm_name.lower()):
+            return display_name
+    raise ValueError(f"Nieznany język: {name}. Dostępne: {', '.join(LANGUAGES)}")
+
+
+def parse_page_numbers(selection_str, max_pages):
+    """Parsuje ciąg znaków z numerami stron (np. '1, 3, 5-7') do listy. Zgłasza ValueError przy błędzie."""
+    pages = set()
+    if not selection_str or not selection_str.strip():
+        # Jeśli puste, zwróć wszystkie strony
+        return list(range(1, max_pages + 1))
+
+    # Usuń białe znaki i podziel po przecinkach
+    parts = selection_str.replace(" ", "").split(',')
+    for part in parts:
+        if not part: continue # Ignoruj puste części (np. po podwójnym przecinku)
+        if '-' in part:
+            # Obsługa zakresu
+            start_str, end_str = part.split('-')
+            start = int(start_str)
+            end = int(end_str)
+            if not (1 <= start <= end <= max_pages):
+                raise ValueError(f"Nieprawidłowy zakres stron: {part}. Dostępne: 1-{max_pages}")
+            pages.update(range(start, end + 1))
+        else:
+            # Obsługa pojedynczej strony
+            page_num = int(part)
+            if not (1 <= page_num <= max_pages):
+                raise ValueError(f"Numer strony poza zakresem: {page_num}. Dostępne: 1-{max_pages}")
+            pages.add(page_num)
+
+    if not pages:
+        raise ValueError("Nie wybrano żadnych stron.")
+
+    return sorted(pages)
+
+
+def open_pdf_document(pdf_bytes):
+    """Otwiera dokument PDF z bajtów i zwraca uchwyt fitz.Document."""
+    return fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+def inspect_pdf_document(doc):
+    """Zwraca metadane dokumentu (liczba stron, rozmiary, rotacja) bez rasteryzacji stron."""
+    pages_info = []
+    for page in doc:
+        # page.rect uwzględnia /Rotate, mediabox to wymiary "surowe" strony
+        pages_info.append({
+            "number": page.number + 1, # 1-indeksowane, jak w wyborze stron
+            "width": page.rect.width, # w punktach (1/72 cala)
+            "height": page.rect.height,
+            "rotation": page.rotation,
+            "image_count": len(page.get_images(full=False)),
+        })
+    return {
+        "page_count": len(doc),
+        "metadata": dict(doc.metadata or {}),
+        "is_encrypted": doc.is_encrypted,
+        "pages": pages_info,
+    }
+
+
+def extract_images_from_pdf(doc, selected_pages=None):
+    """Renderuje wybrane strony otwartego dokumentu do OCR. Zwraca (obrazy, liczba stron w dokumencie).
+
+    Dokument nie jest zamykany - odpowiada za to wywołujący.
+    """
+    total_pages_in_doc = len(doc)
+    if selected_pages is None:
+        selected_pages = list(range(1, total_pages_in_doc + 1))
+    invalid_pages = [p for p in selected_pages if not (1 <= p <= total_pages_in_doc)]
+    if invalid_pages:
+        raise ValueError(f"Numery stron poza zakresem: {invalid_pages}. Dokument ma {total_pages_in_doc} stron.")
+    # Adaptacyjne DPI, skala szarości - patrz render_policy
+    with timed("extract_images", pages=len(selected_pages)):
+        images = [render_for_ocr(doc.load_page(page_no - 1)) for page_no in selected_pages]
+    return images, total_pages_in_doc
+
+
+def tesseract_available():
+    """Sprawdza, czy Tesseract jest zainstalowany i dostępny w PATH (wynik pozytywny zapamiętany na proces)."""
+    import pytesseract
+    try:
+        tesseract_version()
+        return True
+    except pytesseract.TesseractNotFoundError:
+        return False
+
+
+def perform_ocr(images, lang_code, max_workers=None, progress_callback=None):
+    """Wykonuje OCR na liście obrazów (równolegle, z wykrywaniem orientacji) i zwraca tekst stron."""
+    if not images:
+        return ""
+    results = ocr_pages(images, lang_code, max_workers=max_workers, progress_callback=progress_callback)
+    return "\n\n".join(result["text"] for result in results).strip() # Separator między stronami
+
+
+def perform_ocr_layouts(images, lang_code, max_workers=None, progress_callback=None):
+    """Jak perform_ocr, ale zwraca układ każdej strony (PageLayout: bloki, linie, ramki, pewność)."""
+    results = ocr_pages(images, lang_code, max_workers=max_workers, progress_callback=progress_callback)
+    return [PageLayout.from_dict(result["layout"]) for result in results]
+
+
+def create_translator(api_key, source_lang_name, target_lang_llm, system_messages=None, timeline=None):
+    """Tworzy tłumacza fragmentów (ChunkedTranslator) dla języka docelowego.
+
+    timeline (telemetry.Timeline) zbiera czasy zapytań (TTFT, czas całkowity) i wrap strumienia.
+    """
+    if not api_key or api_key == PLACEHOLDER_API_KEY:
+        raise ValueError("Klucz API OpenRouter nie został ustawiony.")
+    if system_messages is None:
+        system_messages = load_system_messages()
+    # Adres API i model można zmienić zmiennymi OPENROUTER_BASE_URL / TRANSLATION_MODEL
+    # (np. lokalny serwer zgodny z OpenAI: http://172.17.0.1:8000/v1)
+    return ChunkedTranslator(
+        api_key=api_key,
+        target_lang_llm=target_lang_llm,
+        system_message=get_system_message(system_messages, target_lang_llm),
+        wrap_fn=wrap_stream_for_markdown, # Każdy fragment może być otoczony ```markdown ... ```
+        source_lang=source_lang_name,
+        translation_memory=get_translation_memory(), # Powtarzające się segmenty bez wywołania API
+        timeline=timeline,
+    )
+
+
+def translate_text_stream(text_to_translate, api_key, source_lang_name, target_lang_llm, system_messages=None):
+    """Tłumaczy tekst (we fragmentach, współbieżnie) i streamuje tłumaczenie w kolejności."""
+    translator = create_translator(api_key, source_lang_name, target_lang_llm, system_messages)
+    return translator.translate_stream(text_to_translate)
+
+
+def start_pipeline(doc, page_numbers, source_lang_name, target_lang_llm, api_key, doc_hash=None,
+                   system_messages=None, max_workers=None):
+    """Uruchamia potok render -> OCR -> tłumaczenie dla wybranych stron otwartego dokumentu.
+
+    Po udanym starcie potok przejmuje dokument i zamyka go po renderowaniu.
+    doc_hash (skrót bajtów PDF) włącza cache wyników OCR i wyniki stron (strony
+    przetworzone wcześniej są brane z tłumaczeniem, bez OCR i API). Czasy wszystkich etapów
+    trafiają do wspólnej osi czasu pipeline.timeline.
+    """
+    timeline = Timeline()
+    translator = create_translator(api_key, source_lang_name, target_lang_llm, system_messages, timeline=timeline)
+    return DocumentPipeline(
+        doc, page_numbers, LANGUAGES[source_lang_name][0], translator, max_workers=max_workers,
+        doc_hash=doc_hash, ocr_cache=get_ocr_cache(), # Powtórne OCR tych samych stron z cache
+        page_results=get_page_results(), # Po zmianie wyboru stron przetwarzane są tylko nowe strony
+        timeline=timeline,
+    ).start()
+
+
+def process_document(pdf_bytes, source_lang_name, target_lang_llm, api_key, page_selection="",
+                     system_messages=None, max_workers=None, on_page=None):
+    """Przetwarza cały dokument bez interfejsu i zwraca tłumaczenie, tekst OCR, sposób odczytu stron,
+    strony z liniami o niskiej pewności OCR, dane stron do PDF dwujęzycznego oraz zużycie tokenów
+    (suma i rekordy poszczególnych zapytań) i czasy etapów (podsumowanie i oś czasu)."""
+    doc = open_pdf_document(pdf_bytes)
+    try:
+        page_count = len(doc)
+        page_numbers = parse_page_numbers(page_selection, page_count)
+        pipeline = start_pipeline(doc, page_numbers, source_lang_name, target_lang_llm, api_key,
+                                  doc_hash=document_hash(pdf_bytes), system_messages=system_messages,
+                                  max_workers=max_workers)
+    except Exception:
+        doc.close()
+        raise
+    translation = "".join(event_text(event) for event in pipeline.stream_translation(on_page=on_page))
+    return {
+        "page_count": page_count,
+        "pages": page_numbers,
+        "translation": translation,
+        "ocr_text": pipeline.ocr_text,
+        "page_methods": pipeline.page_methods(),
+        "low_confidence": pipeline.low_confidence_lines(),
+        "incomplete_pages": list(pipeline.incomplete_pages), # Tłumaczenie ucięte limitem tokenów modelu
+        "bilingual_pages": pipeline.bilingual_pages(), # Generator stron dla pdf_overlay.write_bilingual_pdf
+        "usage": summarize_usage(pipeline.translator.usage),
+        "requests": list(pipeline.translator.usage),
+        "timeline": pipeline.timeline.summary(),
+        "spans": pipeline.timeline.spans(),
+    }
+
+
+# --- Funkcja opakowująca strumień ---
+
+def wrap_stream_for_markdown(stream):
+    """Generator tekstu odpowiedzi bez bloku ```markdown ... ``` otaczającego całą odpowiedź.
+
+    Usuwa otwarcie na początku i zamknięcie na końcu, wstrzymując tylko linię, która
+    może być zamykającym ``` - reszta tekstu płynie dalej od razu (markdown_stream.FenceStripper).
+    """
+    return strip_fence_stream(text for text in map(event_text, stream) if text)
+
+
+# --- Funkcje eksportu ---
+
+def markdown_to_docx(markdown_text, output_filename="translation_export.docx"):
+    """Konwertuje tekst w formacie Markdown na plik DOCX."""
+    # Import na żądanie: python-docx i markdown są potrzebne tylko przy eksporcie
+    from docx_export import markdown_to_docx_bytes
+
+    with timed("export_docx", chars=len(markdown_text)):
+        return markdown_to_docx_bytes(markdown_text)
+
+
+def markdown_to_pdf(markdown_text, output_filename="translation_export.pdf"):
+    """Konwertuje tekst w formacie Markdown na plik PDF."""
+    with timed("export_pdf", chars=len(markdown_text)):
+        return _markdown_to_pdf(markdown_text)
+
+
+def _markdown_to_pdf(markdown_text):
+    # Import na żądanie: WeasyPrint wymaga bibliotek systemowych (Pango), których
+    # nie potrzeba, gdy eksportujemy tylko do Markdown/DOCX (np. w trybie wsadowym)
+    import markdown
+    from weasyprint import HTML
+
+    # Konwertuj Markdown na HTML
+    html_content = markdown.markdown(markdown_text)
+
+    # Dodanie podstawowych stylów dla lepszego wyglądu
+    styled_html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.5; margin: 2cm; }}
+            h1, h2, h3, h4, h5, h6 {{ color: #333; margin-top: 1em; }}
+            p {{ margin: 0.5em 0; }}
+            blockquote {{ border-left: 3px solid #ccc; padding-left: 1em; color: #666; }}
+            ul, ol {{ margin: 0.5em 0; padding-left: 2em; }}
+            code {{ background: #f4f4f4; padding: 0.2em 0.4em; border-radius: 3px; }}
+            pre {{ background: #f4f4f4; padding: 1em; border-radius: 5px; overflow-x: auto; }}
+        </style>
+    </head>
+    <body>
+        {html_content}
+    </body>
+    </html>
+    """
+
+    # Konwersja HTML na PDF za pomocą WeasyPrint
+    pdf_bytes = io.BytesIO()
+    HTML(string=styled_html).write_pdf(pdf_bytes)
+    pdf_bytes.seek(0)
+
+    return pdf_bytes
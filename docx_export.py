@@ -0,0 +1,341 @@
+"""Eksport Markdown -> DOCX bez pośredniego HTML.
+
+Tekst jest parsowany przez Python-Markdown do drzewa elementów (to samo drzewo,
+z którego powstaje HTML eksportu PDF), a drzewo jest przechodzone raz:
+- bloki (nagłówki, akapity, listy zagnieżdżone, tabele, cytaty, kod, linie poziome)
+  stają się akapitami i tabelami python-docx,
+- formatowanie w tekście (pogrubienie, kursywa, kod, przekreślenie, odnośniki)
+  staje się osobnymi fragmentami (runs) z własnym formatowaniem.
+
+DocxBuilder przyjmuje tekst porcjami (np. kolejne kompletne bloki Markdown
+z markdown_stream), więc dokument może być budowany w miarę tłumaczenia.
+"""
+
+import html
+import io
+import re
+
+import markdown
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt, RGBColor
+
+# sane_lists: numeracja listy od pierwszego numeru (np. "3." po podziale tekstu na bloki)
+MARKDOWN_EXTENSIONS = ["tables", "fenced_code", "sane_lists"]
+
+FONT_NAME = "Arial"
+FONT_SIZE = Pt(11)
+CODE_FONT = "Courier New"
+LINK_COLOR = RGBColor(0x05, 0x63, 0xC1)
+
+HEADINGS = {f"h{level}": level for level in range(1, 7)}
+# Style list python-docx według zagnieżdżenia (głębsze poziomy używają ostatniego stylu)
+LIST_STYLES = {
+    "ul": ("List Bullet", "List Bullet 2", "List Bullet 3"),
+    "ol": ("List Number", "List Number 2", "List Number 3"),
+}
+LIST_CONTINUE_STYLES = ("List Continue", "List Continue 2", "List Continue 3")
+# Formatowanie fragmentu tekstu według znacznika
+INLINE_FORMATS = {
+    "strong": "bold", "b": "bold", "em": "italic", "i": "italic", "code": "code",
+    "del": "strike", "s": "strike", "strike": "strike", "u": "underline", "ins": "underline",
+    "sup": "superscript", "sub": "subscript", "a": "link",
+}
+ALIGNMENTS = {"left": WD_ALIGN_PARAGRAPH.LEFT, "center": WD_ALIGN_PARAGRAPH.CENTER,
+              "right": WD_ALIGN_PARAGRAPH.RIGHT}
+
+_PLACEHOLDER_RE = re.compile("\x02wzxhzdk:(\\d+)\x03") # Surowy HTML / blok kodu odłożony przez Python-Markdown
+_TAG_RE = re.compile(r"<[^>]+>")
+_ALIGN_RE = re.compile(r"text-align:\s*(\w+)")
+_LIST_ITEM_RE = re.compile(r"^([ \t]*)(?:[-*+]|\d+[.)])[ \t]+\S")
+_FENCE_RE = re.compile(r"^[ \t]*(```|~~~)")
+# Python-Markdown zagnieżdża listy i akapity w elemencie listy tylko przy wcięciu 4 spacji
+LIST_INDENT = 4
+
+
+def _normalize_list_indent(lines):
+    """Wcięcia list zagnieżdżonych (często 2 lub 3 spacje w odpowiedziach modeli) zamienione na LIST_INDENT.
+
+    Element listy wcięty o co najmniej 2 spacje względem poprzedniego jest jego podlistą;
+    wcięte linie kontynuacji dostają wcięcie elementu, do którego należą. Bloki kodu
+    (```) zostają bez zmian.
+    """
+    out = []
+    stack = [] # Otwarte elementy listy: (wcięcie w tekście, wcięcie po normalizacji)
+    in_code = previous_blank = False
+    for line in lines:
+        fence = _FENCE_RE.match(line)
+        if fence:
+            in_code = not in_code
+            if not fence.start(1):
+                stack = [] # Blok kodu bez wcięcia kończy listę
+        if in_code or fence:
+            out.append(line)
+            continue
+        if not line.strip():
+            previous_blank = True
+            out.append(line)
+            continue
+        body = line.lstrip(" \t")
+        indent = len(line[:len(line) - len(body)].expandtabs(LIST_INDENT))
+        item = _LIST_ITEM_RE.match(line)
+        if item and (stack or indent < LIST_INDENT):
+            while stack and indent < stack[-1][0] + 2:
+                stack.pop()
+            new_indent = stack[-1][1] + LIST_INDENT if stack else 0
+            stack.append((indent, new_indent))
+            line = " " * new_indent + body
+        elif stack and indent:
+            # Kontynuacja elementu listy (np. akapit po pustej linii)
+            while len(stack) > 1 and indent < stack[-1][0] + 2:
+                stack.pop()
+            line = " " * (stack[-1][1] + LIST_INDENT) + body
+        elif previous_blank:
+            stack = [] # Tekst bez wcięcia po pustej linii kończy listę
+        previous_blank = False
+        out.append(line)
+    return out
+
+
+def _set_run_format(run, formats):
+    if "bold" in formats:
+        run.bold = True
+    if "italic" in formats:
+        run.italic = True
+    if "strike" in formats:
+        run.font.strike = True
+    if "underline" in formats or "link" in formats:
+        run.underline = True
+    if "link" in formats:
+        run.font.color.rgb = LINK_COLOR
+    if "code" in formats:
+        run.font.name = CODE_FONT
+    if "superscript" in formats:
+        run.font.superscript = True
+    elif "subscript" in formats:
+        run.font.subscript = True
+
+
+class DocxBuilder:
+    """Dokument DOCX budowany z kolejnych porcji tekstu Markdown."""
+
+    def __init__(self):
+        self.doc = Document()
+        style = self.doc.styles["Normal"]
+        style.font.name = FONT_NAME
+        style.font.size = FONT_SIZE
+        self._md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        # Identyfikatory stylów po nazwie - wyszukiwanie stylu przez python-docx przegląda wszystkie style
+        self._style_ids = {}
+        self._abstract_num_ids = {}
+
+    def _style_id(self, name):
+        if name not in self._style_ids:
+            self._style_ids[name] = self.doc.styles[name].style_id
+        return self._style_ids[name]
+
+    def _paragraph(self, style=None):
+        paragraph = self.doc.add_paragraph()
+        if style is not None:
+            paragraph._p.style = self._style_id(style)
+        return paragraph
+
+    # --- Parsowanie ---
+
+    def _parse(self, text):
+        """Drzewo elementów Markdown (jak Markdown.convert, ale bez serializacji do HTML)."""
+        md = self._md.reset()
+        lines = _normalize_list_indent(text.split("\n"))
+        for preprocessor in md.preprocessors:
+            lines = preprocessor.run(lines)
+        root = md.parser.parseDocument(lines).getroot()
+        for treeprocessor in md.treeprocessors:
+            new_root = treeprocessor.run(root)
+            if new_root is not None:
+                root = new_root
+        return root
+
+    def _raw_html(self, text):
+        """Tekst z odłożonymi fragmentami surowego HTML zamienionymi na ich treść (bez znaczników)."""
+        stash = self._md.htmlStash.rawHtmlBlocks
+        return _PLACEHOLDER_RE.sub(lambda m: html.unescape(_TAG_RE.sub("", str(stash[int(m.group(1))]))), text)
+
+    # --- API ---
+
+    def add(self, markdown_text):
+        """Dopisuje do dokumentu porcję tekstu Markdown (najlepiej kompletne bloki)."""
+        if not markdown_text.strip():
+            return
+        for element in self._parse(markdown_text):
+            self._add_block(element)
+
+    def save(self):
+        """Zwraca dokument jako BytesIO (ustawiony na początek)."""
+        output = io.BytesIO()
+        self.doc.save(output)
+        output.seek(0)
+        return output
+
+    # --- Bloki ---
+
+    def _add_block(self, element, style=None, level=0):
+        tag = element.tag
+        if tag in HEADINGS:
+            self._add_inline(self._paragraph(f"Heading {HEADINGS[tag]}"), element)
+        elif tag == "p":
+            raw = _PLACEHOLDER_RE.fullmatch((element.text or "").strip()) if len(element) == 0 else None
+            if raw is not None and str(self._md.htmlStash.rawHtmlBlocks[int(raw.group(1))]).startswith("<pre"):
+                self._add_code(self._raw_html(element.text)) # Blok ``` (fenced_code)
+            else:
+                self._add_inline(self._paragraph(style), element)
+        elif tag in LIST_STYLES:
+            self._add_list(element, level)
+        elif tag == "blockquote":
+            for child in element:
+                self._add_block(child, style="Quote", level=level)
+        elif tag == "pre":
+            self._add_code("".join(element.itertext()))
+        elif tag == "table":
+            self._add_table(element)
+        elif tag == "hr":
+            self._add_rule()
+        else:
+            # Nieznany kontener (np. div) - jego tekst jako akapit, dzieci jako bloki
+            if (element.text or "").strip():
+                self._add_text(self._paragraph(style), element.text)
+            for child in element:
+                self._add_block(child, style=style, level=level)
+
+    def _add_code(self, text):
+        paragraph = self.doc.add_paragraph()
+        lines = text.rstrip("\n").split("\n")
+        for index, line in enumerate(lines):
+            run = paragraph.add_run(line)
+            run.font.name = CODE_FONT
+            run.font.size = Pt(9)
+            if index < len(lines) - 1:
+                run.add_break()
+
+    def _add_rule(self):
+        paragraph = self.doc.add_paragraph()
+        border = OxmlElement("w:pBdr")
+        bottom = OxmlElement("w:bottom")
+        for key, value in (("w:val", "single"), ("w:sz", "6"), ("w:space", "1"), ("w:color", "auto")):
+            bottom.set(qn(key), value)
+        border.append(bottom)
+        paragraph._p.get_or_add_pPr().append(border)
+
+    def _add_list(self, element, level):
+        styles = LIST_STYLES[element.tag]
+        style = styles[min(level, len(styles) - 1)]
+        num_id = self._restart_numbering(style, element.get("start", "1")) if element.tag == "ol" else None
+        for item in element.findall("li"):
+            paragraph = self._paragraph(style)
+            if num_id is not None:
+                numbering = paragraph._p.get_or_add_pPr().get_or_add_numPr()
+                numbering.get_or_add_ilvl().val = 0
+                numbering.get_or_add_numId().val = num_id
+            self._add_list_item(paragraph, item, level)
+
+    def _add_list_item(self, paragraph, item, level):
+        """Treść punktu listy: tekst do akapitu punktu, kolejne akapity i listy zagnieżdżone pod nim."""
+        used = bool((item.text or "").strip())
+        if used:
+            self._add_text(paragraph, item.text.lstrip())
+        for child in item:
+            if child.tag in LIST_STYLES:
+                self._add_list(child, level + 1)
+            elif child.tag == "p":
+                if used:
+                    # Lista "luźna" z kilkoma akapitami w punkcie
+                    paragraph = self._paragraph(LIST_CONTINUE_STYLES[min(level, len(LIST_CONTINUE_STYLES) - 1)])
+                self._add_inline(paragraph, child)
+                used = True
+            elif child.tag in HEADINGS or child.tag in ("blockquote", "pre", "table", "hr"):
+                self._add_block(child, level=level + 1)
+            else:
+                self._add_inline_element(paragraph, child, frozenset())
+                used = True
+                if child.tail:
+                    self._add_text(paragraph, child.tail)
+                continue
+            if child.tail and child.tail.strip():
+                self._add_text(paragraph, child.tail)
+
+    def _restart_numbering(self, style, start):
+        """Nowa instancja numeracji stylu listy, aby każda lista numerowana zaczynała się od start."""
+        numbering = self.doc.part.numbering_part.numbering_definitions._numbering
+        if style not in self._abstract_num_ids:
+            style_numbering = self.doc.styles[style].element.pPr.numPr
+            self._abstract_num_ids[style] = numbering.num_having_numId(style_numbering.numId.val).abstractNumId.val
+        num = numbering.add_num(self._abstract_num_ids[style])
+        level = num.add_lvlOverride(ilvl=0)
+        level.add_startOverride(int(start) if str(start).isdigit() else 1)
+        return num.numId
+
+    def _add_table(self, element):
+        rows = list(element.iter("tr"))
+        columns = max((len(row) for row in rows), default=0)
+        if not columns:
+            return
+        table = self.doc.add_table(rows=0, cols=columns)
+        table._tbl.tblStyle_val = self._style_id("Table Grid")
+        for row in rows:
+            cells = table.add_row().cells
+            for cell, source in zip(cells, row):
+                paragraph = cell.paragraphs[0]
+                align = _ALIGN_RE.search(source.get("style", "") or source.get("align", ""))
+                if align and align.group(1) in ALIGNMENTS:
+                    paragraph.alignment = ALIGNMENTS[align.group(1)]
+                self._add_inline(paragraph, source, frozenset({"bold"}) if source.tag == "th" else frozenset())
+
+    # --- Tekst w akapicie ---
+
+    def _add_text(self, paragraph, text, formats=frozenset()):
+        # Miękkie złamania linii w akapicie Markdown to spacje (jak w HTML)
+        text = self._raw_html(text).replace("\n", " ").replace("\t", " ")
+        if text:
+            # w:t wprost - Run.text przetwarza tekst znak po znaku (tabulatory, złamania linii)
+            run = paragraph.add_run()
+            run._r.add_t(text)
+            _set_run_format(run, formats)
+
+    def _add_inline(self, paragraph, element, formats=frozenset()):
+        """Tekst i elementy w tekście (bez samego znacznika element) jako fragmenty akapitu."""
+        if element.text:
+            self._add_text(paragraph, element.text, formats)
+        for child in element:
+            self._add_inline_element(paragraph, child, formats)
+            if child.tail:
+                # Po złamaniu linii (dwie spacje na końcu) znak nowej linii nie jest spacją
+                self._add_text(paragraph, child.tail.lstrip("\n") if child.tag == "br" else child.tail, formats)
+
+    def _add_inline_element(self, paragraph, element, formats):
+        tag = element.tag
+        if tag == "br":
+            paragraph.add_run().add_break()
+        elif tag == "img":
+            self._add_text(paragraph, element.get("alt") or element.get("src", ""), formats | {"italic"})
+        elif tag == "a" and element.get("href"):
+            start = len(paragraph._p)
+            self._add_inline(paragraph, element, formats | {"link"})
+            # Fragmenty odnośnika przenoszone do w:hyperlink z relacją do adresu
+            link = OxmlElement("w:hyperlink")
+            link.set(qn("r:id"), self.doc.part.relate_to(element.get("href"), RELATIONSHIP_TYPE.HYPERLINK,
+                                                          is_external=True))
+            for run in list(paragraph._p)[start:]:
+                link.append(run)
+            paragraph._p.append(link)
+        else:
+            format_name = INLINE_FORMATS.get(tag)
+            self._add_inline(paragraph, element, formats | {format_name} if format_name else formats)
+
+
+def markdown_to_docx_bytes(markdown_text):
+    """Cały tekst Markdown jako DOCX (BytesIO)."""
+    builder = DocxBuilder()
+    builder.add(markdown_text)
+    return builder.save()
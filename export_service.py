@@ -0,0 +1,244 @@
+"""Pliki eksportu tłumaczenia (Markdown, DOCX, PDF) generowane w tle i trzymane w cache na dysku.
+
+Kluczem jest skrót tekstu tłumaczenia i format, więc ten sam tekst jest
+konwertowany raz - niezależnie od liczby przebiegów skryptu, sesji i pobrań.
+Dwujęzyczny PDF w układzie oryginału (BILINGUAL_FORMAT, pdf_overlay) wymaga
+pliku źródłowego i układów stron, więc zleca go zadanie (submit_bilingual),
+a kluczem jest skrót dokumentu i tłumaczeń stron. Kopia pliku źródłowego i strony
+(JSON Lines) czekają na generowanie na dysku, nie w pamięci.
+Zadanie zgłasza tłumaczenie zaraz po zakończeniu, a interfejs tylko sprawdza,
+czy plik jest gotowy, i podaje go do st.download_button (bez osadzania w stronie).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import core
+from pdf_overlay import read_pages_file, write_bilingual_pdf, write_pages_file
+from structured_log import get_logger, log_event
+
+# --- Konfiguracja ---
+
+EXPORTS_DIR = os.environ.get(
+    "EXPORTS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pdf-translator", "exports")
+)
+# Formaty generowane w tle po zakończeniu tłumaczenia
+EXPORT_FORMATS = tuple(f.strip() for f in os.environ.get("EXPORT_FORMATS", "docx,pdf,bilingual").split(",") if f.strip())
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 1))
+# Po tym czasie nieużywane pliki eksportu są usuwane [h]
+EXPORT_RETENTION_HOURS = float(os.environ.get("EXPORT_RETENTION_HOURS", 24 * 7))
+
+FORMATS = ("md", "docx", "pdf")
+# Oryginał i tłumaczenie obok siebie, w układzie stron oryginału (tylko z zadania - wymaga pliku PDF)
+BILINGUAL_FORMAT = "bilingual"
+MIME_TYPES = {
+    "md": "text/markdown",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+    BILINGUAL_FORMAT: "application/pdf",
+}
+FILE_EXTENSIONS = {BILINGUAL_FORMAT: "bilingual.pdf"}
+
+STATUS_PENDING = "pending"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+STATUS_MISSING = "missing" # Nikt nie generuje pliku i nie ma go na dysku (np. po restarcie lub prune)
+
+logger = get_logger("exports")
+
+
+def check_export_formats(formats=EXPORT_FORMATS):
+    """Zgłasza ValueError dla formatów spoza FORMATS i BILINGUAL_FORMAT (plik nigdy by nie powstał)."""
+    unknown = [fmt for fmt in formats if fmt not in FORMATS and fmt != BILINGUAL_FORMAT]
+    if unknown:
+        raise ValueError(f"Nieznane formaty w EXPORT_FORMATS: {', '.join(unknown)} "
+                         f"(dostępne: {', '.join(FORMATS + (BILINGUAL_FORMAT,))})")
+
+
+def translation_hash(translation):
+    """Skrót tekstu tłumaczenia (klucz cache eksportu)."""
+    return hashlib.sha256(translation.encode("utf-8")).hexdigest()
+
+
+def bilingual_hash(doc_hash, pages_path):
+    """Skrót dwujęzycznego PDF: dokument oraz tłumaczenia i układy stron (plik z write_pages_file)."""
+    digest = hashlib.sha256(json.dumps(doc_hash).encode("utf-8"))
+    with open(pages_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_bytes(translation, fmt):
+    """Zwraca bajty pliku tłumaczenia w danym formacie."""
+    if fmt == "md":
+        return translation.encode("utf-8")
+    if fmt == "docx":
+        return core.markdown_to_docx(translation).getvalue()
+    if fmt == "pdf":
+        return core.markdown_to_pdf(translation).getvalue()
+    raise ValueError(f"Nieznany format eksportu: {fmt}")
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ExportService:
+    """Cache plików eksportu z generowaniem w puli wątków (jedna instancja na proces serwera)."""
+
+    def __init__(self, exports_dir=EXPORTS_DIR, max_workers=EXPORT_WORKERS):
+        check_export_formats() # Przy starcie serwera - nieznany format czekałby bez końca
+        self.exports_dir = exports_dir
+        os.makedirs(self.exports_dir, exist_ok=True)
+        # (skrót, format) -> Future generowania w toku lub nieudanego (udane są usuwane - plik jest na dysku)
+        self._futures = {}
+        self._lock = threading.RLock() # Wywołanie zwrotne zakończonego Future działa od razu, pod blokadą
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="export")
+        self.prune()
+
+    def path(self, text_hash, fmt):
+        return os.path.join(self.exports_dir, f"{text_hash}.{FILE_EXTENSIONS.get(fmt, fmt)}")
+
+    def submit(self, translation, formats=EXPORT_FORMATS, retry=False):
+        """Zleca wygenerowanie brakujących formatów w tle. Zwraca skrót tłumaczenia.
+
+        retry=True ponawia formaty, których generowanie wcześniej się nie powiodło.
+        """
+        text_hash = translation_hash(translation)
+        with self._lock:
+            for fmt in formats:
+                if fmt not in FORMATS:
+                    continue # Np. BILINGUAL_FORMAT - zlecany przez submit_bilingual
+                key = (text_hash, fmt)
+                future = self._futures.get(key)
+                if future is not None and not (retry and future.done() and future.exception() is not None):
+                    continue
+                if future is None and os.path.exists(self.path(text_hash, fmt)):
+                    continue
+                self._track(key, self._executor.submit(self._generate, translation, text_hash, fmt))
+        return text_hash
+
+    def _track(self, key, future):
+        self._futures[key] = future
+        future.add_done_callback(lambda future: self._forget(key, future))
+
+    def _forget(self, key, future):
+        """Usuwa udane generowanie - stan pliku wynika dalej z dysku (słownik nie rośnie przez cały proces)."""
+        if future.cancelled() or future.exception() is not None:
+            return # Błąd zostaje do wyświetlenia i ponowienia (retry)
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    def _generate(self, translation, text_hash, fmt):
+        path = self.path(text_hash, fmt)
+        if os.path.exists(path):
+            return path
+        started = time.perf_counter()
+        try:
+            _write_atomic(path, export_bytes(translation, fmt))
+        except Exception as e:
+            log_event(logger, "export_failed", level=logging.WARNING, fmt=fmt, hash=text_hash[:12],
+                      error=f"{type(e).__name__}: {e}")
+            raise
+        log_event(logger, "export_ready", fmt=fmt, hash=text_hash[:12], bytes=os.path.getsize(path),
+                  duration_s=round(time.perf_counter() - started, 3))
+        return path
+
+    def _temp_path(self, suffix):
+        fd, path = tempfile.mkstemp(dir=self.exports_dir, suffix=suffix)
+        os.close(fd)
+        return path
+
+    def submit_bilingual(self, source_path, doc_hash, pages):
+        """Zleca w tle dwujęzyczny PDF. Zwraca jego klucz.
+
+        source_path - PDF źródłowy (kopiowany, więc wywołujący może go potem usunąć),
+        pages - iterowalne krotki jak w write_bilingual_pdf, zapisywane od razu na dysk.
+        """
+        pages_path = self._temp_path(".pages.tmp")
+        staged = None
+        try:
+            write_pages_file(pages, pages_path)
+            key = bilingual_hash(doc_hash, pages_path)
+            if (key, BILINGUAL_FORMAT) not in self._futures and not os.path.exists(self.path(key, BILINGUAL_FORMAT)):
+                staged = self._temp_path(".source.tmp")
+                shutil.copyfile(source_path, staged)
+            with self._lock:
+                if staged is not None and (key, BILINGUAL_FORMAT) not in self._futures:
+                    self._track((key, BILINGUAL_FORMAT), self._executor.submit(
+                        self._generate_bilingual, staged, pages_path, key))
+                    staged = pages_path = None # Pliki należą teraz do zadania generowania
+        finally:
+            for path in (staged, pages_path):
+                if path is not None and os.path.exists(path):
+                    os.remove(path)
+        return key
+
+    def _generate_bilingual(self, source_path, pages_path, key):
+        path = self.path(key, BILINGUAL_FORMAT)
+        started = time.perf_counter()
+        tmp_path = self._temp_path(".tmp")
+        try:
+            # Strony są czytane z pliku i dopisywane do PDF partiami - dokument nie powstaje w pamięci
+            count = write_bilingual_pdf(source_path, read_pages_file(pages_path), tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            log_event(logger, "export_failed", level=logging.WARNING, fmt=BILINGUAL_FORMAT, hash=key[:12],
+                      error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            os.remove(source_path)
+            os.remove(pages_path)
+        log_event(logger, "export_ready", fmt=BILINGUAL_FORMAT, hash=key[:12], bytes=os.path.getsize(path),
+                  pages=count, duration_s=round(time.perf_counter() - started, 3))
+        return path
+
+    def status(self, text_hash, fmt):
+        """Stan pliku: (STATUS_READY, ścieżka) / (STATUS_PENDING, None) / (STATUS_FAILED, komunikat błędu)
+        / (STATUS_MISSING, None).
+
+        STATUS_MISSING - pliku nikt nie generuje i nie ma go na dysku (nie został zlecony w tym
+        procesie, np. przed restartem serwera, albo usunęło go prune); trzeba go zlecić ponownie.
+        """
+        path = self.path(text_hash, fmt)
+        with self._lock:
+            future = self._futures.get((text_hash, fmt))
+        if future is not None and not future.done():
+            return STATUS_PENDING, None
+        if future is not None and not future.cancelled() and future.exception() is not None:
+            error = future.exception()
+            return STATUS_FAILED, f"{type(error).__name__}: {error}"
+        if os.path.exists(path):
+            os.utime(path) # Ostatnie użycie - dla usuwania starych plików
+            return STATUS_READY, path
+        return STATUS_MISSING, None
+
+    def prune(self):
+        """Usuwa pliki eksportu nieużywane dłużej niż EXPORT_RETENTION_HOURS."""
+        expire_before = time.time() - EXPORT_RETENTION_HOURS * 3600
+        for name in os.listdir(self.exports_dir):
+            path = os.path.join(self.exports_dir, name)
+            try:
+                if os.path.getmtime(path) < expire_before:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,154 @@
+"""Wstępna obróbka obrazu strony przed OCR (operacje na tablicach NumPy/Pillow, bez pętli po pikselach).
+
+Zaszumione, krzywe skany (np. faksy) spowalniają Tesseract - każda plamka to osobny
+element do analizy - i obniżają dokładność. Kroki (OCR_PREPROCESS, w stałej kolejności):
+  "crop"      - obcięcie ciemnych pasów na brzegach skanu,
+  "deskew"    - prostowanie przekosu (profil rzutu poziomego, kąt do DESKEW_MAX_ANGLE),
+  "binarize"  - binaryzacja adaptacyjna (próg względem średniej w oknie - nierówne oświetlenie),
+  "despeckle" - usunięcie pojedynczych czarnych pikseli i par pikseli (szum).
+Obcięcie i kąt prostowania trafiają do img.info ("crop_offset", "deskew_angle"), aby
+współrzędne wyników OCR dało się odnieść do strony.
+"""
+
+import os
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+# --- Konfiguracja ---
+
+PREPROCESS_STEPS = ("crop", "deskew", "binarize", "despeckle")
+# Kroki wstępnej obróbki (po przecinku, "" = bez obróbki); domyślne nie zmieniają czystych stron
+OCR_PREPROCESS = tuple(s.strip() for s in os.environ.get("OCR_PREPROCESS", "crop,deskew").split(",") if s.strip())
+
+# Maksymalny wykrywany przekos [°] i najmniejszy, który jest prostowany
+DESKEW_MAX_ANGLE = float(os.environ.get("DESKEW_MAX_ANGLE", 5))
+DESKEW_MIN_ANGLE = 0.1
+# Dłuższy bok pomniejszonej kopii do wykrywania przekosu [px]
+DESKEW_MAX_SIDE = 1200
+# Wiersz/kolumna należy do ciemnego pasa brzegowego, gdy ciemnych pikseli jest więcej niż ten ułamek
+BORDER_DARK_FRACTION = 0.5
+# Binaryzacja: okno średniej [cale] i o ile ciemniejszy od średniej musi być piksel tekstu
+BINARIZE_WINDOW_INCH = 0.5
+BINARIZE_SENSITIVITY = 0.15
+# Czarny piksel jest szumem, gdy w jego otoczeniu 3x3 jest najwyżej tyle innych czarnych pikseli
+DESPECKLE_MAX_NEIGHBORS = 1
+
+DARK_LEVEL = 128
+
+
+def _to_gray(img):
+    if img.mode == "L":
+        return img
+    return img.convert("L")
+
+
+def _border_extent(dark_fraction):
+    """Liczba wierszy (kolumn) ciemnego pasa od początku profilu."""
+    light = np.flatnonzero(dark_fraction <= BORDER_DARK_FRACTION)
+    return int(light[0]) if light.size else 0
+
+
+def crop_borders(img, dpi=300):
+    """Obcina ciemne pasy przy brzegach (cień skanera, krawędź kartki). Zwraca (obraz, (lewo, góra))."""
+    dark = np.asarray(img) < DARK_LEVEL
+    rows, cols = dark.mean(axis=1), dark.mean(axis=0)
+    pad = round(dpi / 100) # Przejście pasa w tło ma kilka pikseli szerokości
+    top, bottom = _border_extent(rows), _border_extent(rows[::-1])
+    left, right = _border_extent(cols), _border_extent(cols[::-1])
+    top, bottom, left, right = (extent + pad if extent else 0 for extent in (top, bottom, left, right))
+    if not (top or bottom or left or right) or top + bottom >= img.height or left + right >= img.width:
+        return img, (0, 0)
+    return img.crop((left, top, img.width - right, img.height - bottom)), (left, top)
+
+
+def _profile_scores(ys, xs, angles):
+    """Ostrość profilu rzutu poziomego ciemnych pikseli dla każdego kąta (suma kwadratów liczności wierszy)."""
+    offset = int(np.abs(xs).max() * np.tan(np.radians(np.abs(angles).max()))) + 1
+    scores = np.empty(len(angles))
+    for i, shear in enumerate(np.tan(np.radians(angles))):
+        hist = np.bincount(np.rint(ys + xs * shear).astype(np.int64) + offset)
+        scores[i] = np.dot(hist, hist)
+    return scores
+
+
+def estimate_skew(img, max_angle=DESKEW_MAX_ANGLE):
+    """Szacuje przekos tekstu [°] (dodatni - tekst obrócony przeciwnie do ruchu wskazówek zegara)."""
+    small = img
+    if max(img.size) > DESKEW_MAX_SIDE:
+        small = img.reduce(-(-max(img.size) // DESKEW_MAX_SIDE))
+    ys, xs = np.nonzero(np.asarray(small) < DARK_LEVEL)
+    if ys.size < 100:
+        return 0.0 # Pusta strona
+    xs = xs - small.width / 2 # Obrót wokół środka strony
+    # Najpierw zgrubnie co 0,5°, potem co 0,05° wokół najlepszego kąta
+    coarse = np.arange(-max_angle, max_angle + 1e-9, 0.5)
+    best = coarse[np.argmax(_profile_scores(ys, xs, coarse))]
+    fine = np.arange(best - 0.5, best + 0.5 + 1e-9, 0.05)
+    return float(fine[np.argmax(_profile_scores(ys, xs, fine))])
+
+
+def deskew(img):
+    """Prostuje przekos strony (bez zmiany rozmiaru obrazu). Zwraca (obraz, kąt obrotu [°])."""
+    angle = estimate_skew(img)
+    if abs(angle) < DESKEW_MIN_ANGLE:
+        return img, 0.0
+    return img.rotate(-angle, resample=Image.BILINEAR, fillcolor=255), -angle
+
+
+def binarize(img, dpi=300):
+    """Binaryzacja adaptacyjna: piksel jest czarny, gdy jest wyraźnie ciemniejszy od średniej w swoim oknie."""
+    radius = max(8, round(dpi * BINARIZE_WINDOW_INCH / 2))
+    local_mean = np.asarray(img.filter(ImageFilter.BoxBlur(radius)))
+    # Próg dla każdej możliwej średniej (tablica 256 wartości) zamiast mnożenia całego obrazu
+    thresholds = np.ceil(np.arange(256) * (1 - BINARIZE_SENSITIVITY)).astype(np.uint8)
+    light = np.asarray(img) >= thresholds[local_mean]
+    return Image.fromarray(light.view(np.uint8) * np.uint8(255))
+
+
+def despeckle(img):
+    """Usuwa czarne piksele bez (lub z jednym) czarnym sąsiadem - szum, nie kreski liter."""
+    dark = np.asarray(img) < DARK_LEVEL
+    padded = np.pad(dark, 1).astype(np.uint8)
+    neighbors = np.zeros(dark.shape, dtype=np.uint8)
+    height, width = dark.shape
+    for dy in range(3):
+        for dx in range(3):
+            if dy != 1 or dx != 1:
+                neighbors += padded[dy:dy + height, dx:dx + width]
+    speckle = dark & (neighbors <= DESPECKLE_MAX_NEIGHBORS)
+    if not speckle.any():
+        return img
+    pixels = np.array(img)
+    pixels[speckle] = 255
+    return Image.fromarray(pixels)
+
+
+def preprocess(img, steps=None, timings=None):
+    """Wykonuje wybrane kroki wstępnej obróbki (domyślnie OCR_PREPROCESS) i zwraca obraz w skali szarości.
+
+    Bez kroków obraz jest zwracany bez zmian. timings["preprocess"] dostaje czas obróbki [s].
+    """
+    steps = OCR_PREPROCESS if steps is None else steps
+    unknown = set(steps) - set(PREPROCESS_STEPS)
+    if unknown:
+        raise ValueError(f"Nieznane kroki wstępnej obróbki: {', '.join(sorted(unknown))}")
+    if not steps:
+        return img
+    started = time.perf_counter()
+    info = dict(img.info)
+    dpi = float(info["dpi"][0]) if info.get("dpi") else 300.0
+    out = _to_gray(img)
+    if "crop" in steps:
+        out, info["crop_offset"] = crop_borders(out, dpi)
+    if "deskew" in steps:
+        out, info["deskew_angle"] = deskew(out)
+    if "binarize" in steps:
+        out = binarize(out, dpi)
+    if "despeckle" in steps:
+        out = despeckle(out)
+    out.info.update(info)
+    if timings is not None:
+        timings["preprocess"] = timings.get("preprocess", 0.0) + time.perf_counter() - started
+    return out
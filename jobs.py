@@ -0,0 +1,364 @@
+"""Menedżer zadań w tle: przetwarzanie dokumentów niezależne od przebiegów skryptu Streamlit.
+
+Zadanie (render -> OCR -> tłumaczenie) działa w puli wątków menedżera, a interfejs
+tylko odpytuje jego stan. Tłumaczenie jest składane na bieżąco w kompletne bloki
+Markdown (markdown_stream), więc podgląd na żywo dostaje tylko ostatnie bloki. Stan zadania (etap, postęp stron, dotychczasowe tłumaczenie)
+jest zapisywany na dysku, więc przeżywa ponowne uruchomienie skryptu, przeładowanie
+strony i ponowne połączenie. Po restarcie serwera niedokończone zadania są wznawiane;
+strony już przetworzone są brane z wyników stron (page_results) - także wtedy,
+gdy nowe zadanie ma tylko rozszerzony wybór stron tego samego dokumentu.
+Zakończone zadania nieodczytywane przez interfejs (np. zamknięta karta przeglądarki)
+są usuwane z pamięci po JOB_MEMORY_TTL_MINUTES - zostaje tylko ich stan na dysku.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import core
+from export_service import BILINGUAL_FORMAT, EXPORT_FORMATS
+from markdown_stream import MarkdownBlocks
+from ocr_cache import document_hash
+from structured_log import get_logger, log_event
+from telemetry import JOBS, JOBS_ACTIVE
+from token_budget import summarize_usage
+from translator import event_text
+
+# --- Konfiguracja ---
+
+JOBS_DIR = os.environ.get(
+    "JOBS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pdf-translator", "jobs")
+)
+# Liczba dokumentów przetwarzanych jednocześnie (kolejne czekają w kolejce)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# Minimalny odstęp między zapisami stanu zadania na dysk [s]
+JOB_SAVE_INTERVAL = float(os.environ.get("JOB_SAVE_INTERVAL", 1.0))
+# Po tym czasie zakończone zadania są usuwane [h]
+JOB_RETENTION_HOURS = float(os.environ.get("JOB_RETENTION_HOURS", 24 * 7))
+# Zakończone zadania są trzymane w pamięci (z podglądami stron) tylko tyle czasu od ostatniego odczytu [min]
+# i najwyżej w tej liczbie - starsze są odczytywane ze stanu na dysku
+JOB_MEMORY_TTL_MINUTES = float(os.environ.get("JOB_MEMORY_TTL_MINUTES", 30))
+JOB_MEMORY_MAX = int(os.environ.get("JOB_MEMORY_MAX", 16))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+STAGES = ("render", "ocr", "translate") # Liczniki postępu stron w stanie zadania
+
+logger = get_logger("jobs")
+
+
+def _write_json(path, data):
+    """Zapis atomowy (plik tymczasowy + os.replace), aby czytelnik nie zobaczył połowy stanu."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Job:
+    """Stan jednego zadania; modyfikowany przez wątek roboczy, czytany przez sesje UI."""
+
+    def __init__(self, state):
+        self.id = state["id"]
+        self.state = state
+        self.parts = [state["translation"]] if state.get("translation") else []
+        self.markdown = MarkdownBlocks() # Kompletne bloki tłumaczenia dla podglądu na żywo
+        for part in self.parts:
+            self.markdown.feed(part)
+        self.images = None # PageImageStore z podglądami stron (tylko w bieżącym procesie serwera)
+        self.pipeline = None
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.saved_at = 0.0
+        self.used_at = time.monotonic() # Ostatni odczyt przez interfejs - do usuwania z pamięci
+
+    def append(self, text):
+        """Dopisuje fragment tłumaczenia (wywoływane przez wątek roboczy)."""
+        with self.lock:
+            self.parts.append(text)
+            self.markdown.feed(text)
+
+    def snapshot(self, translation=True):
+        """Kopia stanu do wyświetlenia, z bieżącym postępem potoku (translation=False - bez sklejania tłumaczenia)."""
+        with self.lock:
+            state = dict(self.state, progress=dict(self.state["progress"]))
+            if translation:
+                state["translation"] = "".join(self.parts)
+        pipeline = self.pipeline
+        if pipeline is not None and state["status"] == STATUS_RUNNING:
+            state["progress"]["render"] = len(pipeline.images)
+            state["progress"]["ocr"] = len(pipeline.ocr_results)
+            state["usage"] = summarize_usage(pipeline.translator.usage)
+            state["timeline"] = pipeline.timeline.summary()
+        return state
+
+
+class JobManager:
+    """Kolejka zadań przetwarzania dokumentów z trwałym stanem (jedna instancja na proces serwera)."""
+
+    def __init__(self, api_key, system_messages=None, jobs_dir=JOBS_DIR, max_workers=JOB_WORKERS, exports=None):
+        self.api_key = api_key
+        self.system_messages = system_messages
+        self.exports = exports # ExportService - pliki eksportu generowane zaraz po zakończeniu zadania
+        self.jobs_dir = jobs_dir
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.jobs_dir, f"{job_id}{suffix}")
+
+    def _save(self, job, force=False):
+        now = time.time()
+        if not force and now - job.saved_at < JOB_SAVE_INTERVAL:
+            return
+        job.saved_at = now
+        _write_json(self._path(job.id, ".json"), job.snapshot())
+
+    def _update(self, job, force=False, **changes):
+        with job.lock:
+            job.state.update(changes, updated_at=time.time())
+        self._save(job, force=force)
+
+    # --- API ---
+
+    def submit(self, pdf_bytes, page_numbers, source_lang_name, target_lang_llm, filename=None):
+        """Dodaje dokument do kolejki i zwraca identyfikator zadania."""
+        job_id = uuid.uuid4().hex
+        with open(self._path(job_id, ".pdf"), "wb") as f:
+            f.write(pdf_bytes) # Źródło do wznowienia zadania po restarcie serwera
+        now = time.time()
+        job = Job({
+            "id": job_id, "filename": filename, "status": STATUS_QUEUED, "error": None,
+            "doc_hash": document_hash(pdf_bytes), "pages": list(page_numbers),
+            "source_lang": source_lang_name, "target_lang_llm": target_lang_llm,
+            "progress": {"total": len(page_numbers), **{stage: 0 for stage in STAGES}},
+            "translation": "", "ocr_text": "", "page_methods": [], "low_confidence": [],
+            "incomplete_pages": [], "bilingual_hash": None, "export_error": None,
+            "usage": None, "requests": [],
+            "timeline": {}, "spans": [],
+            "created_at": now, "updated_at": now, "started_at": None, "finished_at": None,
+        })
+        self._enqueue(job)
+        return job_id
+
+    def _enqueue(self, job):
+        self._evict()
+        with self._lock:
+            self._jobs[job.id] = job
+        self._save(job, force=True)
+        self._executor.submit(self._run, job)
+
+    def _load(self, job_id):
+        try:
+            with open(self._path(job_id, ".json"), "r", encoding="utf-8") as f:
+                return Job(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _evict(self):
+        """Usuwa z pamięci zakończone zadania nieużywane dłużej niż JOB_MEMORY_TTL_MINUTES i najstarsze
+        ponad JOB_MEMORY_MAX (z podglądami stron); ich stan zostaje na dysku dla ?job=.
+        """
+        expire_before = time.monotonic() - JOB_MEMORY_TTL_MINUTES * 60
+        with self._lock:
+            finished = sorted((job for job in self._jobs.values()
+                               if job.state["status"] not in ACTIVE_STATUSES and job.pipeline is None),
+                              key=lambda job: job.used_at)
+            evicted = [job for i, job in enumerate(finished)
+                       if job.used_at < expire_before or i < len(finished) - JOB_MEMORY_MAX]
+            for job in evicted:
+                del self._jobs[job.id]
+        for job in evicted:
+            if job.images is not None:
+                job.images.close()
+
+    def _get_job(self, job_id):
+        self._evict()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and job_id and all(c in "0123456789abcdef" for c in job_id):
+            # Zadanie z poprzedniego uruchomienia serwera (np. zakończone przed restartem)
+            job = self._load(job_id)
+            if job is not None:
+                with self._lock:
+                    job = self._jobs.setdefault(job_id, job)
+        if job is not None:
+            job.used_at = time.monotonic()
+        return job
+
+    def get(self, job_id, translation=True):
+        """Zwraca migawkę stanu zadania lub None, jeśli zadanie nie istnieje."""
+        job = self._get_job(job_id)
+        return job.snapshot(translation) if job else None
+
+    def live_blocks(self, job_id, last):
+        """Ostatnie `last` kompletnych bloków tłumaczenia, liczba wcześniejszych i niedokończony blok.
+
+        Zwraca (pominięte, bloki, niedokończony) lub None, jeśli zadanie nie istnieje.
+        """
+        job = self._get_job(job_id)
+        if job is None:
+            return None
+        with job.lock:
+            blocks = job.markdown.blocks
+            skipped = max(0, len(blocks) - last)
+            return skipped, blocks[skipped:], job.markdown.pending
+
+    def images(self, job_id):
+        """Magazyn podglądów stron zadania (None dla zadań wczytanych z dysku po restarcie)."""
+        job = self._get_job(job_id)
+        return job.images if job else None
+
+    def release(self, job_id):
+        """Zwalnia zasoby zadania w pamięci i podglądy stron na dysku (stan zadania zostaje na dysku)."""
+        self.cancel(job_id)
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None and job.images is not None:
+            job.images.close()
+
+    def cancel(self, job_id):
+        """Przerywa zadanie (oczekujące lub w toku)."""
+        job = self._get_job(job_id)
+        if job is not None and job.state["status"] in ACTIVE_STATUSES:
+            job.cancel_event.set()
+            if job.state["status"] == STATUS_QUEUED:
+                self._finish(job, STATUS_CANCELLED)
+
+    def recover(self):
+        """Wznawia zadania przerwane restartem serwera i usuwa zadania starsze niż JOB_RETENTION_HOURS."""
+        expire_before = time.time() - JOB_RETENTION_HOURS * 3600
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            job = self._load(name[:-len(".json")])
+            if job is None or job.id in self._jobs:
+                continue
+            if job.state["status"] in ACTIVE_STATUSES:
+                if not os.path.exists(self._path(job.id, ".pdf")):
+                    self._finish(job, STATUS_FAILED, error="Zadanie przerwane (brak pliku źródłowego).")
+                    continue
+                # Tłumaczenie zaczyna się od nowa; gotowe strony są brane z wyników stron
+                job.parts = []
+                job.markdown = MarkdownBlocks()
+                job.state.update(status=STATUS_QUEUED, progress={"total": len(job.state["pages"]),
+                                                                 **{stage: 0 for stage in STAGES}})
+                self._enqueue(job)
+            elif job.state["updated_at"] < expire_before:
+                for suffix in (".json", ".pdf"):
+                    if os.path.exists(self._path(job.id, suffix)):
+                        os.remove(self._path(job.id, suffix))
+
+    # --- Wykonanie zadania (wątek roboczy) ---
+
+    def _finish(self, job, status, error=None):
+        pipeline, job.pipeline = job.pipeline, None
+        if pipeline is not None:
+            # Zużycie tokenów zostaje w stanie także dla zadań przerwanych
+            with job.lock:
+                job.state["requests"] = list(pipeline.translator.usage)
+                job.state["usage"] = summarize_usage(job.state["requests"])
+                # Oś czasu etapów (render, OSD, OCR, TTFT, tłumaczenie) do diagnozy wolnych zadań
+                job.state["timeline"] = pipeline.timeline.summary()
+                job.state["spans"] = pipeline.timeline.spans()
+            if status == STATUS_DONE and self.exports is not None and BILINGUAL_FORMAT in EXPORT_FORMATS:
+                # Dwujęzyczny PDF potrzebuje pliku źródłowego - zlecenie (kopia pliku) przed jego usunięciem.
+                # Błąd zlecenia nie zmienia statusu zadania - tłumaczenie jest gotowe, brakuje tylko eksportu
+                try:
+                    bilingual_hash = self.exports.submit_bilingual(self._path(job.id, ".pdf"), job.state["doc_hash"],
+                                                                   pipeline.bilingual_pages())
+                except Exception as e:
+                    log_event(logger, "export_failed", level=logging.WARNING, job_id=job.id, fmt=BILINGUAL_FORMAT,
+                              error=f"{type(e).__name__}: {e}")
+                    with job.lock:
+                        job.state["export_error"] = f"{type(e).__name__}: {e}"
+                else:
+                    with job.lock:
+                        job.state["bilingual_hash"] = bilingual_hash
+        if status != STATUS_DONE and job.images is not None:
+            job.images.close() # Podglądy nieudanego zadania nie będą wyświetlane
+        self._update(job, force=True, status=status, error=error, finished_at=time.time())
+        if status == STATUS_DONE and self.exports is not None:
+            with job.lock:
+                translation = "".join(job.parts)
+            self.exports.submit(translation)
+        JOBS.inc(status=status)
+        state = job.state
+        log_event(logger, "job_finished", job_id=job.id, status=status, error=error, pages=len(state["pages"]),
+                  duration_s=round(state["finished_at"] - (state["started_at"] or state["created_at"]), 3),
+                  stages=state.get("timeline"), usage=state.get("usage"))
+        if os.path.exists(self._path(job.id, ".pdf")):
+            os.remove(self._path(job.id, ".pdf"))
+
+    def _on_page(self, job, page_no, done_count, total, method):
+        with job.lock:
+            # Tłumaczenie poprzednich stron jest już w całości w wyniku
+            job.state["progress"]["translate"] = done_count - 1
+        self._save(job)
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            return
+        self._update(job, force=True, status=STATUS_RUNNING, started_at=time.time())
+        JOBS_ACTIVE.inc()
+        try:
+            with open(self._path(job.id, ".pdf"), "rb") as f:
+                pdf_bytes = f.read()
+            doc = core.open_pdf_document(pdf_bytes)
+            try:
+                pipeline = core.start_pipeline(
+                    doc, job.state["pages"], job.state["source_lang"], job.state["target_lang_llm"],
+                    self.api_key, doc_hash=job.state["doc_hash"], system_messages=self.system_messages,
+                )
+            except Exception:
+                doc.close()
+                raise
+            job.images = pipeline.images # Magazyn uzupełniany na bieżąco przez etap renderowania
+            job.pipeline = pipeline
+
+            stream = pipeline.stream_translation(
+                on_page=lambda *args: self._on_page(job, *args))
+            try:
+                for event in stream:
+                    if job.cancel_event.is_set():
+                        break
+                    text = event_text(event)
+                    if text:
+                        job.append(text)
+                        self._save(job)
+            finally:
+                stream.close() # Zatrzymuje potok, gdy zadanie anulowano w trakcie
+
+            if job.cancel_event.is_set():
+                self._finish(job, STATUS_CANCELLED)
+                return
+            total = len(job.state["pages"])
+            with job.lock:
+                job.state["progress"].update({stage: total for stage in STAGES})
+                job.state["ocr_text"] = pipeline.ocr_text
+                job.state["page_methods"] = pipeline.page_methods()
+                job.state["low_confidence"] = pipeline.low_confidence_lines()
+                job.state["incomplete_pages"] = list(pipeline.incomplete_pages)
+                job.markdown.finish()
+            self._finish(job, STATUS_DONE)
+        except Exception as e:
+            self._finish(job, STATUS_FAILED, error=f"{type(e).__name__}: {e}")
+        finally:
+            JOBS_ACTIVE.dec()
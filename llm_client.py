@@ -0,0 +1,231 @@
+"""Współdzielony klient API zgodnego z OpenAI (jeden na proces).
+
+Wszystkie tłumaczenia w procesie korzystają z jednej pętli asyncio w wątku w tle
+i jednego AsyncOpenAI na adres API, więc połączenia HTTP (keep-alive) są
+używane ponownie między zapytaniami, zadaniami i sesjami użytkowników.
+
+Otwarcie strumienia (do pierwszego tokenu) jest odporne na błędy przejściowe:
+- 429 / 5xx / błędy połączenia są ponawiane z wykładniczym opóźnieniem z losowym
+  rozrzutem (full jitter), z poszanowaniem nagłówka Retry-After,
+- po wyczerpaniu prób (lub przy błędzie nieprzejściowym) zapytanie trafia do
+  kolejnego punktu z listy TRANSLATION_FALLBACKS (inny model i/lub adres API),
+- jeśli pierwszy token nie nadszedł w TRANSLATION_HEDGE_AFTER sekund, wysyłane jest
+  zapytanie zabezpieczające (hedged) do kolejnego punktu; wygrywa szybsze.
+Błąd w trakcie strumienia (po pierwszym tokenie) nie jest ponawiany - tekst
+trafił już do odbiorcy.
+
+Pakiet openai jest importowany dopiero przy pierwszym zapytaniu (sam import trwa
+ok. 1 s), więc nie spowalnia startu interfejsu.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+
+from structured_log import get_logger, log_event
+from telemetry import FAILOVERS, HEDGES, RETRIES
+
+# --- Konfiguracja ---
+
+# Liczba ponowień zapytania w jednym punkcie API (po pierwszej próbie)
+MAX_RETRIES = int(os.environ.get("TRANSLATION_MAX_RETRIES", 3))
+# Opóźnienie ponowienia: losowe z [0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2^próba)] [s]
+RETRY_BASE_DELAY = float(os.environ.get("TRANSLATION_RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.environ.get("TRANSLATION_RETRY_MAX_DELAY", 20))
+# Górny limit czekania wskazanego przez Retry-After [s]
+RETRY_AFTER_MAX = float(os.environ.get("TRANSLATION_RETRY_AFTER_MAX", 60))
+# Po ilu sekundach bez pierwszego tokenu wysłać zapytanie zabezpieczające (0 = wyłączone)
+HEDGE_AFTER = float(os.environ.get("TRANSLATION_HEDGE_AFTER", 0))
+# Zapasowe punkty API po przecinku: "model" lub "model@adres_api", np.
+# "meta-llama/llama-3.3-70b-instruct,google/gemma-3-27b-it@http://127.0.0.1:8000/v1"
+TRANSLATION_FALLBACKS = os.environ.get("TRANSLATION_FALLBACKS", "")
+CONNECT_TIMEOUT = float(os.environ.get("TRANSLATION_CONNECT_TIMEOUT", 10))
+# Limit czasu odczytu (także przerwy między zdarzeniami strumienia) [s]
+READ_TIMEOUT = float(os.environ.get("TRANSLATION_READ_TIMEOUT", 120))
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+logger = get_logger("llm_client")
+
+
+def build_endpoints(base_url, model, fallbacks=TRANSLATION_FALLBACKS):
+    """Lista punktów API (adres, model): najpierw podstawowy, potem zapasowe z fallbacks."""
+    endpoints = [(base_url, model)]
+    for entry in filter(None, (e.strip() for e in fallbacks.split(","))):
+        fallback_model, _, fallback_url = entry.partition("@")
+        endpoint = (fallback_url or base_url, fallback_model or model)
+        if endpoint not in endpoints:
+            endpoints.append(endpoint)
+    return endpoints
+
+
+def is_retryable(error):
+    """Czy błąd jest przejściowy (warto ponowić w tym samym punkcie API)."""
+    import openai
+    if isinstance(error, openai.APIConnectionError): # także APITimeoutError
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+
+def retry_after(error):
+    """Czas oczekiwania z nagłówka Retry-After / retry-after-ms [s] lub None."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time()) # Data HTTP
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(error, attempt):
+    """Opóźnienie przed ponowieniem: Retry-After (z limitem) lub wykładnicze z pełnym rozrzutem."""
+    wait = retry_after(error)
+    if wait is not None:
+        return min(wait, RETRY_AFTER_MAX)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _has_content(event):
+    choices = getattr(event, "choices", None)
+    return bool(choices) and bool(choices[0].delta.content or choices[0].finish_reason)
+
+
+async def _chain(head, stream):
+    for event in head:
+        yield event
+    async for event in stream:
+        yield event
+
+
+class LlmClient:
+    """Pętla asyncio w wątku w tle + klienci AsyncOpenAI (po jednym na adres API i klucz)."""
+
+    def __init__(self, max_retries=MAX_RETRIES, hedge_after=HEDGE_AFTER):
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self._clients = {}
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True, name="llm-client")
+        self._thread.start()
+
+    def run(self, coro):
+        """Planuje korutynę w pętli klienta; zwraca concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def _client(self, base_url, api_key):
+        # Wywoływane tylko w pętli klienta - bez blokady
+        key = (base_url, api_key)
+        if key not in self._clients:
+            import openai
+            # Ponawianie robi open_stream (z failoverem i hedgingiem), nie SDK
+            self._clients[key] = openai.AsyncOpenAI(
+                base_url=base_url, api_key=api_key, max_retries=0,
+                timeout=openai.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            )
+        return self._clients[key]
+
+    async def _open(self, api_key, endpoint, messages, params):
+        """Otwiera strumień i czeka na pierwszy token. Zwraca (punkt API, strumień, zdarzenia do pierwszego tokenu)."""
+        base_url, model = endpoint
+        stream = await self._client(base_url, api_key).chat.completions.create(
+            model=model, messages=messages, stream=True, **params)
+        head = []
+        try:
+            async for event in stream:
+                head.append(event)
+                if _has_content(event):
+                    break
+        except BaseException: # Także anulowanie przegranego zapytania zabezpieczającego
+            await stream.close()
+            raise
+        return endpoint, stream, head
+
+    async def _open_hedged(self, api_key, endpoint, hedge_endpoint, messages, params, stats):
+        if not self.hedge_after:
+            return await self._open(api_key, endpoint, messages, params)
+        tasks = [asyncio.ensure_future(self._open(api_key, endpoint, messages, params))]
+        winner = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                # Brak pierwszego tokenu - równoległe zapytanie do kolejnego punktu API
+                stats["hedged"] = True
+                HEDGES.inc()
+                log_event(logger, "hedged_request", model=hedge_endpoint[1], base_url=hedge_endpoint[0],
+                          after_s=self.hedge_after)
+                tasks.append(asyncio.ensure_future(self._open(api_key, hedge_endpoint, messages, params)))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                if winner is not None:
+                    return winner.result()
+            raise error
+        finally:
+            for task in tasks:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None:
+                    await task.result()[1].close() # Oba zdążyły - zamknij przegrany strumień
+
+    async def open_stream(self, api_key, endpoints, messages, stats=None, **params):
+        """Otwiera strumień odpowiedzi z ponawianiem, failoverem i hedgingiem.
+
+        Zwraca (punkt API, strumień do zamknięcia, asynchroniczny iterator zdarzeń).
+        stats (słownik) dostaje liczniki attempts/retries/failovers oraz hedged.
+        """
+        stats = stats if stats is not None else {}
+        stats.update(attempts=0, retries=0, failovers=0, hedged=False)
+        error = None
+        for index, endpoint in enumerate(endpoints):
+            if index:
+                stats["failovers"] += 1
+                FAILOVERS.inc()
+                log_event(logger, "failover", level=logging.WARNING, model=endpoint[1], base_url=endpoint[0],
+                          error=f"{type(error).__name__}: {error}")
+            hedge_endpoint = endpoints[index + 1] if index + 1 < len(endpoints) else endpoint
+            for attempt in range(self.max_retries + 1):
+                stats["attempts"] += 1
+                try:
+                    endpoint, stream, head = await self._open_hedged(
+                        api_key, endpoint, hedge_endpoint, messages, params, stats)
+                    return endpoint, stream, _chain(head, stream)
+                except Exception as e:
+                    error = e
+                    if not is_retryable(e) or attempt == self.max_retries:
+                        break
+                    delay = retry_delay(e, attempt)
+                    stats["retries"] += 1
+                    RETRIES.inc(reason=str(getattr(e, "status_code", None) or type(e).__name__))
+                    log_event(logger, "retry", level=logging.WARNING, model=endpoint[1], attempt=attempt + 1, delay_s=round(delay, 3),
+                              error=f"{type(e).__name__}: {e}")
+                    await asyncio.sleep(delay)
+        raise error
+
+
+@lru_cache(maxsize=1)
+def get_llm_client():
+    """Klient współdzielony przez wszystkie tłumaczenia w procesie."""
+    return LlmClient()
@@ -0,0 +1,153 @@
+"""Przyrostowe przetwarzanie strumienia Markdown z modelu.
+
+- FenceStripper usuwa blok ```markdown ... ``` otaczający całą odpowiedź (otwarcie
+  na początku i zamknięcie na końcu), wstrzymując tylko tyle tekstu, ile potrzeba
+  do rozpoznania znacznika - reszta płynie do odbiorcy od razu.
+- MarkdownBlocks dzieli napływający tekst na kompletne bloki (akapity, nagłówki,
+  listy, tabele, bloki kodu). Interfejs dopisuje tylko nowe bloki zamiast
+  ponownie renderować cały, rosnący tekst.
+Każdy fragment tekstu jest przetwarzany raz, więc koszt jest liniowy względem długości tłumaczenia.
+"""
+
+import re
+
+# Języki bloku otwierającego, który oznacza "cała odpowiedź to Markdown"
+WRAPPER_FENCE_LANGS = ("", "markdown", "md")
+
+_FENCE_RE = re.compile(r"^ {0,3}(```|~~~)")
+
+
+class FenceStripper:
+    """Usuwa ```markdown na początku i zamykające ``` na końcu strumienia tekstu."""
+
+    def __init__(self):
+        self._head = "" # Tekst przed rozstrzygnięciem, czy odpowiedź zaczyna się od bloku
+        self._started = False
+        self._fenced = False # Usunięto otwarcie - zamknięcie na końcu też zostanie usunięte
+        self._tail = "" # Ostatnia linia wstrzymana, bo może być zamykającym ```
+
+    def _start(self, text):
+        self._head += text
+        stripped = self._head.lstrip()
+        if not stripped:
+            return None
+        if not "```".startswith(stripped[:3]):
+            return self._head # Zwykły tekst - nie ma czego usuwać
+        if "\n" not in stripped:
+            return None # Czekamy na całą pierwszą linię (```markdown)
+        first_line, rest = stripped.split("\n", 1)
+        if first_line[3:].strip().lower() in WRAPPER_FENCE_LANGS:
+            self._fenced = True
+            return rest
+        return self._head # Blok kodu innego języka - część treści
+
+    def feed(self, text):
+        """Przyjmuje kolejny fragment i zwraca tekst gotowy do wyświetlenia (może być pusty)."""
+        if not self._started:
+            text = self._start(text)
+            if text is None:
+                return ""
+            self._started = True
+            self._head = ""
+        if not self._fenced:
+            return text
+        text = self._tail + text
+        # Wstrzymujemy ostatnią niepustą linię (z końcowymi białymi znakami), jeśli może być zamykającym ```
+        body = text.rstrip()
+        cut = body.rfind("\n")
+        last_line = body[cut + 1:].strip()
+        if len(last_line) <= 3 and "```".startswith(last_line):
+            cut = max(cut, 0)
+            self._tail = text[cut:]
+            return text[:cut]
+        # Końcowe znaki nowej linii mogą poprzedzać zamykające ``` w następnym fragmencie
+        cut = len(text.rstrip("\n"))
+        self._tail = text[cut:]
+        return text[:cut]
+
+    def finish(self):
+        """Zwraca wstrzymany tekst na końcu strumienia (bez zamykającego ```)."""
+        if not self._started:
+            return self._head
+        tail, self._tail = self._tail, ""
+        if self._fenced and tail.strip() == "```":
+            return ""
+        return tail
+
+
+def strip_fence_stream(chunks):
+    """Generator tekstu bez bloku ```markdown otaczającego całą odpowiedź."""
+    stripper = FenceStripper()
+    for chunk in chunks:
+        text = stripper.feed(chunk)
+        if text:
+            yield text
+    text = stripper.finish()
+    if text:
+        yield text
+
+
+class MarkdownBlocks:
+    """Składa strumień tekstu Markdown w listę kompletnych bloków (rozdzielonych pustą linią poza blokiem kodu)."""
+
+    def __init__(self):
+        self.blocks = []
+        self._current = [] # Kompletne linie bieżącego (niedokończonego) bloku
+        self._line = "" # Niedokończona ostatnia linia
+        self._in_code = False
+
+    def feed(self, text):
+        """Dopisuje fragment tekstu. Zwraca listę bloków, które właśnie się zakończyły."""
+        if "\n" not in text:
+            self._line += text
+            return []
+        *lines, last = (self._line + text).split("\n")
+        self._line = last
+        finished = []
+        for line in lines:
+            if _FENCE_RE.match(line):
+                self._in_code = not self._in_code
+            if not line.strip() and not self._in_code:
+                if self._current:
+                    finished.append("\n".join(self._current))
+                    self._current = []
+                continue
+            self._current.append(line)
+        self.blocks.extend(finished)
+        return finished
+
+    @property
+    def pending(self):
+        """Niedokończony ostatni blok (wyświetlany na żywo, zmienia się z każdym fragmentem)."""
+        return "\n".join(self._current + [self._line]).strip("\n")
+
+    def finish(self):
+        """Zamyka strumień - pozostały tekst staje się ostatnim blokiem. Zwraca listę nowych bloków."""
+        pending = self.pending
+        self._current, self._line = [], ""
+        if pending.strip():
+            self.blocks.append(pending)
+            return [pending]
+        return []
+
+
+def split_blocks(text):
+    """Dzieli gotowy tekst Markdown na bloki (jak MarkdownBlocks dla całego tekstu naraz)."""
+    blocks = MarkdownBlocks()
+    blocks.feed(text)
+    blocks.finish()
+    return blocks.blocks
+
+
+def group_blocks(blocks, max_chars):
+    """Łączy kolejne bloki w sekcje do max_chars znaków (mniej elementów strony przy każdym przebiegu)."""
+    groups, current, size = [], [], 0
+    for block in blocks:
+        if current and size + len(block) > max_chars:
+            groups.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(block)
+        size += len(block) + 2
+    if current:
+        groups.append("\n\n".join(current))
+    return groups
@@ -0,0 +1,166 @@
+"""Backendy wywołań Tesseract (OSD i OCR) bez pośrednich plików tymczasowych.
+
+- "tesserocr": trwałe API Tesseract w procesie (opcjonalna zależność tesserocr),
+  jedna zainicjalizowana instancja na język i proces roboczy.
+- "stdin": binarka tesseract czytająca surowe piksele (PGM/PPM) ze stdin
+  i pisząca wynik na stdout - bez kompresji PNG i bez plików na dysku.
+- "pytesseract": dotychczasowa ścieżka (zapis obrazu do pliku tymczasowego).
+
+Wybór zmienną OCR_BACKEND (domyślnie "auto": tesserocr, jeśli zainstalowany, inaczej stdin).
+"""
+
+import functools
+import os
+import subprocess
+
+import pytesseract
+from pytesseract.pytesseract import osd_to_dict
+
+try:
+    import tesserocr
+except ImportError: # Opcjonalna zależność
+    tesserocr = None
+
+# --- Konfiguracja ---
+
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "auto")
+
+
+def image_to_pnm(img):
+    """Koduje obraz PIL jako nieskompresowany PGM (P5) lub PPM (P6) - tylko nagłówek + surowe piksele."""
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("L" if img.mode in ("1", "LA", "I", "I;16") else "RGB")
+    magic = b"P5" if img.mode == "L" else b"P6"
+    return b"%s\n%d %d\n255\n" % (magic, img.width, img.height) + img.tobytes()
+
+
+TSV_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+               "left", "top", "width", "height", "conf", "text")
+TSV_INT_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                   "left", "top", "width", "height")
+
+
+def parse_tsv(tsv):
+    """Parsuje wyjście TSV Tesseract do słownika list (jak pytesseract.Output.DICT)."""
+    lines = tsv.rstrip("\n").split("\n")
+    header = lines[0].split("\t")
+    data = {column: [] for column in header}
+    for line in lines[1:]:
+        values = line.split("\t")
+        if len(values) < len(header):
+            values += [""] * (len(header) - len(values))
+        for column, value in zip(header, values):
+            if column in TSV_INT_COLUMNS:
+                value = int(value)
+            elif column == "conf":
+                value = float(value)
+            data[column].append(value)
+    return data
+
+
+def _image_dpi(img):
+    dpi = img.info.get("dpi")
+    return int(dpi[0]) if dpi else None
+
+
+class PytesseractBackend:
+    """Dotychczasowa ścieżka pytesseract (plik tymczasowy na każde wywołanie)."""
+
+    name = "pytesseract"
+
+    def osd(self, img):
+        return pytesseract.image_to_osd(img, output_type=pytesseract.Output.DICT, config='--psm 0')
+
+    def ocr_data(self, img, lang):
+        """Dane TSV (słowa z ramkami i pewnością) z jednego przebiegu Tesseract."""
+        data = pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
+        data["conf"] = [float(c) for c in data["conf"]]
+        return data
+
+
+class StdinBackend:
+    """Binarka tesseract zasilana surowymi pikselami przez stdin."""
+
+    name = "stdin"
+
+    def _run(self, img, args):
+        # Ta sama ścieżka do binarki, co w pytesseract (pytesseract.pytesseract.tesseract_cmd)
+        cmd = [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout"] + args
+        dpi = _image_dpi(img)
+        if dpi:
+            cmd += ["--dpi", str(dpi)] # PNM nie przenosi rozdzielczości
+        try:
+            proc = subprocess.run(cmd, input=image_to_pnm(img), capture_output=True, check=False)
+        except FileNotFoundError:
+            raise pytesseract.TesseractNotFoundError()
+        if proc.returncode != 0:
+            raise pytesseract.TesseractError(proc.returncode, proc.stderr.decode("utf-8", "replace").strip())
+        return proc.stdout.decode("utf-8", "replace")
+
+    def osd(self, img):
+        return osd_to_dict(self._run(img, ["--psm", "0"]))
+
+    def ocr_data(self, img, lang):
+        """Dane TSV (słowa z ramkami i pewnością) z jednego przebiegu Tesseract."""
+        return parse_tsv(self._run(img, ["-l", lang, "tsv"]))
+
+
+class TesserocrBackend:
+    """Trwałe API Tesseract (tesserocr) - bez uruchamiania procesu na każdą stronę."""
+
+    name = "tesserocr"
+
+    def __init__(self):
+        self._apis = {} # język -> PyTessBaseAPI (instancje nie są współdzielone między procesami)
+
+    def _api(self, lang, psm=None):
+        key = (lang, psm)
+        if key not in self._apis:
+            kwargs = {"lang": lang}
+            if psm is not None:
+                kwargs["psm"] = psm
+            self._apis[key] = tesserocr.PyTessBaseAPI(**kwargs)
+        return self._apis[key]
+
+    def osd(self, img):
+        api = self._api("osd", tesserocr.PSM.OSD_ONLY)
+        api.SetImage(img)
+        result = api.DetectOrientationScript() or {}
+        orient_deg = result.get("orient_deg", 0)
+        # Ta sama semantyka co "Rotate" w wyjściu CLI/pytesseract
+        return {
+            "orientation": orient_deg,
+            "rotate": (360 - orient_deg) % 360,
+            "orientation_conf": result.get("orient_conf"),
+            "script": result.get("script_name"),
+            "script_conf": result.get("script_conf"),
+        }
+
+    def ocr_data(self, img, lang):
+        """Dane TSV (słowa z ramkami i pewnością) z jednego przebiegu Tesseract."""
+        api = self._api(lang)
+        api.SetImage(img)
+        dpi = _image_dpi(img)
+        if dpi:
+            api.SetSourceResolution(dpi)
+        api.Recognize()
+        # GetTSVText zwraca same wiersze - bez nagłówka kolumn
+        return parse_tsv("\t".join(TSV_COLUMNS) + "\n" + api.GetTSVText(0))
+
+
+BACKENDS = {
+    "pytesseract": PytesseractBackend,
+    "stdin": StdinBackend,
+    "tesserocr": TesserocrBackend,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_backend(name=None):
+    """Zwraca instancję backendu OCR (jedną na proces i nazwę)."""
+    name = name or OCR_BACKEND
+    if name == "auto":
+        name = "tesserocr" if tesserocr is not None else "stdin"
+    if name == "tesserocr" and tesserocr is None:
+        raise ImportError("Backend OCR 'tesserocr' wymaga pakietu tesserocr.")
+    return BACKENDS[name]()
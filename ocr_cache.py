@@ -0,0 +1,149 @@
+"""Trwały cache wyników OCR na dysku z ograniczeniem rozmiaru (wyrzucanie LRU).
+
+Klucz to skrót z: skrótu bajtów PDF, numeru strony, DPI renderowania, języka
+Tesseract i wersji Tesseract. Każdy wpis to mały plik JSON z tekstem, rotacją OSD
+i układem strony (PageLayout.to_dict); czas modyfikacji pliku pełni rolę znacznika
+ostatniego użycia. Rozmiar cache jest liczony w pamięci (odczyt katalogu raz przy
+starcie); pełny przegląd katalogu następuje dopiero po przekroczeniu limitu
+i przycina cache z zapasem, więc zwykły zapis nie zależy od liczby wpisów.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+# --- Konfiguracja ---
+
+OCR_CACHE_DIR = os.environ.get(
+    "OCR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pdf-translator", "ocr")
+)
+OCR_CACHE_MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_MB", 256)) * 1024 * 1024
+OCR_CACHE_ENABLED = os.environ.get("OCR_CACHE_ENABLED", "1") != "0"
+# Ułamek limitu, do którego przycinane jest przepełnione cache (zapas na kolejne zapisy)
+OCR_CACHE_EVICT_TO = float(os.environ.get("OCR_CACHE_EVICT_TO", 0.9))
+
+
+def document_hash(pdf_bytes):
+    """Skrót SHA-256 zawartości pliku PDF."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def tesseract_version():
+    """Wersja Tesseract (jako tekst) - część klucza cache, bo różne wersje dają różny wynik.
+
+    Sprawdzana raz na proces (uruchomienie binarki tesseract); błąd nie jest zapamiętywany.
+    """
+    import pytesseract # Import na żądanie: pytesseract importuje pandas
+    return str(pytesseract.get_tesseract_version())
+
+
+def ocr_cache_key(doc_hash, page_no, dpi, tesseract_lang, version):
+    """Buduje klucz cache dla jednej strony dokumentu."""
+    raw = json.dumps([doc_hash, page_no, dpi, tesseract_lang, version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class OcrCache:
+    """Cache wyników OCR w katalogu na dysku (bezpieczny dla wątków i procesów)."""
+
+    def __init__(self, directory=OCR_CACHE_DIR, max_bytes=OCR_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._scan()) # Bieżący rozmiar wpisów w bajtach
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _scan(self):
+        """Lista (czas ostatniego użycia, rozmiar, ścieżka) wszystkich wpisów."""
+        entries = []
+        for item in os.scandir(self.directory):
+            if item.is_file() and item.name.endswith(".json"):
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue # Wpis usunięty w międzyczasie przez inny proces
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+        return entries
+
+    def get(self, key):
+        """Zwraca zapisany wynik ({"text", "rotation", "layout"}) lub None."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path) # Oznacz jako ostatnio użyty (LRU)
+            return entry
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, result):
+        """Zapisuje tekst, rotację i układ strony; po przekroczeniu limitu rozmiaru przycina cache."""
+        entry = {"text": result["text"], "rotation": result.get("rotation", 0), "layout": result.get("layout")}
+        # Zapis atomowy: plik tymczasowy + os.replace, aby czytelnik nie zobaczył połowy wpisu
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+                size = f.tell()
+            path = self._path(key)
+            try:
+                replaced = os.path.getsize(path) # Nadpisywany wpis (np. ponowny OCR strony)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._size += size - replaced
+            full = self._size > self.max_bytes
+        if full:
+            self.evict()
+
+    def evict(self):
+        """Cache przekraczające limit przycina (od najdawniej używanych) do OCR_CACHE_EVICT_TO limitu.
+
+        Przegląd katalogu uwzględnia też wpisy dodane i usunięte przez inne procesy.
+        """
+        with self._lock:
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                target = self.max_bytes * OCR_CACHE_EVICT_TO
+                for _, size, path in sorted(entries):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    if total <= target:
+                        break
+            self._size = total
+
+    def clear(self):
+        """Usuwa wszystkie wpisy."""
+        with self._lock:
+            for item in os.scandir(self.directory):
+                if item.name.endswith(".json"):
+                    os.remove(item.path)
+            self._size = 0
+
+
+@functools.lru_cache(maxsize=1)
+def get_ocr_cache():
+    """Współdzielona instancja cache (None, jeśli cache jest wyłączony lub katalog niedostępny)."""
+    if not OCR_CACHE_ENABLED:
+        return None
+    try:
+        return OcrCache()
+    except OSError:
+        return None
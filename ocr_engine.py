@@ -0,0 +1,325 @@
+"""Równoległy silnik OCR - rozkłada strony na pulę procesów Tesseract.
+
+Bez jawnego max_workers strony trafiają do wspólnej dla procesu puli (get_ocr_pool),
+więc równoległe zadania interfejsu nie uruchamiają więcej procesów niż OCR_MAX_WORKERS.
+"""
+
+import contextlib
+import functools
+import os
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from image_preprocess import preprocess
+from ocr_layout import PageLayout
+
+# --- Konfiguracja ---
+
+# Liczba procesów OCR (można nadpisać zmienną środowiskową OCR_WORKERS)
+OCR_MAX_WORKERS = int(os.environ.get("OCR_WORKERS", os.cpu_count() or 1))
+
+# Limit wątków OpenMP wewnątrz Tesseract na jeden proces roboczy.
+# Bez limitu każdy proces tesseract uruchamia tyle wątków, ile jest rdzeni,
+# co przy N procesach daje N*rdzenie wątków walczących o CPU.
+TESSERACT_OMP_THREADS = int(os.environ.get("OCR_OMP_THREADS", 1))
+
+# "spawn" jest bezpieczny także z wielowątkowego procesu Streamlit
+MP_START_METHOD = "spawn"
+
+# Strategia wykrywania orientacji strony (OCR_ORIENTATION):
+#   "osd"            - pełne OSD na każdej stronie, potem OCR (dwa przebiegi Tesseract)
+#   "osd-downscaled" - OSD na pomniejszonej kopii strony, potem OCR
+#   "confidence"     - najpierw OCR; OSD (pomniejszone) i ponowny OCR tylko przy niskiej pewności
+#   "none"           - bez OSD
+# Strony z ustawionym /Rotate w PDF (renderowane już w tej orientacji) pomijają OSD,
+# chyba że wybrano "osd".
+ORIENTATION_STRATEGIES = ("osd", "osd-downscaled", "confidence", "none")
+OCR_ORIENTATION = os.environ.get("OCR_ORIENTATION", "confidence")
+# Średnia pewność słów (0-100), poniżej której strategia "confidence" sprawdza orientację
+ORIENTATION_MIN_CONFIDENCE = float(os.environ.get("OCR_ORIENTATION_MIN_CONF", 60))
+# Dłuższy bok obrazu dla pomniejszonego OSD
+OSD_MAX_SIDE = 1600
+
+
+def _init_worker(omp_threads):
+    """Inicjalizacja procesu roboczego - ogranicza wątki OpenMP Tesseract."""
+    # Binarka tesseract (backend stdin/pytesseract) dziedziczy środowisko procesu,
+    # a tesserocr odczytuje limit przy pierwszym użyciu OpenMP w tym procesie
+    os.environ["OMP_THREAD_LIMIT"] = str(omp_threads)
+
+
+def _new_pool(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(MP_START_METHOD),
+        initializer=_init_worker,
+        initargs=(TESSERACT_OMP_THREADS,),
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_ocr_pool():
+    """Wspólna dla procesu pula OCR_MAX_WORKERS procesów Tesseract, tworzona przy pierwszym użyciu.
+
+    Kolejne zadania nie płacą za uruchamianie procesów (spawn), a zadania równoległe
+    dzielą te same procesy zamiast uruchamiać po OCR_MAX_WORKERS każde.
+    """
+    return _new_pool(OCR_MAX_WORKERS)
+
+
+@contextlib.contextmanager
+def _ocr_executor(max_workers):
+    """Pula dla jednego wywołania: wspólna (max_workers=None) albo własna o podanej liczbie procesów."""
+    if max_workers is not None:
+        with _new_pool(max_workers) as executor:
+            yield executor
+        return
+    executor = get_ocr_pool()
+    try:
+        yield executor
+    except BrokenProcessPool:
+        # Proces roboczy zginął (np. brak pamięci) - pula nie przyjmie już zadań (submit i result
+        # zgłaszają BrokenProcessPool), więc kolejne wywołania dostaną nową
+        if get_ocr_pool() is executor:
+            get_ocr_pool.cache_clear()
+        executor.shutdown(wait=False)
+        raise
+
+
+def tesseract_lang(lang_code):
+    """Ciąg języków przekazywany do Tesseract (angielski zawsze jako drugi)."""
+    # Pozostawienie "+eng" może pomóc w trudniejszych przypadkach (wstawki po angielsku)
+    return lang_code + "+eng"
+
+
+def _cached_result(cache, cache_key, page_index):
+    """Zwraca wynik strony z cache (ze znacznikiem cached=True) lub None."""
+    if cache is None or cache_key is None:
+        return None
+    key = cache_key(page_index)
+    entry = cache.get(key) if key else None
+    if entry is None:
+        return None
+    return {"index": page_index, "text": entry["text"], "rotation": entry.get("rotation", 0),
+            "osd_error": None, "cached": True, "method": "ocr", "layout": entry.get("layout")}
+
+
+def _store_result(cache, cache_key, result):
+    # Zapisujemy tylko świeże wyniki Tesseract (nie z cache ani z warstwy tekstowej PDF)
+    if cache is not None and cache_key is not None and not result.get("cached") and result.get("method") == "ocr":
+        key = cache_key(result["index"])
+        if key:
+            cache.put(key, result)
+
+
+def _downscale_for_osd(img, max_side=OSD_MAX_SIDE):
+    """Pomniejsza obraz do OSD (orientacja nie wymaga pełnej rozdzielczości)."""
+    scale = max_side / max(img.size)
+    if scale >= 1:
+        return img
+    small = img.resize((round(img.width * scale), round(img.height * scale)), Image.BILINEAR)
+    dpi = img.info.get("dpi")
+    if dpi:
+        small.info["dpi"] = (round(dpi[0] * scale), round(dpi[1] * scale))
+    return small
+
+
+def detect_rotation(img, backend, downscale=False, timings=None):
+    """Zwraca kąt (0/90/180/270), o który należy obrócić stronę według OSD."""
+    started = time.perf_counter()
+    try:
+        # Używamy --psm 0 dla OSD
+        osd_data = backend.osd(_downscale_for_osd(img) if downscale else img)
+    finally:
+        if timings is not None:
+            timings["osd"] = timings.get("osd", 0.0) + time.perf_counter() - started
+    return osd_data.get('rotate', 0)
+
+
+def _timed_ocr(timings, fn, *args):
+    """Wywołuje OCR backendu, doliczając czas do timings["ocr"]."""
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings["ocr"] = timings.get("ocr", 0.0) + time.perf_counter() - started
+
+
+def _rotate(img, rotation):
+    # Obracamy w przeciwnym kierunku niż wykryta rotacja; expand=True zapobiega przycinaniu obrazu
+    rotated = img.rotate(-rotation, resample=Image.BICUBIC, expand=True)
+    rotated.info.update(img.info)
+    return rotated
+
+
+def _ocr_layout(timings, backend, img, lang):
+    """OCR obrazu jako PageLayout (linie z ramkami i pewnością z danych TSV)."""
+    data = _timed_ocr(timings, backend.ocr_data, img, lang)
+    return PageLayout.from_tsv(data, dpi=img.info.get("dpi", (None,))[0])
+
+
+def ocr_page(page_index, img, lang_code, orientation=None):
+    """Wykonuje OCR jednej strony z wykrywaniem orientacji wg strategii. Zwraca słownik z tekstem i rotacją.
+
+    result["layout"] to układ strony (PageLayout.to_dict) z ramkami w pikselach obrazu
+    przekazanego do OCR (przed obrotem i wstępną obróbką). result["timings"] zawiera
+    czasy obróbki, OSD i OCR [s] zmierzone w procesie roboczym.
+    """
+    strategy = orientation or OCR_ORIENTATION
+    if strategy not in ORIENTATION_STRATEGIES:
+        raise ValueError(f"Nieznana strategia orientacji: {strategy}")
+    if strategy != "osd" and img.info.get("pdf_rotation"):
+        strategy = "none" # Orientację ustawiono w PDF (/Rotate) i zastosowano przy renderowaniu
+
+    result = {"index": page_index, "text": "", "rotation": 0, "osd_error": None, "cached": False,
+              "method": "ocr", "orientation": strategy, "confidence": None, "layout": None, "timings": {}}
+    timings = result["timings"]
+    source_size = img.size
+    img = preprocess(img, timings=timings) # Kroki OCR_PREPROCESS (przycięcie, prostowanie, binaryzacja...)
+    from ocr_backends import get_backend # Import w procesie OCR - pytesseract importuje pandas
+    backend = get_backend() # Jedna instancja na proces (patrz OCR_BACKEND)
+    lang = tesseract_lang(lang_code)
+
+    if strategy == "confidence":
+        # 1. OCR w orientacji z renderu - większość skanów jest prosto
+        layout = _ocr_layout(timings, backend, img, lang)
+        if layout.mean_confidence() < ORIENTATION_MIN_CONFIDENCE:
+            # 2. Niska pewność - sprawdź orientację i spróbuj ponownie na obróconym obrazie
+            try:
+                rotation = detect_rotation(img, backend, downscale=True, timings=timings)
+                if rotation != 0:
+                    rotated = _ocr_layout(timings, backend, _rotate(img, rotation), lang)
+                    if rotated.mean_confidence() > layout.mean_confidence():
+                        layout = rotated
+                        result["rotation"] = rotation
+            except Exception as osd_error:
+                result["osd_error"] = str(osd_error)
+    else:
+        rotated_image = img # Domyślnie użyj oryginalnego obrazu
+        if strategy in ("osd", "osd-downscaled"):
+            try:
+                # 1. Wykryj orientację i obróć obraz, jeśli to konieczne
+                rotation = detect_rotation(img, backend, downscale=strategy == "osd-downscaled", timings=timings)
+                result["rotation"] = rotation
+                if rotation != 0:
+                    rotated_image = _rotate(img, rotation)
+            except Exception as osd_error:
+                # W razie błędu OSD, kontynuuj z oryginalnym obrazem
+                result["osd_error"] = str(osd_error)
+        # 2. Wykonaj OCR na (potencjalnie obróconym) obrazie
+        layout = _ocr_layout(timings, backend, rotated_image, lang)
+
+    # Ramki w układzie obrazu z renderu: kroki obróbki cofane w odwrotnej kolejności - obrót OSD,
+    # prostowanie przekosu (do DESKEW_MAX_ANGLE, czyli nawet ~200 px na brzegu strony 300 dpi), przycięcie
+    left, top = img.info.get("crop_offset", (0, 0))
+    layout = layout.unrotate(result["rotation"]).unskew(img.info.get("deskew_angle", 0.0))
+    layout = layout.offset(left, top, *source_size)
+    result["text"] = layout.to_text()
+    result["confidence"] = layout.mean_confidence()
+    result["layout"] = layout.to_dict()
+    return result
+
+
+def ocr_pages(images, lang_code, max_workers=None, progress_callback=None, cache=None, cache_key=None,
+              orientation=None):
+    """Wykonuje OCR listy obrazów w puli procesów. Wyniki zwracane są w kolejności stron.
+
+    progress_callback(result, done_count, total) jest wywoływany w wątku
+    wywołującego po zakończeniu każdej strony (kolejność ukończenia, nie stron).
+    Jeśli podano cache (OcrCache) i cache_key(indeks) -> klucz, strony z cache
+    nie trafiają do Tesseract, a nowe wyniki są w nim zapisywane.
+    """
+    if not images:
+        return []
+
+    total = len(images)
+    results = [None] * total
+    done_count = 0
+
+    def finish(result):
+        nonlocal done_count
+        results[result["index"]] = result
+        _store_result(cache, cache_key, result)
+        done_count += 1
+        if progress_callback:
+            progress_callback(result, done_count, total)
+
+    missing = []
+    for i in range(total):
+        cached = _cached_result(cache, cache_key, i)
+        if cached:
+            finish(cached)
+        else:
+            missing.append(i)
+
+    workers = max(1, min(max_workers or OCR_MAX_WORKERS, len(missing) or 1))
+
+    if workers == 1:
+        # Ścieżka szeregowa - bez kosztu uruchamiania puli i bez limitu wątków OpenMP
+        for i in missing:
+            finish(ocr_page(i, images[i], lang_code, orientation))
+        return results
+
+    with _ocr_executor(max_workers) as executor:
+        futures = [executor.submit(ocr_page, i, images[i], lang_code, orientation) for i in missing]
+        try:
+            for future in as_completed(futures):
+                finish(future.result())
+        finally:
+            for future in futures:
+                future.cancel() # Wspólna pula - po błędzie pozostałe strony nie zajmują procesów
+
+    return results
+
+
+def iter_ocr_pages(pages, lang_code, max_workers=None, cache=None, cache_key=None, orientation=None):
+    """Strumieniowy OCR: przyjmuje iterowalne trójki (indeks, obraz, gotowy_wynik) i zwraca wyniki w kolejności wejścia.
+
+    gotowy_wynik różny od None (np. tekst odczytany z warstwy tekstowej PDF)
+    jest oddawany bez OCR, ale w tej samej kolejności co pozostałe strony.
+
+    W locie jest co najwyżej 2 * max_workers stron, więc pamięć pozostaje ograniczona
+    nawet wtedy, gdy źródło stron (renderowanie) jest szybsze od OCR. Strony
+    znalezione w cache (patrz ocr_pages) są oddawane bez uruchamiania Tesseract.
+    """
+    workers = max(1, max_workers or OCR_MAX_WORKERS)
+
+    if workers == 1:
+        for page_index, img, ready in pages:
+            result = ready or _cached_result(cache, cache_key, page_index) or ocr_page(page_index, img, lang_code, orientation)
+            _store_result(cache, cache_key, result)
+            yield result
+        return
+
+    with _ocr_executor(max_workers) as executor:
+        pending = deque()
+
+        def next_result():
+            result = pending.popleft().result()
+            _store_result(cache, cache_key, result)
+            return result
+
+        try:
+            for page_index, img, ready in pages:
+                ready = ready or _cached_result(cache, cache_key, page_index)
+                if ready:
+                    # Gotowy Future - trafia do kolejki, by zachować kolejność stron
+                    future = Future()
+                    future.set_result(ready)
+                else:
+                    future = executor.submit(ocr_page, page_index, img, lang_code, orientation)
+                pending.append(future)
+                # Oddaj gotowe strony z początku kolejki bez czekania na kolejne renderowanie
+                while pending and (pending[0].done() or len(pending) >= 2 * workers):
+                    yield next_result()
+            while pending:
+                yield next_result()
+        finally:
+            for future in pending:
+                future.cancel() # Przerwany potok - strony czekające w kolejce nie zajmują wspólnej puli
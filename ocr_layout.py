@@ -0,0 +1,199 @@
+"""Strukturalny wynik OCR strony: bloki -> akapity -> linie z ramkami i pewnością (z danych TSV Tesseract).
+
+Zamiast słownika na każde słowo wynik trzyma równoległe tablice NumPy z jednym
+wierszem na linię (ramka, pewność, liczba słów, numer bloku i akapitu) oraz cały
+tekst w jednym ciągu z przesunięciami linii. Ramki są w pikselach obrazu
+wyrenderowanego do OCR (dpi), więc dają się przeliczyć na współrzędne strony PDF.
+Linie o niskiej pewności (OCR_LOW_CONFIDENCE) można oznaczyć do poprawki.
+"""
+
+import os
+
+import numpy as np
+
+# --- Konfiguracja ---
+
+# Średnia pewność słów linii (0-100), poniżej której linia jest oznaczana jako niepewna
+OCR_LOW_CONFIDENCE = float(os.environ.get("OCR_LOW_CONFIDENCE", 60))
+
+LEVEL_PAGE = 1
+LEVEL_WORD = 5
+
+
+class PageLayout:
+    """Linie tekstu strony z ramkami (lewo, góra, prawo, dół) i średnią pewnością słów."""
+
+    __slots__ = ("width", "height", "dpi", "text", "line_offsets", "line_boxes", "line_conf", "line_words",
+                 "line_block", "line_par")
+
+    def __init__(self, width, height, dpi, text, line_offsets, line_boxes, line_conf, line_words, line_block,
+                 line_par):
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.text = text # Teksty linii połączone "\n"
+        self.line_offsets = np.asarray(line_offsets, dtype=np.int32) # Początki linii w text (+ koniec)
+        self.line_boxes = np.asarray(line_boxes, dtype=np.int32).reshape(-1, 4)
+        self.line_conf = np.asarray(line_conf, dtype=np.float32) # -1, gdy linia nie ma ocenionych słów
+        self.line_words = np.asarray(line_words, dtype=np.int32) # Liczba ocenionych słów
+        self.line_block = np.asarray(line_block, dtype=np.int32)
+        self.line_par = np.asarray(line_par, dtype=np.int32) # Numer akapitu na stronie
+
+    @classmethod
+    def from_tsv(cls, data, dpi=None):
+        """Buduje układ z danych TSV (słownik list jak z ocr_backends.parse_tsv)."""
+        level = np.asarray(data.get("level", []), dtype=np.int32)
+        width = height = 0
+        pages = np.flatnonzero(level == LEVEL_PAGE)
+        if pages.size:
+            width, height = data["width"][pages[0]], data["height"][pages[0]]
+        words = [i for i in np.flatnonzero(level == LEVEL_WORD) if data["text"][i].strip()]
+        if not words:
+            return cls(width, height, dpi, "", [0], [], [], [], [], [])
+        columns = {name: np.asarray(data[name])[words] for name in
+                   ("block_num", "par_num", "line_num", "left", "top", "width", "height", "conf")}
+        # Kolejne słowa tej samej linii mają ten sam klucz (blok, akapit, linia)
+        keys = np.stack([columns["block_num"], columns["par_num"], columns["line_num"]], axis=1)
+        new_line = np.ones(len(words), dtype=bool)
+        new_line[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+        starts = np.flatnonzero(new_line)
+        new_par = np.ones(len(starts), dtype=bool)
+        new_par[1:] = (keys[starts[1:], :2] != keys[starts[:-1], :2]).any(axis=1)
+
+        left, top = columns["left"], columns["top"]
+        boxes = np.stack([np.minimum.reduceat(left, starts), np.minimum.reduceat(top, starts),
+                          np.maximum.reduceat(left + columns["width"], starts),
+                          np.maximum.reduceat(top + columns["height"], starts)], axis=1)
+        conf = columns["conf"].astype(np.float32)
+        rated = conf >= 0
+        line_words = np.add.reduceat(rated.astype(np.int32), starts)
+        conf_sum = np.add.reduceat(np.where(rated, conf, 0), starts)
+        line_conf = np.divide(conf_sum, line_words, out=np.full(len(starts), -1, dtype=np.float32),
+                              where=line_words > 0)
+
+        word_text = [data["text"][i] for i in words]
+        ends = list(starts[1:]) + [len(words)]
+        lines = [" ".join(word_text[start:end]) for start, end in zip(starts, ends)]
+        offsets = np.zeros(len(lines) + 1, dtype=np.int32)
+        offsets[1:] = np.cumsum([len(line) + 1 for line in lines])
+        _, line_block = np.unique(keys[starts, 0], return_inverse=True)
+        return cls(width, height, dpi, "\n".join(lines), offsets, boxes, line_conf, line_words,
+                   line_block, np.cumsum(new_par) - 1)
+
+    def __len__(self):
+        return len(self.line_conf)
+
+    def line_text(self, index):
+        return self.text[self.line_offsets[index]:self.line_offsets[index + 1] - 1]
+
+    def lines(self):
+        return self.text.split("\n") if len(self) else []
+
+    def to_text(self):
+        """Tekst strony: linie znakiem nowej linii, akapity pustą linią."""
+        paragraphs = []
+        for line, par in zip(self.lines(), self.line_par):
+            if par == len(paragraphs):
+                paragraphs.append([])
+            paragraphs[-1].append(line)
+        return "\n\n".join("\n".join(par) for par in paragraphs)
+
+    def mean_confidence(self):
+        """Średnia pewność słów strony (0-100) lub 0, jeśli nie rozpoznano żadnego."""
+        total = self.line_words.sum()
+        return float((self.line_conf * self.line_words).sum() / total) if total else 0.0
+
+    def low_confidence_lines(self, threshold=OCR_LOW_CONFIDENCE):
+        """Indeksy linii o średniej pewności poniżej progu (kandydaci do poprawki)."""
+        return np.flatnonzero((self.line_conf >= 0) & (self.line_conf < threshold))
+
+    def _group_boxes(self, groups):
+        """Ramki grup kolejnych linii (suma ramek linii o tym samym numerze grupy)."""
+        if not len(self):
+            return np.zeros((0, 4), dtype=np.int32)
+        starts = np.flatnonzero(np.diff(groups, prepend=-1))
+        boxes = self.line_boxes
+        return np.stack([np.minimum.reduceat(boxes[:, 0], starts), np.minimum.reduceat(boxes[:, 1], starts),
+                         np.maximum.reduceat(boxes[:, 2], starts), np.maximum.reduceat(boxes[:, 3], starts)],
+                        axis=1)
+
+    def block_boxes(self):
+        """Ramki bloków (suma ramek ich linii), w kolejności bloków."""
+        return self._group_boxes(self.line_block)
+
+    def paragraph_boxes(self):
+        """Ramki akapitów (suma ramek ich linii), w kolejności akapitów."""
+        return self._group_boxes(self.line_par)
+
+    def block_texts(self):
+        """Teksty bloków (akapity rozdzielone pustą linią), w kolejności bloków."""
+        blocks = []
+        for line, block, par in zip(self.lines(), self.line_block, self.line_par):
+            if block == len(blocks):
+                blocks.append([])
+            if not blocks[-1] or blocks[-1][-1][0] != par:
+                blocks[-1].append((par, []))
+            blocks[-1][-1][1].append(line)
+        return ["\n\n".join("\n".join(lines) for _, lines in block) for block in blocks]
+
+    def unrotate(self, rotation):
+        """Przelicza ramki z obrazu obróconego o rotation° w prawo (jak _rotate w ocr_engine) na obraz sprzed obrotu."""
+        if not rotation:
+            return self
+        left, top, right, bottom = self.line_boxes.T
+        if rotation == 90:
+            width, height = self.height, self.width
+            boxes = np.stack([top, height - right, bottom, height - left], axis=1)
+        elif rotation == 180:
+            width, height = self.width, self.height
+            boxes = np.stack([width - right, height - bottom, width - left, height - top], axis=1)
+        elif rotation == 270:
+            width, height = self.height, self.width
+            boxes = np.stack([width - bottom, left, width - top, right], axis=1)
+        else:
+            raise ValueError(f"Nieobsługiwany obrót: {rotation}")
+        return PageLayout(width, height, self.dpi, self.text, self.line_offsets, boxes, self.line_conf,
+                          self.line_words, self.line_block, self.line_par)
+
+    def unskew(self, angle):
+        """Cofa prostowanie przekosu: obraz obrócony o angle° w lewo wokół środka (Image.rotate, bez zmiany rozmiaru).
+
+        Obracane są środki ramek, a ich rozmiar zostaje - ramka nadal obejmuje jedną
+        poziomą linię tekstu, tylko w miejscu, w którym leży ona na obrazie sprzed prostowania.
+        """
+        if not angle:
+            return self
+        boxes = self.line_boxes.astype(np.float64)
+        cx, cy = self.width / 2, self.height / 2
+        dx = (boxes[:, 0] + boxes[:, 2]) / 2 - cx
+        dy = (boxes[:, 1] + boxes[:, 3]) / 2 - cy
+        radians = np.radians(angle)
+        cos, sin = np.cos(radians), np.sin(radians)
+        # Odwrotność obrotu Image.rotate(angle) we współrzędnych obrazu (oś y w dół)
+        shift_x = cx + dx * cos - dy * sin - (boxes[:, 0] + boxes[:, 2]) / 2
+        shift_y = cy + dx * sin + dy * cos - (boxes[:, 1] + boxes[:, 3]) / 2
+        shift = np.rint(np.stack([shift_x, shift_y, shift_x, shift_y], axis=1)).astype(np.int32)
+        return PageLayout(self.width, self.height, self.dpi, self.text, self.line_offsets, self.line_boxes + shift,
+                          self.line_conf, self.line_words, self.line_block, self.line_par)
+
+    def offset(self, dx, dy, width=None, height=None):
+        """Przesuwa ramki (np. o obcięty brzeg obrazu) i opcjonalnie ustawia rozmiar całego obrazu."""
+        return PageLayout(width or self.width, height or self.height, self.dpi, self.text, self.line_offsets,
+                          self.line_boxes + np.array([dx, dy, dx, dy], dtype=np.int32), self.line_conf,
+                          self.line_words, self.line_block, self.line_par)
+
+    def to_dict(self):
+        """Zwarta postać do JSON (cache OCR, stan zadania): listy zamiast tablic."""
+        return {
+            "width": int(self.width), "height": int(self.height), "dpi": self.dpi, "text": self.text,
+            "boxes": self.line_boxes.ravel().tolist(), "conf": [round(float(c), 1) for c in self.line_conf],
+            "words": self.line_words.tolist(), "block": self.line_block.tolist(), "par": self.line_par.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        lines = data["text"].split("\n") if data["words"] else []
+        offsets = np.zeros(len(lines) + 1, dtype=np.int32)
+        offsets[1:] = np.cumsum([len(line) + 1 for line in lines])
+        return cls(data["width"], data["height"], data.get("dpi"), data["text"], offsets, data["boxes"],
+                   data["conf"], data["words"], data["block"], data["par"])
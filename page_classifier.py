@@ -0,0 +1,68 @@
+"""Klasyfikacja stron PDF: bezpośredni odczyt warstwy tekstowej czy renderowanie + OCR.
+
+Dokumenty bywają mieszane - część stron jest "cyfrowa" (z warstwą tekstową),
+a część to skany. Dla stron cyfrowych odczyt tekstu przez PyMuPDF trwa
+milisekundy, więc nie ma sensu ich renderować i przepuszczać przez Tesseract.
+"""
+
+import os
+
+# --- Konfiguracja ---
+
+# Minimalna liczba znaków w warstwie tekstowej, by uznać ją za użyteczną
+TEXT_LAYER_MIN_CHARS = int(os.environ.get("TEXT_LAYER_MIN_CHARS", 50))
+# Minimalny udział powierzchni bloków tekstu na stronie zdominowanej przez obraz
+TEXT_LAYER_MIN_COVERAGE = float(os.environ.get("TEXT_LAYER_MIN_COVERAGE", 0.15))
+# Udział powierzchni obrazów, powyżej którego strona jest traktowana jak skan
+SCANNED_IMAGE_COVERAGE = 0.5
+# Maksymalny udział znaków "śmieciowych" (np. brak mapowania fontu na Unicode)
+MAX_INVALID_CHAR_RATIO = 0.1
+
+METHOD_TEXT = "text" # Tekst odczytany z warstwy tekstowej PDF
+METHOD_OCR = "ocr" # Render + Tesseract
+
+
+def _area(rect):
+    return max(0.0, rect[2] - rect[0]) * max(0.0, rect[3] - rect[1])
+
+
+def _invalid_char_ratio(text):
+    """Udział znaków zastępczych/sterujących - oznaka tekstu bez poprawnego mapowania Unicode."""
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return 1.0
+    invalid = sum(1 for c in chars if c == "�" or not c.isprintable())
+    return invalid / len(chars)
+
+
+def classify_page(page):
+    """Decyduje, czy strona fitz.Page ma użyteczną warstwę tekstową.
+
+    Zwraca słownik z metodą ("text" lub "ocr"), odczytanym tekstem (dla "text")
+    i metrykami, na podstawie których podjęto decyzję.
+    """
+    page_area = _area(page.rect) or 1.0
+    text = page.get_text("text", sort=True)
+    chars = len(text.strip())
+
+    # Bloki tekstu (typ 0) i obrazy - bez rasteryzacji strony
+    text_area = sum(_area(block[:4]) for block in page.get_text("blocks") if block[6] == 0)
+    image_area = sum(_area(info["bbox"]) for info in page.get_image_info())
+    text_coverage = min(1.0, text_area / page_area)
+    image_coverage = min(1.0, image_area / page_area)
+    invalid_ratio = _invalid_char_ratio(text)
+
+    use_text = (
+        chars >= TEXT_LAYER_MIN_CHARS
+        and invalid_ratio <= MAX_INVALID_CHAR_RATIO
+        # Strona będąca głównie obrazem z krótkim podpisem to nadal skan
+        and (image_coverage < SCANNED_IMAGE_COVERAGE or text_coverage >= TEXT_LAYER_MIN_COVERAGE)
+    )
+    return {
+        "method": METHOD_TEXT if use_text else METHOD_OCR,
+        "text": text.strip() if use_text else "",
+        "chars": chars,
+        "text_coverage": round(text_coverage, 3),
+        "image_coverage": round(image_coverage, 3),
+        "invalid_char_ratio": round(invalid_ratio, 3),
+    }
@@ -0,0 +1,112 @@
+"""Trwałe wyniki pojedynczych stron (tekst, układ OCR, sposób odczytu, tłumaczenie) w bazie SQLite.
+
+Wpis jest identyfikowany skrótem PDF i numerem strony oraz skrótem ustawień, od których
+zależy wynik (język i tryb OCR, języki tłumaczenia, model, komunikat systemowy).
+Po zmianie wyboru stron (np. z 1-10 na 1-12) potok bierze gotowe strony stąd - bez
+klasyfikacji, OCR i zapytań do API - a przetwarza tylko strony dodane; tłumaczenie
+jest składane z segmentów stron w kolejności wyboru.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- Konfiguracja ---
+
+PAGE_RESULTS_PATH = os.environ.get(
+    "PAGE_RESULTS_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "pdf-translator", "page_results.sqlite3"),
+)
+PAGE_RESULTS_ENABLED = os.environ.get("PAGE_RESULTS_ENABLED", "1") != "0"
+# Po tym czasie nieużywane wyniki stron są usuwane [h]
+PAGE_RESULTS_RETENTION_HOURS = float(os.environ.get("PAGE_RESULTS_RETENTION_HOURS", 24 * 30))
+
+
+def settings_key(*settings):
+    """Skrót ustawień przetwarzania (wartości serializowalne do JSON)."""
+    return hashlib.sha256(json.dumps(settings).encode("utf-8")).hexdigest()
+
+
+class PageResults:
+    """Magazyn (skrót PDF, numer strony, ustawienia) -> wynik strony (bezpieczny dla wątków)."""
+
+    def __init__(self, path=PAGE_RESULTS_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS pages (
+                    doc_hash TEXT NOT NULL,
+                    page_no INTEGER NOT NULL,
+                    settings TEXT NOT NULL,
+                    method TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    layout TEXT,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    PRIMARY KEY (doc_hash, page_no, settings)
+                )"""
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}
+            if "layout" not in columns: # Baza sprzed zapisu układu OCR
+                self._conn.execute("ALTER TABLE pages ADD COLUMN layout TEXT")
+        self.prune()
+
+    def get(self, doc_hash, page_no, settings):
+        """Zwraca wynik strony ({"method", "text", "translation", "layout"}) lub None."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                """SELECT method, text, translation, layout FROM pages
+                   WHERE doc_hash = ? AND page_no = ? AND settings = ?""",
+                (doc_hash, page_no, settings),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE pages SET last_used_at = ? WHERE doc_hash = ? AND page_no = ? AND settings = ?",
+                (time.time(), doc_hash, page_no, settings),
+            )
+        return {"method": row[0], "text": row[1], "translation": row[2],
+                "layout": json.loads(row[3]) if row[3] else None}
+
+    def put(self, doc_hash, page_no, settings, method, text, translation, layout=None):
+        """Zapisuje (lub nadpisuje) wynik strony; layout to PageLayout.to_dict() lub None."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO pages
+                   (doc_hash, page_no, settings, method, text, translation, layout, created_at, last_used_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (doc_hash, page_no, settings, method, text, translation,
+                 json.dumps(layout, ensure_ascii=False) if layout else None, now, now),
+            )
+
+    def prune(self):
+        """Usuwa wyniki nieużywane dłużej niż PAGE_RESULTS_RETENTION_HOURS."""
+        expire_before = time.time() - PAGE_RESULTS_RETENTION_HOURS * 3600
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pages WHERE last_used_at < ?", (expire_before,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+@functools.lru_cache(maxsize=1)
+def get_page_results():
+    """Współdzielona instancja magazynu wyników stron (None, jeśli wyłączony lub niedostępny)."""
+    if not PAGE_RESULTS_ENABLED:
+        return None
+    try:
+        return PageResults()
+    except (OSError, sqlite3.Error):
+        return None
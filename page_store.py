@@ -0,0 +1,80 @@
+"""Magazyn podglądów stron o ograniczonym zużyciu pamięci.
+
+Podgląd strony (render w rozdzielczości ekranowej, ~2,7 MB na stronę A4 w RGB) jest od
+razu zapisywany do katalogu tymczasowego jako JPEG; w pamięci zostaje tylko mała
+miniatura (kilkanaście kB). Przeglądarka stron wczytuje z dysku jedynie strony
+z bieżącego zakresu, więc pamięć nie rośnie z liczbą stron i użytkowników.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+
+from PIL import Image
+
+# --- Konfiguracja ---
+
+# Katalog na podglądy (domyślnie katalog tymczasowy systemu)
+PAGE_STORE_DIR = os.environ.get("PAGE_STORE_DIR") or None
+# Dłuższy bok miniatury trzymanej w pamięci [px]
+THUMBNAIL_MAX_SIDE = int(os.environ.get("THUMBNAIL_MAX_SIDE", 256))
+PREVIEW_JPEG_QUALITY = 85
+THUMBNAIL_JPEG_QUALITY = 70
+
+
+def _jpeg_bytes(img, quality):
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class PageImageStore:
+    """Podglądy stron na dysku + miniatury w pamięci (bezpieczny dla wątków, tylko dopisywanie)."""
+
+    def __init__(self, directory=PAGE_STORE_DIR):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="pdf-translator-pages-", dir=directory)
+        self._thumbnails = [] # Bajty JPEG miniatur, w kolejności stron
+        self._lock = threading.Lock()
+        # Katalog znika razem z magazynem (także przy zamknięciu interpretera)
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def __len__(self):
+        return len(self._thumbnails)
+
+    def path(self, index):
+        """Ścieżka do pliku podglądu strony o danym indeksie (kolejność dodawania)."""
+        return os.path.join(self.directory, f"page_{index:05d}.jpg")
+
+    def add(self, img):
+        """Zapisuje podgląd strony na dysku i zachowuje w pamięci tylko jego miniaturę."""
+        preview = _jpeg_bytes(img, PREVIEW_JPEG_QUALITY)
+        thumbnail = img.copy()
+        thumbnail.thumbnail((THUMBNAIL_MAX_SIDE, THUMBNAIL_MAX_SIDE))
+        thumbnail = _jpeg_bytes(thumbnail, THUMBNAIL_JPEG_QUALITY)
+        with self._lock:
+            index = len(self._thumbnails)
+            with open(self.path(index), "wb") as f:
+                f.write(preview)
+            self._thumbnails.append(thumbnail)
+        return index
+
+    def thumbnail(self, index):
+        """Miniatura strony (bajty JPEG)."""
+        return self._thumbnails[index]
+
+    def open(self, index):
+        """Wczytuje podgląd strony z dysku jako obraz PIL."""
+        with Image.open(self.path(index)) as img:
+            img.load()
+            return img
+
+    def close(self):
+        """Usuwa pliki podglądów z dysku."""
+        self._finalizer()
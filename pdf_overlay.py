@@ -0,0 +1,332 @@
+"""Dwujęzyczny PDF w układzie oryginału (PyMuPDF): strona źródłowa po lewej, tłumaczenie po prawej.
+
+Prawa połowa strony wynikowej ma wymiary strony źródłowej, a tłumaczenie jest
+wpisywane w miejsca akapitów oryginału - ramki akapitów z układu OCR (PageLayout)
+albo bloki warstwy tekstowej PDF - z czcionką zmniejszaną, aż tekst się zmieści.
+Skany dostają niewidoczną warstwę tekstu OCR, więc plik da się przeszukiwać
+w obu językach. Strony są składane partiami (BILINGUAL_BATCH_PAGES) i dopisywane
+do pliku zapisem przyrostowym; po każdej partii dokument wynikowy jest zamykany, więc
+gotowe strony nie zostają w pamięci. Plik źródłowy jest otwierany ze ścieżki (MuPDF
+czyta go na żądanie), a strony (numer, tłumaczenie, układ) przychodzą z iteratora -
+np. z pliku JSON Lines (write_pages_file / read_pages_file) - więc pamięć nie rośnie
+z długością dokumentu.
+"""
+
+import functools
+import json
+import os
+import re
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from markdown_stream import split_blocks
+from ocr_layout import PageLayout
+
+# --- Konfiguracja ---
+
+# Liczba stron składanych w pamięci przed dopisaniem do pliku
+BILINGUAL_BATCH_PAGES = int(os.environ.get("BILINGUAL_BATCH_PAGES", 16))
+# Zakres rozmiaru czcionki tłumaczenia [pt]
+BILINGUAL_MAX_FONT_SIZE = float(os.environ.get("BILINGUAL_MAX_FONT_SIZE", 11))
+BILINGUAL_MIN_FONT_SIZE = 4.0
+# Krok zmniejszania czcionki, gdy tłumaczenie nie mieści się w ramce
+FONT_SHRINK = 0.85
+# Rozmiar czcionki względem wysokości linii oryginału i odstęp linii tłumaczenia względem czcionki
+FONT_TO_LINE_HEIGHT = 0.8
+LINE_SPACING = 1.2
+# Margines strony, gdy tłumaczenie zajmuje cały obszar tekstu [pt]
+PAGE_MARGIN = 36
+# Odstęp między wydłużoną ramką tłumaczenia a następną ramką [pt]
+REGION_GAP = 2
+SEPARATOR_COLOR = (0.75, 0.75, 0.75)
+# Adnotacja stron, na które tłumaczenie partii zostało podzielone w przybliżeniu
+APPROXIMATE_NOTE = "Podział tłumaczenia na strony jest przybliżony"
+APPROXIMATE_NOTE_SIZE = 7
+APPROXIMATE_NOTE_COLOR = (0.5, 0.5, 0.5)
+
+RENDER_INVISIBLE = 3 # Tryb renderowania tekstu PDF: bez wypełnienia i obrysu (tylko do wyszukiwania)
+
+_MARKUP_RE = re.compile(r"^\s{0,3}(#{1,6}\s+|>\s?)|\*\*|__|`|(?<!\w)[*_](?=\S)|(?<=\S)[*_](?!\w)", re.MULTILINE)
+_LIST_RE = re.compile(r"^(\s*)[-*+]\s+", re.MULTILINE)
+_TABLE_RULE_RE = re.compile(r"^\s*\|?[\s:|-]+\|?\s*$")
+
+
+@functools.lru_cache(maxsize=1)
+def _font():
+    # Helvetica z zapasowymi czcionkami PyMuPDF dla znaków spoza Latin-1 (cyrylica, CJK, ...)
+    return fitz.Font("helv")
+
+
+def plain_paragraphs(markdown_text):
+    """Akapity tłumaczenia jako zwykły tekst (bez znaczników Markdown), w kolejności."""
+    paragraphs = []
+    for block in split_blocks(markdown_text):
+        if block.lstrip().startswith(("```", "~~~")):
+            lines = block.split("\n")[1:]
+            if lines and lines[-1].strip() in ("```", "~~~"):
+                lines = lines[:-1]
+            text = "\n".join(lines)
+        else:
+            lines = [line for line in block.split("\n") if not _TABLE_RULE_RE.match(line) or "-" not in line]
+            text = _MARKUP_RE.sub("", _LIST_RE.sub(r"\1• ", "\n".join(lines)))
+        if text.strip():
+            paragraphs.append(text.strip())
+    return paragraphs
+
+
+def _union(rects):
+    rect = fitz.Rect(rects[0])
+    for other in rects[1:]:
+        rect |= other
+    return rect
+
+
+def _layout_regions(layout, page_rect):
+    """Ramki akapitów i bloków z układu OCR w punktach strony oraz wysokość linii [pt]."""
+    scale = np.array([page_rect.width / layout.width, page_rect.height / layout.height] * 2)
+    paragraphs = [fitz.Rect(box) for box in (layout.paragraph_boxes() * scale).tolist()]
+    blocks = [fitz.Rect(box) for box in (layout.block_boxes() * scale).tolist()]
+    heights = (layout.line_boxes[:, 3] - layout.line_boxes[:, 1]) * scale[1]
+    return paragraphs, blocks, float(np.median(heights))
+
+
+def _text_regions(page):
+    """Ramki bloków warstwy tekstowej strony (we współrzędnych widocznej strony) i wysokość linii [pt]."""
+    rects, heights = [], []
+    for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+        if block_type != 0 or not text.strip():
+            continue
+        rect = fitz.Rect(x0, y0, x1, y1) * page.rotation_matrix
+        rects.append(rect)
+        heights.append(rect.height / max(1, text.strip().count("\n") + 1))
+    return rects, float(np.median(heights)) if heights else BILINGUAL_MAX_FONT_SIZE
+
+
+def _expand_down(rects, bottom):
+    """Wydłuża każdą ramkę w dół do najbliższej ramki pod nią (w tych samych kolumnach) lub do bottom.
+
+    Tłumaczenie bywa dłuższe od oryginału - wolne miejsce pod akapitem jest lepsze niż mniejsza czcionka.
+    """
+    expanded = []
+    for rect in rects:
+        below = [other.y0 for other in rects
+                 if other.y0 >= rect.y1 and other.x0 < rect.x1 and other.x1 > rect.x0]
+        limit = min(below) - REGION_GAP if below else bottom
+        expanded.append(fitz.Rect(rect.x0, rect.y0, rect.x1, max(rect.y1, limit)))
+    return expanded
+
+
+def _regions(paragraphs, candidates, page_rect):
+    """Dopasowuje akapity tłumaczenia do ramek oryginału: [(ramka, tekst)].
+
+    Wybierany jest zestaw ramek o liczności najbliższej liczbie akapitów (pierwszy przy
+    remisie). Przy równej liczności akapit i trafia do ramki i; w pozostałych przypadkach
+    akapity i ramki są dzielone proporcjonalnie na min(akapity, ramki) kolejnych grup -
+    grupa akapitów idzie do obszaru obejmującego jej ramki.
+    """
+    candidates = [rects for rects in candidates if rects]
+    if not candidates:
+        area = page_rect + (PAGE_MARGIN, PAGE_MARGIN, -PAGE_MARGIN, -PAGE_MARGIN)
+        return [(area, "\n\n".join(paragraphs))]
+    rects = min(candidates, key=lambda rects: abs(len(rects) - len(paragraphs)))
+    groups = min(len(rects), len(paragraphs))
+    areas, texts = [], []
+    for group in range(groups):
+        group_rects = rects[group * len(rects) // groups:(group + 1) * len(rects) // groups]
+        areas.append(_union(group_rects))
+        texts.append("\n\n".join(paragraphs[group * len(paragraphs) // groups:
+                                             (group + 1) * len(paragraphs) // groups]))
+    return list(zip(_expand_down(areas, page_rect.y1 - PAGE_MARGIN), texts))
+
+
+@functools.lru_cache(maxsize=None)
+def _char_width(char):
+    # Szerokość znaku przy czcionce 1 pt - Font.text_length przy każdym wywołaniu koduje tekst znak po znaku
+    return _font().text_length(char, fontsize=1)
+
+
+def _text_width(text):
+    return sum(map(_char_width, text))
+
+
+def _wrap(text, width):
+    """Dzieli tekst na linie nie szersze niż width (w jednostkach czcionki 1 pt); za długie słowa - po znakach."""
+    space = _char_width(" ")
+    lines = []
+    for paragraph in text.split("\n"):
+        line, line_width = None, 0.0
+        for word in paragraph.split():
+            word_width = _text_width(word)
+            if line is not None and line_width + space + word_width <= width:
+                line, line_width = f"{line} {word}", line_width + space + word_width
+                continue
+            if line is not None:
+                lines.append(line)
+            while word_width > width and len(word) > 1:
+                cut, cut_width = 1, _char_width(word[0])
+                while cut < len(word) - 1 and cut_width + _char_width(word[cut]) <= width:
+                    cut_width += _char_width(word[cut])
+                    cut += 1
+                lines.append(word[:cut])
+                word, word_width = word[cut:], word_width - cut_width
+            line, line_width = word, word_width
+        lines.append(line or "")
+    return lines
+
+
+def _fit_text(rect, text, fontsize):
+    """Linie tekstu i największa czcionka (od fontsize), przy której mieszczą się w ramce.
+
+    Gdy tekst nie mieści się nawet najmniejszą czcionką, linie wychodzą poza dół ramki.
+    """
+    fontsize = max(BILINGUAL_MIN_FONT_SIZE, min(fontsize, BILINGUAL_MAX_FONT_SIZE))
+    while True:
+        lines = _wrap(text, rect.width / fontsize)
+        if len(lines) * fontsize * LINE_SPACING <= rect.height or fontsize <= BILINGUAL_MIN_FONT_SIZE:
+            return lines, fontsize
+        fontsize = max(BILINGUAL_MIN_FONT_SIZE, fontsize * FONT_SHRINK)
+
+
+def _append_lines(writer, rect, lines, fontsize, bottom):
+    """Dopisuje linie do TextWriter od górnej krawędzi ramki (do bottom - niżej kończy się strona)."""
+    font = _font()
+    y = rect.y0 + fontsize * font.ascender
+    for line in lines:
+        if y > bottom:
+            break
+        if line:
+            writer.append((rect.x0, y), line, font=font, fontsize=fontsize)
+        y += fontsize * LINE_SPACING
+
+
+def _write_ocr_layer(page, layout, page_rect):
+    """Niewidoczny tekst linii OCR na obrazie strony (zaznaczanie i wyszukiwanie w skanie)."""
+    if not len(layout):
+        return
+    font = _font()
+    writer = fitz.TextWriter(page.rect)
+    scale_x, scale_y = page_rect.width / layout.width, page_rect.height / layout.height
+    for index, (left, top, right, bottom) in enumerate(layout.line_boxes.tolist()):
+        text = layout.line_text(index)
+        width = _text_width(text)
+        if not text or not width:
+            continue
+        height = (bottom - top) * scale_y
+        # Rozmiar dobrany tak, by linia miała szerokość ramki z OCR (nie wyższa niż ramka)
+        fontsize = min(height, (right - left) * scale_x / width)
+        origin = (page_rect.x0 + left * scale_x, page_rect.y0 + bottom * scale_y - 0.2 * height)
+        writer.append(origin, text, font=font, fontsize=fontsize)
+    writer.write_text(page, render_mode=RENDER_INVISIBLE)
+
+
+def add_bilingual_page(out, src, page_no, translation, layout=None, separator=True, approximate=False):
+    """Dopisuje do out stronę: page_no ze src po lewej, tłumaczenie w jej układzie po prawej.
+
+    layout (PageLayout lub słownik z to_dict()) - układ OCR strony; bez niego ramki są
+    brane z warstwy tekstowej PDF. approximate - granice tłumaczenia strony są przybliżone
+    (adnotacja APPROXIMATE_NOTE w górnym marginesie tłumaczenia).
+    """
+    source = src[page_no - 1]
+    width, height = source.rect.width, source.rect.height
+    left = fitz.Rect(0, 0, width, height)
+    if isinstance(layout, dict):
+        layout = PageLayout.from_dict(layout)
+    if layout is None or not len(layout):
+        text_rects, line_height = _text_regions(source)
+        candidates = (text_rects,)
+    else:
+        paragraphs_rects, block_rects, line_height = _layout_regions(layout, left)
+        candidates = (paragraphs_rects, block_rects)
+
+    page = out.new_page(width=2 * width, height=height)
+    # show_pdf_page nie uwzględnia /Rotate strony źródłowej jak przeglądarka (90°/270° - inna skala),
+    # więc strona jest pokazywana bez obrotu i obracana tutaj (src to prywatna kopia dokumentu)
+    rotation = source.rotation
+    if rotation:
+        source.set_rotation(0)
+    page.show_pdf_page(left, src, page_no - 1, rotate=-rotation)
+    if layout is not None and len(layout):
+        _write_ocr_layer(page, layout, left)
+    if separator:
+        page.draw_line((width, 0), (width, height), color=SEPARATOR_COLOR, width=0.5)
+    if approximate:
+        note = fitz.TextWriter(page.rect, color=APPROXIMATE_NOTE_COLOR)
+        note.append((width + PAGE_MARGIN / 2, PAGE_MARGIN / 2), APPROXIMATE_NOTE, font=_font(),
+                    fontsize=APPROXIMATE_NOTE_SIZE)
+        note.write_text(page)
+
+    paragraphs = plain_paragraphs(translation or "")
+    if not paragraphs:
+        return page
+    shift = fitz.Matrix(1, 0, 0, 1, width, 0)
+    fontsize = line_height * FONT_TO_LINE_HEIGHT
+    writer = fitz.TextWriter(page.rect)
+    for rect, text in _regions(paragraphs, candidates, left):
+        rect = (rect * shift) & fitz.Rect(width, 0, 2 * width, height)
+        lines, size = _fit_text(rect, text, fontsize)
+        _append_lines(writer, rect, lines, size, height - PAGE_MARGIN / 2)
+    writer.write_text(page)
+    return page
+
+
+def write_pages_file(pages, path):
+    """Zapisuje krotki stron (jak w write_bilingual_pdf) do pliku JSON Lines - po jednej stronie w linii."""
+    with open(path, "w", encoding="utf-8") as f:
+        for page in pages:
+            f.write(json.dumps(list(page), ensure_ascii=False) + "\n")
+
+
+def read_pages_file(path):
+    """Generator krotek stron z pliku zapisanego przez write_pages_file (czytanego linia po linii)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield tuple(json.loads(line))
+
+
+def _flush(batch, path, first):
+    """Zapisuje partię stron: nowy plik dla pierwszej partii, potem zapis przyrostowy na końcu pliku.
+
+    Dokument wynikowy jest otwierany tylko na czas dopisania partii - zamknięcie zwalnia
+    z pamięci strony zapisane wcześniej.
+    """
+    batch.subset_fonts() # Tylko użyte znaki czcionek - bez tego każda strona niesie pełne czcionki
+    if first:
+        batch.save(path, garbage=3, deflate=True)
+        return
+    out = fitz.open(path)
+    try:
+        out.insert_pdf(batch)
+        out.saveIncr()
+    finally:
+        out.close()
+
+
+def write_bilingual_pdf(source_path, pages, path, batch_pages=BILINGUAL_BATCH_PAGES):
+    """Zapisuje dwujęzyczny PDF do path.
+
+    source_path - ścieżka PDF źródłowego. pages - iterowalne krotki (numer strony,
+    tłumaczenie strony w Markdown, układ OCR lub None[, czy podział tłumaczenia na strony
+    jest przybliżony]), w kolejności stron wynikowych; są czytane na bieżąco, partiami.
+    Zwraca liczbę zapisanych stron.
+    """
+    src = fitz.open(source_path)
+    count = 0
+    batch = fitz.open()
+    try:
+        for page_no, translation, layout, *approximate in pages:
+            add_bilingual_page(batch, src, page_no, translation, layout, approximate=any(approximate))
+            count += 1
+            if len(batch) >= max(1, batch_pages):
+                _flush(batch, path, first=count == len(batch))
+                batch.close()
+                batch = fitz.open()
+        if not count:
+            batch.new_page() # PDF bez stron nie jest poprawnym plikiem
+        if len(batch):
+            _flush(batch, path, first=count <= len(batch))
+    finally:
+        batch.close()
+        src.close()
+    return count
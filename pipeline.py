@@ -0,0 +1,350 @@
+"""Strumieniowy potok render -> OCR -> tłumaczenie połączony ograniczonymi kolejkami.
+
+Renderowanie i OCR działają w wątkach w tle. Strony po OCR są od razu
+zlecane tłumaczowi (ChunkedTranslator, współbieżnie), a wynik jest konsumowany
+w kolejności przez wywołującego (zadanie w tle, tryb wsadowy). Dzięki temu strona
+N+1 jest renderowana, gdy strona N jest w OCR, a strona N-1 jest tłumaczona.
+Strony przetworzone wcześniej (page_results) są brane z gotowym tłumaczeniem -
+po rozszerzeniu wyboru stron przetwarzane są tylko strony dodane.
+"""
+
+import os
+import queue
+import threading
+
+from image_preprocess import OCR_PREPROCESS
+from markdown_stream import split_blocks
+from ocr_cache import ocr_cache_key, tesseract_version
+from ocr_engine import OCR_ORIENTATION, iter_ocr_pages, tesseract_lang
+from ocr_layout import OCR_LOW_CONFIDENCE, PageLayout
+from page_classifier import METHOD_TEXT, classify_page
+from page_results import settings_key
+from page_store import PageImageStore
+from render_policy import OCR_RENDER_MODE, choose_ocr_dpi, render_for_ocr, render_preview
+from telemetry import PAGES, Timeline, observe, timed
+from translation_memory import text_hash
+from translator import event_text
+
+# --- Konfiguracja ---
+
+# Maksymalna liczba wyrenderowanych stron czekających na OCR
+RENDER_QUEUE_SIZE = int(os.environ.get("PIPELINE_RENDER_QUEUE", 4))
+# Maksymalna liczba stron po OCR czekających na tłumaczenie
+OCR_QUEUE_SIZE = int(os.environ.get("PIPELINE_OCR_QUEUE", 8))
+# Liczba stron łączonych w jedno zapytanie tłumaczenia (1 = najszybszy pierwszy token)
+PAGES_PER_TRANSLATION = int(os.environ.get("PIPELINE_PAGES_PER_TRANSLATION", 1))
+
+_END = object() # Znacznik końca strumienia w kolejkach
+
+
+def split_translation(parts, translation):
+    """Dzieli tłumaczenie fragmentu na strony, z których pochodzi jego tekst.
+
+    parts - pary (indeks strony, tekst źródłowy) jak w translator.split_pages_into_chunks.
+    Bloki Markdown tłumaczenia są przydzielane stronom według liczby bloków źródła: dokładnie,
+    gdy liczby bloków się zgadzają, w przeciwnym razie proporcjonalnie. Zwraca
+    (lista par (indeks strony, tłumaczenie) w kolejności, czy podział jest dokładny).
+    """
+    counts = {}
+    for index, text in parts:
+        counts[index] = counts.get(index, 0) + len(split_blocks(text))
+    if len(counts) == 1:
+        return [(next(iter(counts)), translation)], True
+    blocks = split_blocks(translation)
+    total = sum(counts.values())
+    exact = len(blocks) == total
+    assigned, done, start = [], 0, 0
+    for index, count in counts.items():
+        done += count
+        end = round(done * len(blocks) / total) if total else len(blocks)
+        assigned.append((index, "\n\n".join(blocks[start:end])))
+        start = end
+    return assigned, exact
+
+
+class DocumentPipeline:
+    """Potok przetwarzania wybranych stron jednego dokumentu PDF."""
+
+    def __init__(self, doc, page_numbers, lang_code, translator, max_workers=None,
+                 render_queue_size=RENDER_QUEUE_SIZE, ocr_queue_size=OCR_QUEUE_SIZE,
+                 pages_per_translation=PAGES_PER_TRANSLATION, doc_hash=None, ocr_cache=None,
+                 image_store=None, timeline=None, page_results=None):
+        self.doc = doc # Otwarty fitz.Document - potok przejmuje go i zamyka po renderowaniu
+        self.page_numbers = list(page_numbers) # 1-indeksowane
+        self.lang_code = lang_code
+        self.translator = translator # Obiekt z submit(text, outcome) -> strumień fragmentów oraz close()
+        self.max_workers = max_workers
+        self.pages_per_translation = max(1, pages_per_translation)
+        self.doc_hash = doc_hash # Skrót bajtów PDF - wymagany do korzystania z cache OCR
+        self.ocr_cache = ocr_cache if doc_hash else None
+        # Wyniki stron (PageResults) - wymagają skrótu PDF i tłumacza z atrybutami ChunkedTranslator
+        self.page_results = page_results if doc_hash else None
+        self._page_settings = self._page_settings_key() if self.page_results is not None else None
+
+        self._render_queue = queue.Queue(maxsize=max(1, render_queue_size))
+        self._ocr_queue = queue.Queue(maxsize=max(1, ocr_queue_size))
+        self._stop = threading.Event()
+        self._threads = []
+
+        self._ocr_dpi = {} # indeks -> DPI użyte do OCR (część klucza cache)
+
+        # Wyniki dostępne dla UI po (lub w trakcie) przetwarzania
+        # Podglądy stron (nie obrazy dla OCR) - na dysku, w pamięci tylko miniatury
+        self.images = image_store if image_store is not None else PageImageStore()
+        self.ocr_results = []
+        self.page_translations = {} # numer strony -> tłumaczenie
+        self.incomplete_pages = [] # Numery stron, których tłumaczenie model uciął limitem tokenów
+        # Numery stron z przybliżonym podziałem tłumaczenia partii (inna liczba bloków niż w źródle)
+        self.approximate_pages = []
+        self.error = None
+        # Czasy etapów stron (render, klasyfikacja, OSD, OCR) i tłumaczenia - patrz telemetry
+        self.timeline = timeline if timeline is not None else Timeline()
+
+    # --- Etapy w tle ---
+
+    def _put(self, q, item):
+        """Wstawia element do kolejki, przerywając, gdy potok został zatrzymany."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _iter_queue(self, q):
+        """Pobiera elementy z kolejki do znacznika końca (lub zatrzymania potoku)."""
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if item is _END:
+                return
+            yield item
+
+    def _render_stage(self):
+        try:
+            for index, page_no in enumerate(self.page_numbers):
+                page = self.doc.load_page(page_no - 1)
+                with timed("render_preview", self.timeline, page=page_no):
+                    self.images.add(render_preview(page))
+                ocr_img = None
+                ready = self._stored_page_result(index)
+                if ready is None:
+                    with timed("classify", self.timeline, page=page_no):
+                        classification = classify_page(page)
+                    if classification["method"] == METHOD_TEXT:
+                        # Strona cyfrowa - tekst z PDF, bez renderowania do OCR
+                        ready = {"index": index, "text": classification["text"], "rotation": 0,
+                                 "osd_error": None, "cached": False, "method": METHOD_TEXT}
+                    else:
+                        self._ocr_dpi[index] = choose_ocr_dpi(page)
+                        # Trafienie w cache OCR sprawdzamy przed renderowaniem, by go uniknąć
+                        ready = self._cached_ocr_result(index)
+                        if ready is None:
+                            with timed("render_ocr", self.timeline, page=page_no, dpi=self._ocr_dpi[index]):
+                                ocr_img = render_for_ocr(page, dpi=self._ocr_dpi[index])
+                if not self._put(self._render_queue, (index, ocr_img, ready)):
+                    return
+        except Exception as e:
+            self.error = self.error or e
+        finally:
+            self.doc.close()
+            self._put(self._render_queue, _END)
+
+    def _page_settings_key(self):
+        """Skrót ustawień, od których zależy wynik strony (OCR i tłumaczenie)."""
+        translator = self.translator
+        return settings_key(self._ocr_settings(), translator.source_lang, translator.target_lang_llm,
+                            translator.model, text_hash(translator.system_message))
+
+    def _stored_page_result(self, index):
+        """Wynik strony z magazynu wyników (z tłumaczeniem) lub None."""
+        if self.page_results is None:
+            return None
+        entry = self.page_results.get(self.doc_hash, self.page_numbers[index], self._page_settings)
+        if entry is None:
+            return None
+        return {"index": index, "text": entry["text"], "rotation": 0, "osd_error": None, "cached": True,
+                "method": entry["method"], "layout": entry["layout"], "translation": entry["translation"]}
+
+    def _store_page_result(self, result, translation):
+        if self.page_results is not None:
+            self.page_results.put(self.doc_hash, self.page_numbers[result["index"]], self._page_settings,
+                                  result["method"], result["text"], translation, result.get("layout"))
+
+    def _recorded(self, batch, translation, outcome):
+        """Przekazuje strumień tłumaczenia partii i zapamiętuje je po zakończeniu.
+
+        Tłumaczenie partii wielostronicowej jest dzielone z powrotem na strony według
+        fragmentów (split_translation). Tłumaczenie pojedynczej strony trafia też do
+        magazynu wyników - tylko gdy w całości pochodzi z modelu podstawowego (klucz
+        ustawień zawiera jego nazwę) i żadna odpowiedź nie została ucięta; strony
+        z uciętym tłumaczeniem trafiają do incomplete_pages.
+        """
+        parts = []
+        for event in translation:
+            parts.append(event_text(event))
+            yield event
+        # Tylko kompletne tłumaczenie (błąd lub przerwanie strumienia kończy generator wcześniej)
+        text = "".join(parts)
+        if len(batch) == 1:
+            self.page_translations[self.page_numbers[batch[0]["index"]]] = text
+        else:
+            pages = {}
+            for chunk_parts, chunk_translation in outcome["chunks"]:
+                assigned, exact = split_translation(chunk_parts, chunk_translation)
+                for position, page_translation in assigned:
+                    pages.setdefault(position, []).append(page_translation)
+                if not exact:
+                    self.approximate_pages.extend(self.page_numbers[batch[position]["index"]]
+                                                  for position, _ in assigned)
+            for position, result in enumerate(batch):
+                self.page_translations[self.page_numbers[result["index"]]] = "\n\n".join(pages.get(position, []))
+        if outcome["truncated"]:
+            self.incomplete_pages.extend(self.page_numbers[result["index"]] for result in batch)
+        elif len(batch) == 1 and outcome["models"] <= {self.translator.model}:
+            self._store_page_result(batch[0], text)
+
+    def _ocr_cache_key(self, index):
+        """Klucz cache OCR strony o danym indeksie (w obrębie wybranych stron)."""
+        return ocr_cache_key(self.doc_hash, self.page_numbers[index], self._ocr_dpi.get(index),
+                             self._ocr_settings(), tesseract_version())
+
+    def _ocr_settings(self):
+        # Tryb renderowania, strategia orientacji i wstępna obróbka są dołączone do języka,
+        # bo wpływają na wynik Tesseract
+        return f"{tesseract_lang(self.lang_code)}:{OCR_RENDER_MODE}:{OCR_ORIENTATION}:{'+'.join(OCR_PREPROCESS)}"
+
+    def _cached_ocr_result(self, index):
+        if self.ocr_cache is None:
+            return None
+        entry = self.ocr_cache.get(self._ocr_cache_key(index))
+        if entry is None:
+            return None
+        return {"index": index, "text": entry["text"], "rotation": entry.get("rotation", 0),
+                "osd_error": None, "cached": True, "method": "ocr", "layout": entry.get("layout")}
+
+    def _record_page(self, result):
+        """Zapisuje czasy OSD/OCR zmierzone w procesie roboczym (koniec ~ chwila odbioru wyniku)."""
+        page_no = self.page_numbers[result["index"]]
+        for stage, seconds in result.get("timings", {}).items():
+            observe(stage, seconds, self.timeline, page=page_no)
+        PAGES.inc(method="stored" if "translation" in result else "cache" if result["cached"] else result["method"])
+
+    def _ocr_stage(self):
+        batch = [] # Wyniki stron czekające na wspólne zapytanie tłumaczenia
+        try:
+            results = iter_ocr_pages(self._iter_queue(self._render_queue), self.lang_code, self.max_workers,
+                                     cache=self.ocr_cache, cache_key=self._ocr_cache_key)
+            for result in results:
+                self._record_page(result)
+                self.ocr_results.append(result)
+                translation = None
+                if "translation" in result:
+                    # Strona z magazynu wyników - niepełna partia poprzednich stron idzie do tłumaczenia przed nią
+                    if batch and not self._put(self._ocr_queue, (None, self._submit(batch))):
+                        return
+                    batch = []
+                    self.page_translations[self.page_numbers[result["index"]]] = result["translation"]
+                    if result["translation"]:
+                        translation = iter([result["translation"]])
+                elif result["text"].strip():
+                    batch.append(result)
+                else:
+                    self._store_page_result(result, "") # Pusta strona - nie ma czego tłumaczyć
+                # Zlecenie tłumaczenia od razu po OCR - tłumacz wykonuje je współbieżnie w tle
+                if len(batch) >= self.pages_per_translation:
+                    translation = self._submit(batch)
+                    batch = []
+                if not self._put(self._ocr_queue, (result, translation)):
+                    return
+            if batch and not self._stop.is_set():
+                self._put(self._ocr_queue, (None, self._submit(batch)))
+        except Exception as e:
+            self.error = self.error or e
+        finally:
+            self._put(self._ocr_queue, _END)
+
+    def _submit(self, batch):
+        """Zleca tłumaczenie partii stron; tłumaczenie pojedynczej strony trafia do magazynu wyników."""
+        outcome = {}
+        # Lista tekstów stron - tłumacz zachowuje granice stron we fragmentach (outcome["chunks"])
+        translation = self.translator.submit([result["text"].strip() for result in batch], outcome)
+        return self._recorded(batch, translation, outcome)
+
+    # --- API ---
+
+    def start(self):
+        """Uruchamia wątki renderowania i OCR."""
+        for target in (self._render_stage, self._ocr_stage):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """Zatrzymuje etapy w tle (np. gdy konsument przerwał strumień) i zamyka tłumacza."""
+        self._stop.set()
+        self.translator.close()
+
+    def page_methods(self):
+        """Zwraca listę (numer strony, metoda, z cache) dla stron przetworzonych do tej pory."""
+        return [(self.page_numbers[r["index"]], r["method"], r["cached"]) for r in self.ocr_results]
+
+    def layouts(self):
+        """Układy stron po OCR (PageLayout) do tej pory, według numeru strony (bez stron z warstwą tekstową)."""
+        return {self.page_numbers[r["index"]]: PageLayout.from_dict(r["layout"])
+                for r in self.ocr_results if r.get("layout")}
+
+    def bilingual_pages(self):
+        """Generator stron dla pdf_overlay, w kolejności: (numer strony, tłumaczenie, układ OCR jako
+        słownik lub None, czy podział tłumaczenia partii na strony jest przybliżony)."""
+        approximate = set(self.approximate_pages)
+        for result in self.ocr_results:
+            page_no = self.page_numbers[result["index"]]
+            yield page_no, self.page_translations.get(page_no, ""), result.get("layout"), page_no in approximate
+
+    def low_confidence_lines(self, threshold=OCR_LOW_CONFIDENCE):
+        """Lista (numer strony, liczba linii o niskiej pewności OCR) dla stron, które takie linie mają."""
+        counts = []
+        for page_no, layout in self.layouts().items():
+            count = len(layout.low_confidence_lines(threshold))
+            if count:
+                counts.append((page_no, count))
+        return counts
+
+    @property
+    def ocr_text(self):
+        """Tekst OCR stron przetworzonych do tej pory, w kolejności stron."""
+        return "\n\n".join(result["text"] for result in self.ocr_results).strip()
+
+    def iter_page_results(self):
+        """Zwraca pary (wynik OCR strony, strumień tłumaczenia lub None) w miarę ich pojawiania się."""
+        yield from self._iter_queue(self._ocr_queue)
+        if self.error:
+            raise self.error
+
+    def stream_translation(self, on_page=None):
+        """Generator fragmentów tłumaczenia (tekst) w kolejności stron.
+
+        on_page(page_no, done_count, total, method) jest wywoływany w wątku konsumenta
+        po odczytaniu tekstu każdej strony (method: "text" - warstwa tekstowa, "ocr" - Tesseract).
+        """
+        if not self._threads:
+            self.start()
+        total = len(self.page_numbers)
+        first = True
+        try:
+            for result, translation in self.iter_page_results():
+                if result is not None and on_page:
+                    on_page(self.page_numbers[result["index"]], result["index"] + 1, total, result["method"])
+                if translation is None:
+                    continue
+                if not first:
+                    yield "\n\n" # Separator między stronami tłumaczenia
+                first = False
+                yield from translation
+        finally:
+            self.stop()
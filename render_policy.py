@@ -0,0 +1,102 @@
+"""Polityka renderowania stron: adaptacyjne DPI i skala szarości dla OCR, osobne miniatury do podglądu.
+
+Stałe 300 DPI w RGB to ~26 MB na stronę A4. Tesseract nie potrzebuje koloru,
+a rozdzielczość wystarczy dobrać tak, by typowa wysokość czcionki miała ok.
+OCR_TARGET_FONT_PX pikseli - nie więcej niż pozwala rozdzielczość samego skanu.
+"""
+
+import os
+import statistics
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+# --- Konfiguracja ---
+
+OCR_MIN_DPI = int(os.environ.get("OCR_MIN_DPI", 150))
+OCR_MAX_DPI = int(os.environ.get("OCR_MAX_DPI", 300))
+# Docelowy rozmiar czcionki (em) w pikselach - 10 pt przy 300 DPI to ~42 px
+OCR_TARGET_FONT_PX = int(os.environ.get("OCR_TARGET_FONT_PX", 36))
+# Zakładany rozmiar czcionki, gdy nie da się go odczytać ze strony (skan bez warstwy tekstowej)
+DEFAULT_FONT_PT = 10.0
+# Górny limit pikseli na stronę (duże formaty, np. A3/plany, dostają niższe DPI)
+OCR_MAX_PIXELS = int(os.environ.get("OCR_MAX_PIXELS", 12_000_000))
+# Tryb koloru obrazu dla OCR: "gray" (domyślnie), "binary" lub "rgb" (jak wcześniej)
+OCR_RENDER_MODE = os.environ.get("OCR_RENDER_MODE", "gray")
+BINARY_THRESHOLD = 160
+
+# Miniatury do wyświetlania w przeglądarce (rozdzielczość ekranowa)
+PREVIEW_DPI = int(os.environ.get("PREVIEW_DPI", 96))
+
+
+def estimate_font_size(page):
+    """Szacuje typowy rozmiar czcionki strony (w punktach) na podstawie warstwy tekstowej, jeśli istnieje."""
+    sizes = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                if span.get("text", "").strip():
+                    sizes.append(span["size"])
+    return statistics.median(sizes) if sizes else None
+
+
+def native_image_dpi(page):
+    """Najwyższa rozdzielczość obrazów osadzonych na stronie (DPI) lub None, jeśli ich nie ma."""
+    best = None
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        width_pt = abs(x1 - x0)
+        if width_pt < 1 or not info.get("width"):
+            continue
+        dpi = info["width"] / (width_pt / 72)
+        best = dpi if best is None else max(best, dpi)
+    return best
+
+
+def choose_ocr_dpi(page):
+    """Dobiera DPI renderowania strony do OCR na podstawie rozmiaru tekstu, skanu i strony."""
+    font_pt = estimate_font_size(page) or DEFAULT_FONT_PT
+    dpi = OCR_TARGET_FONT_PX * 72 / font_pt
+
+    # Renderowanie powyżej rozdzielczości skanu nie dodaje informacji, tylko pikseli
+    scan_dpi = native_image_dpi(page)
+    if scan_dpi:
+        dpi = min(dpi, scan_dpi)
+
+    # Limit pikseli dla dużych stron
+    width_in, height_in = page.rect.width / 72, page.rect.height / 72
+    if width_in and height_in:
+        dpi = min(dpi, (OCR_MAX_PIXELS / (width_in * height_in)) ** 0.5)
+
+    return int(max(OCR_MIN_DPI, min(OCR_MAX_DPI, dpi)))
+
+
+def pixmap_to_image(pix):
+    """Tworzy obraz PIL bezpośrednio z bufora pikseli fitz.Pixmap (bez kodowania/dekodowania PNG).
+
+    Dla skali szarości (i RGBA) obraz współdzieli pamięć z pixmapą - bez kopii.
+    """
+    mode = {1: "L", 3: "RGB", 4: "RGBA"}[pix.n]
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    if img.readonly:
+        # Obraz wskazuje na pamięć pixmapy - musi ona żyć co najmniej tak długo jak obraz
+        img._pixmap = pix
+    return img
+
+
+def render_for_ocr(page, mode=None, dpi=None):
+    """Renderuje stronę do OCR: adaptacyjne DPI, skala szarości (lub binaryzacja)."""
+    mode = mode or OCR_RENDER_MODE
+    dpi = dpi or choose_ocr_dpi(page)
+    colorspace = fitz.csRGB if mode == "rgb" else fitz.csGRAY
+    img = pixmap_to_image(page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False))
+    if mode == "binary":
+        img = img.point(lambda v: 255 if v > BINARY_THRESHOLD else 0, mode="1")
+    img.info["dpi"] = (dpi, dpi) # Informacja dla Tesseract o rozdzielczości
+    img.info["pdf_rotation"] = page.rotation # /Rotate strony (już zastosowany przy renderowaniu)
+    return img
+
+
+def render_preview(page, dpi=PREVIEW_DPI):
+    """Renderuje miniaturę strony do wyświetlenia w interfejsie."""
+    return pixmap_to_image(page.get_pixmap(dpi=dpi, alpha=False))
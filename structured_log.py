@@ -0,0 +1,58 @@
+"""Logi strukturalne: jedno zdarzenie = jedna linia JSON (do zbierania przez Loki/ELK itp.).
+
+Wszystkie loggery aplikacji są pod przestrzenią nazw "pdf_translator". Domyślnie
+zdarzenia trafiają na stderr; LOG_PATH kieruje je do pliku (dopisywanie).
+"""
+
+import json
+import logging
+import os
+import threading
+
+# --- Konfiguracja ---
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_PATH = os.environ.get("LOG_PATH") or None
+LOGGER_NAMESPACE = "pdf_translator"
+
+_configure_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatuje rekord jako JSON: znacznik czasu, poziom, logger, zdarzenie i jego pola."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _configure():
+    root = logging.getLogger(LOGGER_NAMESPACE)
+    with _configure_lock:
+        if root.handlers:
+            return
+        handler = logging.FileHandler(LOG_PATH, encoding="utf-8") if LOG_PATH else logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False # Nie dubluj w handlerach Streamlit/roota
+
+
+def get_logger(name):
+    """Logger aplikacji (pdf_translator.<name>) z handlerem JSON."""
+    _configure()
+    return logging.getLogger(f"{LOGGER_NAMESPACE}.{name}")
+
+
+def log_event(logger, event, level=logging.INFO, **fields):
+    """Zapisuje zdarzenie z dodatkowymi polami jako jedną linię JSON."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
@@ -0,0 +1,272 @@
+"""Pomiary czasu etapów przetwarzania: oś czasu zadania, metryki Prometheus i logi JSON.
+
+Każdy pomiar (render, klasyfikacja strony, OSD, OCR, czas do pierwszego tokenu,
+tłumaczenie, wrap strumienia, eksport) trafia do:
+- histogramu pdf_translator_stage_seconds{stage=...} (endpoint /metrics),
+- osi czasu zadania (Timeline), jeśli pomiar dotyczy konkretnego zadania,
+- logu JSON (zdarzenie "span" na poziomie DEBUG).
+
+Rejestr metryk jest wbudowany (format tekstowy Prometheus 0.0.4), więc nie wymaga
+prometheus_client. Serwer metryk startuje tylko przy ustawionym METRICS_PORT.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from structured_log import get_logger, log_event
+
+# --- Konfiguracja ---
+
+# Port endpointu /metrics (0 = bez serwera metryk)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+METRICS_ADDR = os.environ.get("METRICS_ADDR", "127.0.0.1")
+# Granice kubełków histogramów czasu [s]
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_RATE_BUCKETS = (5, 10, 20, 50, 100, 200, 500, 1000)
+
+logger = get_logger("telemetry")
+
+
+# --- Metryki ---
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Oczekiwane etykiety: {labelnames}, podano: {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            # [liczności kubełków (bez +Inf), suma, liczba obserwacji]
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, n)) for key, (counts, total, n) in self._values.items())
+        lines = self._header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("pdf_translator_stage_seconds", "Czas etapów przetwarzania.", ("stage",))
+TOKENS_PER_SECOND = Histogram("pdf_translator_translation_tokens_per_second",
+                              "Szybkość generowania odpowiedzi (po pierwszym tokenie).", buckets=TOKEN_RATE_BUCKETS)
+TOKENS = Counter("pdf_translator_translation_tokens_total", "Tokeny zapytań tłumaczenia.", ("kind",))
+REQUESTS = Counter("pdf_translator_translation_requests_total", "Zapytania tłumaczenia do API.", ("status",))
+PAGES = Counter("pdf_translator_pages_total", "Przetworzone strony według sposobu odczytu.", ("method",))
+RETRIES = Counter("pdf_translator_translation_retries_total", "Ponowienia zapytań tłumaczenia.", ("reason",))
+HEDGES = Counter("pdf_translator_translation_hedged_total", "Zapytania zabezpieczające (hedged) po długim TTFT.")
+FAILOVERS = Counter("pdf_translator_translation_failovers_total", "Przejścia na zapasowy model / adres API.")
+JOBS = Counter("pdf_translator_jobs_total", "Zakończone zadania według statusu.", ("status",))
+JOBS_ACTIVE = Gauge("pdf_translator_jobs_active", "Zadania w trakcie przetwarzania.")
+
+_METRICS = (STAGE_SECONDS, TOKENS_PER_SECOND, TOKENS, REQUESTS, RETRIES, HEDGES, FAILOVERS, PAGES, JOBS,
+            JOBS_ACTIVE)
+
+
+def render_metrics():
+    """Wszystkie metryki w formacie tekstowym Prometheus."""
+    return "\n".join(line for metric in _METRICS for line in metric.render()) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Bez logu każdego odpytania przez Prometheus
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, addr=METRICS_ADDR):
+    """Uruchamia endpoint /metrics w wątku w tle (raz na proces). Zwraca serwer lub None, gdy port=0."""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True, name="metrics").start()
+            log_event(logger, "metrics_server_started", addr=addr, port=_server.server_address[1])
+        return _server
+
+
+# --- Pomiary ---
+
+def observe(stage, seconds, timeline=None, end=None, **fields):
+    """Zapisuje czas etapu w metrykach, w osi czasu zadania (jeśli podana) i w logu."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if timeline is not None:
+        timeline.record(stage, seconds, end=end, **fields)
+    log_event(logger, "span", level=logging.DEBUG, stage=stage, duration_s=round(seconds, 4), **fields)
+
+
+@contextmanager
+def timed(stage, timeline=None, **fields):
+    """Mierzy czas bloku jako etap stage (także gdy blok zgłosi wyjątek)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started, timeline, **fields)
+
+
+def timed_wrap(wrap_fn, stream, stage="wrap", timeline=None, **fields):
+    """Stosuje wrap_fn do strumienia, mierząc tylko czas samego wrap_fn (bez oczekiwania na źródło)."""
+    waited = 0.0
+
+    def source():
+        nonlocal waited
+        iterator = iter(stream)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                waited += time.perf_counter() - started
+            yield item
+
+    wrapped = wrap_fn(source())
+    total = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(wrapped)
+            except StopIteration:
+                return
+            finally:
+                total += time.perf_counter() - started
+            yield item
+    finally:
+        observe(stage, max(0.0, total - waited), timeline, **fields)
+
+
+class Timeline:
+    """Oś czasu jednego zadania: lista pomiarów etapów z przesunięciem względem startu (bezpieczna dla wątków)."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, end=None, **fields):
+        """Dodaje pomiar zakończony w chwili end (perf_counter, domyślnie teraz)."""
+        end = time.perf_counter() if end is None else end
+        span = {"stage": stage, "start_s": round(end - seconds - self._started, 4),
+                "duration_s": round(seconds, 4), **fields}
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self):
+        """Kopia pomiarów w kolejności zapisu."""
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self):
+        """Podsumowanie etapów: liczba pomiarów, łączny, średni i maksymalny czas [s]."""
+        stages = {}
+        for span in self.spans():
+            entry = stages.setdefault(span["stage"], {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            entry["count"] += 1
+            entry["total_s"] += span["duration_s"]
+            entry["max_s"] = max(entry["max_s"], span["duration_s"])
+        for entry in stages.values():
+            entry["total_s"] = round(entry["total_s"], 3)
+            entry["avg_s"] = round(entry["total_s"] / entry["count"], 4)
+        return stages
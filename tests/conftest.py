@@ -0,0 +1,42 @@
+"""Wspólne fikstury testów: lokalny serwer zgodny z OpenAI i klient API z własną pętlą."""
+
+import os
+
+os.environ.setdefault("LOG_LEVEL", "ERROR") # Zdarzenia JSON ponowień i failoverów zaśmiecałyby wyjście testów
+
+import pytest
+
+from benchmarks import mock_openai_server
+from llm_client import LlmClient
+
+
+@pytest.fixture
+def mock_server():
+    """Fabryka serwerów (argumenty jak mock_openai_server.make_server). Zwraca (liczniki, base_url)."""
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = mock_openai_server.start_in_background(**kwargs)
+        servers.append(server)
+        return server.RequestHandlerClass.stats, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def llm():
+    """Fabryka klientów API (argumenty jak LlmClient) - bez wspólnego klienta procesu."""
+    clients = []
+
+    def create(**kwargs):
+        client = LlmClient(**kwargs)
+        clients.append(client)
+        return client
+
+    yield create
+    for client in clients:
+        client.run(client.loop.shutdown_asyncgens()).result(timeout=5) # Zamknięcie strumieni httpx
+        client.loop.call_soon_threadsafe(client.loop.stop)
@@ -0,0 +1,53 @@
+"""Eksport DOCX: listy zagnieżdżone (także z wcięciem 2-3 spacji) i tabele."""
+
+import docx
+import pytest
+
+from docx_export import _normalize_list_indent, markdown_to_docx_bytes
+
+
+def paragraphs(markdown_text):
+    """Pary (styl, tekst) niepustych akapitów dokumentu."""
+    document = docx.Document(markdown_to_docx_bytes(markdown_text))
+    return [(p.style.name, p.text) for p in document.paragraphs if p.text.strip()]
+
+
+@pytest.mark.parametrize("indent", [2, 3, 4])
+def test_nested_bullet_list_levels(indent):
+    pad = " " * indent
+    text = f"- one\n{pad}- two\n{pad * 2}- three\n- four"
+    assert paragraphs(text) == [
+        ("List Bullet", "one"), ("List Bullet 2", "two"), ("List Bullet 3", "three"), ("List Bullet", "four"),
+    ]
+
+
+def test_bullets_nested_in_numbered_list():
+    text = "1. first\n2. second\n   - nested a\n   - nested b\n3. third"
+    assert paragraphs(text) == [
+        ("List Number", "first"), ("List Number", "second"), ("List Bullet 2", "nested a"),
+        ("List Bullet 2", "nested b"), ("List Number", "third"),
+    ]
+
+
+def test_loose_list_item_continues_in_list():
+    text = "- item\n\n  more about item\n\n  - nested\n\n- next\n\nAfter the list."
+    assert paragraphs(text) == [
+        ("List Bullet", "item"), ("List Continue", "more about item"), ("List Bullet 2", "nested"),
+        ("List Bullet", "next"), ("Normal", "After the list."),
+    ]
+
+
+def test_indent_inside_code_block_is_kept():
+    lines = ["- a", "  - b", "```", "  - not a list", "```"]
+    assert _normalize_list_indent(lines) == ["- a", "    - b", "```", "  - not a list", "```"]
+
+
+def test_table_cells_and_header():
+    text = "| Name | Value |\n|:-----|------:|\n| a | **1** |\n| b | 2 |"
+    document = docx.Document(markdown_to_docx_bytes(text))
+    assert len(document.tables) == 1
+    table = document.tables[0]
+    assert [[cell.text for cell in row.cells] for row in table.rows] == [["Name", "Value"], ["a", "1"], ["b", "2"]]
+    assert all(run.bold for run in table.rows[0].cells[0].paragraphs[0].runs) # Nagłówek pogrubiony
+    assert table.rows[1].cells[1].paragraphs[0].runs[0].bold
+    assert table.rows[1].cells[1].paragraphs[0].alignment == docx.enum.text.WD_ALIGN_PARAGRAPH.RIGHT
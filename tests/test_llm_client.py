@@ -0,0 +1,103 @@
+"""Ponawianie, failover i hedging klienta API (llm_client) na lokalnym serwerze mock."""
+
+import asyncio
+import time
+
+import openai
+import pytest
+
+from translator import build_translation_messages, event_text
+
+MESSAGES = build_translation_messages("Hello world", "Polish", "Translate.")
+REPLY = "[Polish] Hello world"
+
+
+def open_and_read(client, endpoints, stats=None):
+    """Otwiera strumień przez open_stream i czyta go do końca. Zwraca (punkt API, tekst)."""
+
+    async def read():
+        endpoint, stream, events = await client.open_stream("sk-test", endpoints, MESSAGES, stats)
+        try:
+            return endpoint, "".join([event_text(event) async for event in events])
+        finally:
+            await stream.close()
+
+    return client.run(read()).result(timeout=30)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_retry_waits_for_retry_after(mock_server, llm):
+    server, url = mock_server(markdown_fence=False, fail_first=2, retry_after=0.3)
+    client = llm(max_retries=3, hedge_after=0)
+    stats = {}
+    started = time.perf_counter()
+    endpoint, text = open_and_read(client, [(url, "primary")], stats)
+    assert time.perf_counter() - started >= 0.6 # Dwa ponowienia po Retry-After: 0.3 s
+    assert (endpoint, text) == ((url, "primary"), REPLY)
+    assert stats["attempts"] == 3 and stats["retries"] == 2 and stats["failovers"] == 0
+    assert server["requests"] == 3
+
+
+def test_retry_gives_up_after_max_retries(mock_server, llm):
+    server, url = mock_server(fail_first=100, retry_after=0)
+    client = llm(max_retries=2, hedge_after=0)
+    with pytest.raises(openai.RateLimitError):
+        open_and_read(client, [(url, "primary")])
+    assert server["requests"] == 3
+
+
+def test_non_retryable_error_is_not_retried(mock_server, llm):
+    server, url = mock_server(fail_first=100, error_status=400)
+    client = llm(max_retries=3, hedge_after=0)
+    with pytest.raises(openai.BadRequestError):
+        open_and_read(client, [(url, "primary")])
+    assert server["requests"] == 1
+
+
+def test_failover_after_retries(mock_server, llm):
+    broken, broken_url = mock_server(error_rate=1.0, error_status=503, retry_after=0)
+    healthy, healthy_url = mock_server(markdown_fence=False)
+    client = llm(max_retries=1, hedge_after=0)
+    stats = {}
+    endpoint, text = open_and_read(client, [(broken_url, "primary"), (healthy_url, "fallback")], stats)
+    assert (endpoint, text) == ((healthy_url, "fallback"), REPLY)
+    assert stats["failovers"] == 1 and stats["retries"] == 1 and stats["attempts"] == 3
+    assert broken["requests"] == 2 and healthy["requests"] == 1
+
+
+def test_hedged_request_wins_and_cancels_slow_stream(mock_server, llm):
+    slow, slow_url = mock_server(markdown_fence=False, ttft=1.0, token_delay=0.02)
+    fast, fast_url = mock_server(markdown_fence=False)
+    client = llm(max_retries=0, hedge_after=0.2)
+    stats = {}
+    started = time.perf_counter()
+    endpoint, text = open_and_read(client, [(slow_url, "primary"), (fast_url, "fallback")], stats)
+    assert time.perf_counter() - started < 1.0 # Nie czekamy na pierwszy token wolnego punktu
+    assert (endpoint, text) == ((fast_url, "fallback"), REPLY)
+    assert stats["hedged"] and stats["failovers"] == 0
+
+    async def other_tasks():
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task() and not task.done()]
+
+    # Przegrane zapytanie jest anulowane w pętli klienta, a serwer widzi zerwane połączenie
+    assert wait_for(lambda: not client.run(other_tasks()).result(timeout=5))
+    assert slow["requests"] == 1
+    assert wait_for(lambda: slow["aborted"] == 1)
+
+
+def test_hedge_not_sent_when_first_token_is_fast(mock_server, llm):
+    primary, primary_url = mock_server(markdown_fence=False)
+    backup, backup_url = mock_server(markdown_fence=False)
+    client = llm(max_retries=0, hedge_after=0.5)
+    stats = {}
+    endpoint, _ = open_and_read(client, [(primary_url, "primary"), (backup_url, "fallback")], stats)
+    assert endpoint == (primary_url, "primary")
+    assert not stats["hedged"] and backup["requests"] == 0
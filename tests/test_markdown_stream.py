@@ -0,0 +1,90 @@
+"""FenceStripper i MarkdownBlocks - wynik nie może zależeć od podziału strumienia na fragmenty."""
+
+import pytest
+
+from markdown_stream import FenceStripper, MarkdownBlocks, split_blocks, strip_fence_stream
+
+
+def pieces(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def strip(chunks):
+    return "".join(strip_fence_stream(chunks))
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_wrapper_fence_is_removed(size):
+    text = "```markdown\n# Title\n\nBody text.\n```"
+    assert strip(pieces(text, size)) == "# Title\n\nBody text."
+
+
+@pytest.mark.parametrize("opening", ["```\n", "```md\n", "  ```Markdown\n"])
+def test_wrapper_fence_variants(opening):
+    assert strip([opening, "Text", "\n``", "`"]) == "Text"
+
+
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_code_block_of_other_language_is_kept(size):
+    text = "```python\nprint(1)\n```"
+    assert strip(pieces(text, size)) == text
+
+
+def test_plain_text_passes_through_immediately():
+    stripper = FenceStripper()
+    assert stripper.feed("Plain ") == "Plain "
+    assert stripper.feed("text") == "text"
+    assert stripper.finish() == ""
+
+
+def test_inner_code_block_is_kept():
+    text = "```markdown\nIntro\n\n```\ncode\n```\n\nEnd\n```"
+    assert strip(pieces(text, 3)) == "Intro\n\n```\ncode\n```\n\nEnd"
+
+
+def test_only_possible_closing_line_is_held_back():
+    stripper = FenceStripper()
+    assert stripper.feed("```markdown\nFirst line\n") == "First line" # Nowa linia przed możliwym zamknięciem
+    assert stripper.feed("``") == "" # Może być początkiem zamknięcia
+    assert stripper.feed("x more\n") == "\n``x more"
+    assert stripper.finish() == "\n"
+
+
+MARKDOWN = """# Heading
+
+First paragraph
+continues here.
+
+- item one
+- item two
+
+```
+code
+
+with blank line
+```
+
+| a | b |
+|---|---|
+| 1 | 2 |"""
+
+
+@pytest.mark.parametrize("size", [1, 5, 13, 10000])
+def test_blocks_do_not_depend_on_chunking(size):
+    blocks = MarkdownBlocks()
+    for chunk in pieces(MARKDOWN, size):
+        blocks.feed(chunk)
+    blocks.finish()
+    assert blocks.blocks == split_blocks(MARKDOWN)
+    assert len(blocks.blocks) == 5
+    assert blocks.blocks[3] == "```\ncode\n\nwith blank line\n```"
+
+
+def test_feed_returns_finished_blocks_and_pending():
+    blocks = MarkdownBlocks()
+    assert blocks.feed("One\n\nTw") == ["One"]
+    assert blocks.pending == "Tw"
+    assert blocks.feed("o\n") == []
+    assert blocks.pending == "Two"
+    assert blocks.finish() == ["Two"]
+    assert blocks.blocks == ["One", "Two"] and blocks.pending == ""
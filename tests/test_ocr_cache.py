@@ -0,0 +1,67 @@
+"""Cache wyników OCR: licznik rozmiaru i usuwanie najdawniej używanych wpisów (LRU)."""
+
+import os
+import time
+
+import ocr_cache
+from ocr_cache import OcrCache
+
+
+def disk_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+               if name.endswith(".json"))
+
+
+def put_aged(cache, keys, text="x" * 900):
+    """Zapisuje wpisy z czasem użycia rosnącym w kolejności keys (najstarszy pierwszy)."""
+    now = time.time()
+    for age, key in enumerate(reversed(keys), start=1):
+        cache.put(key, {"text": text})
+        os.utime(cache._path(key), (now - 100 * age, now - 100 * age))
+
+
+def test_get_returns_stored_result(tmp_path):
+    cache = OcrCache(str(tmp_path))
+    cache.put("page", {"text": "Hello", "rotation": 90, "layout": None})
+    assert cache.get("page") == {"text": "Hello", "rotation": 90, "layout": None}
+    assert cache.get("missing") is None
+
+
+def test_eviction_removes_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "OCR_CACHE_EVICT_TO", 0.5)
+    probe = OcrCache(str(tmp_path / "probe"))
+    probe.put("probe", {"text": "x" * 900})
+    entry_size = probe._size
+
+    cache = OcrCache(str(tmp_path / "cache"), max_bytes=10 * entry_size)
+    keys = [f"k{i}" for i in range(10)]
+    put_aged(cache, keys)
+    assert cache.get("k0") is not None # Najstarszy wpis staje się ostatnio użytym
+    cache.put("k10", {"text": "x" * 900}) # Przekroczenie limitu - przycięcie do połowy
+
+    kept = {key for key in keys + ["k10"] if os.path.exists(cache._path(key))}
+    assert kept == {"k0", "k7", "k8", "k9", "k10"}
+    assert cache._size == disk_size(cache.directory) <= cache.max_bytes * 0.5
+
+
+def test_size_counter_tracks_overwrites_and_clear(tmp_path):
+    cache = OcrCache(str(tmp_path))
+    cache.put("a", {"text": "x" * 500})
+    cache.put("b", {"text": "y" * 500})
+    cache.put("a", {"text": "short"}) # Nadpisanie zmniejsza rozmiar
+    assert cache._size == disk_size(str(tmp_path))
+    assert OcrCache(str(tmp_path))._size == cache._size # Nowa instancja liczy rozmiar z katalogu
+    cache.clear()
+    assert cache._size == 0 and disk_size(str(tmp_path)) == 0
+
+
+def test_eviction_sees_entries_of_other_processes(tmp_path):
+    cache = OcrCache(str(tmp_path), max_bytes=10_000)
+    other = OcrCache(str(tmp_path), max_bytes=10_000) # Jak drugi proces z tym samym katalogiem
+    for i in range(8):
+        other.put(f"other{i}", {"text": "x" * 900})
+    # Licznik instancji obejmuje tylko jej zapisy - przycinanie zaczyna się po przekroczeniu go
+    for i in range(11):
+        cache.put(f"own{i}", {"text": "x" * 900})
+    assert cache._size == disk_size(str(tmp_path)) <= 10_000 * ocr_cache.OCR_CACHE_EVICT_TO
+    assert not any(os.path.exists(other._path(f"other{i}")) for i in range(8)) # Najstarsze
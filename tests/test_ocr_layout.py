@@ -0,0 +1,63 @@
+"""Układ strony OCR: budowa z TSV, zapis do JSON i przeliczanie ramek po prostowaniu przekosu."""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from ocr_backends import parse_tsv
+from ocr_layout import PageLayout
+
+COLUMNS = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext"
+TSV = "\n".join([
+    COLUMNS,
+    "1\t1\t0\t0\t0\t0\t0\t0\t1000\t1400\t-1\t",
+    "5\t1\t1\t1\t1\t1\t100\t100\t80\t20\t90\tPierwsza",
+    "5\t1\t1\t1\t1\t2\t190\t102\t60\t20\t70\tlinia",
+    "5\t1\t1\t1\t2\t1\t100\t130\t50\t20\t40\tdruga",
+    "5\t1\t2\t1\t1\t1\t100\t400\t90\t22\t95\tNowy",
+    "5\t1\t2\t1\t1\t2\t200\t400\t40\t22\t-1\t ",
+])
+
+W, H = 2480, 3508
+BOXES = [(200, 300, 1400, 340), (1800, 3000, 2300, 3040), (1000, 1700, 1500, 1760)]
+
+
+def centers(boxes):
+    boxes = np.asarray(boxes, dtype=np.float64)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+
+def rotated_box(box, angle):
+    """Ramka prostokąta na obrazie obróconym jak w image_preprocess (Image.rotate, bez zmiany rozmiaru)."""
+    image = Image.new("L", (W, H), 255)
+    ImageDraw.Draw(image).rectangle(box, fill=0)
+    ys, xs = np.nonzero(np.asarray(image.rotate(angle, resample=Image.BILINEAR, fillcolor=255)) < 128)
+    return xs.min(), ys.min(), xs.max(), ys.max()
+
+
+def test_from_tsv_groups_words_into_lines():
+    layout = PageLayout.from_tsv(parse_tsv(TSV), dpi=300)
+    assert (layout.width, layout.height, len(layout)) == (1000, 1400, 3)
+    assert layout.lines() == ["Pierwsza linia", "druga", "Nowy"]
+    assert layout.line_boxes.tolist() == [[100, 100, 250, 122], [100, 130, 150, 150], [100, 400, 190, 422]]
+    assert layout.line_conf.tolist() == [80, 40, 95]
+    assert layout.line_block.tolist() == [0, 0, 1]
+    assert layout.low_confidence_lines(60).tolist() == [1]
+
+
+def test_dict_roundtrip():
+    layout = PageLayout.from_tsv(parse_tsv(TSV), dpi=300)
+    restored = PageLayout.from_dict(layout.to_dict())
+    assert restored.lines() == layout.lines()
+    assert restored.to_dict() == layout.to_dict()
+
+
+@pytest.mark.parametrize("angle", [5.0, -3.2, 0.7])
+def test_unskew_restores_line_positions(angle):
+    skewed = [rotated_box(box, angle) for box in BOXES]
+    n = len(skewed)
+    layout = PageLayout(W, H, 300, "\n".join("x" * n), np.arange(n + 1) * 2, skewed, [90] * n, [1] * n,
+                        [0] * n, list(range(n)))
+    error = np.hypot(*(centers(layout.unskew(angle).line_boxes) - centers(BOXES)).T)
+    assert error.max() <= 2 # Przed przeliczeniem środki ramek są przesunięte o dziesiątki pikseli
+    assert layout.unskew(0) is layout
@@ -0,0 +1,17 @@
+"""Podział tłumaczenia fragmentu obejmującego kilka stron z powrotem na strony."""
+
+from pipeline import split_translation
+
+
+def test_single_page_gets_whole_translation():
+    assert split_translation([(2, "a\n\nb")], "A") == ([(2, "A")], True)
+
+
+def test_blocks_are_assigned_by_source_block_count():
+    parts = [(0, "a\n\nb"), (1, "c")]
+    assert split_translation(parts, "A\n\nB\n\nC") == ([(0, "A\n\nB"), (1, "C")], True)
+
+
+def test_mismatched_block_count_is_approximate():
+    parts = [(0, "a\n\nb"), (1, "c")]
+    assert split_translation(parts, "A B C") == ([(0, "A B C"), (1, "")], False)
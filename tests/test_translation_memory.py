@@ -0,0 +1,53 @@
+"""Pamięć tłumaczeń: klucze segmentów i zapis w SQLite."""
+
+import pytest
+
+from translation_memory import TranslationMemory, normalize_segment, segment_key
+
+KEY_ARGS = ("Polish", "English", "model-a", "Translate.")
+
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+    yield memory
+    memory.close()
+
+
+def test_normalization_ignores_whitespace_differences():
+    assert normalize_segment("  One   two\nthree \n\n\n\nFour ") == "One two three\n\nFour"
+    assert segment_key("One  two\n\nThree", *KEY_ARGS) == segment_key("One two\n\n\nThree ", *KEY_ARGS)
+
+
+@pytest.mark.parametrize("index, value", [(0, "German"), (1, "French"), (2, "model-b"), (3, "Other prompt.")])
+def test_key_depends_on_languages_model_and_prompt(index, value):
+    changed = list(KEY_ARGS)
+    changed[index] = value
+    assert segment_key("Text", *changed) != segment_key("Text", *KEY_ARGS)
+
+
+def test_put_get_and_hits(memory):
+    key = segment_key("Dzień dobry", *KEY_ARGS)
+    assert memory.get(key) is None
+    memory.put(key, "Dzień  dobry", "Good morning", "Polish", "English", "model-a")
+    assert memory.get(key) == "Good morning"
+    assert memory.get(key) == "Good morning"
+    assert memory.stats() == {"segments": 1, "hits": 2}
+
+
+def test_put_replaces_translation(memory):
+    key = segment_key("Tekst", *KEY_ARGS)
+    memory.put(key, "Tekst", "Text")
+    memory.put(key, "Tekst", "Text, corrected")
+    assert memory.get(key) == "Text, corrected"
+    assert memory.stats()["segments"] == 1
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "tm.sqlite3")
+    first = TranslationMemory(path)
+    first.put("key", "Tekst", "Text")
+    first.close()
+    second = TranslationMemory(path)
+    assert second.get("key") == "Text"
+    second.close()
@@ -0,0 +1,149 @@
+"""Podział na fragmenty i ChunkedTranslator (kolejność, close, pamięć tłumaczeń) na serwerze mock."""
+
+import threading
+import time
+
+import openai
+import pytest
+
+from token_budget import count_tokens
+from translation_memory import TranslationMemory
+from translator import (ChunkedTranslator, TranslationCancelled, event_text, split_into_chunks,
+                        split_pages_into_chunks)
+
+
+def paragraph(i, words=40):
+    return f"Paragraph {i}. " + " ".join(f"word{i}_{n}" for n in range(words))
+
+
+# --- split_into_chunks ---
+
+def test_small_pages_are_merged_in_order():
+    pages = ["Page one.", "Page two.", "Page three."]
+    assert split_into_chunks(pages, max_tokens=1000) == ["Page one.\n\nPage two.\n\nPage three."]
+
+
+def test_pages_are_not_merged_over_budget():
+    pages = [paragraph(i) for i in range(4)]
+    budget = count_tokens(pages[0]) + 5
+    assert split_into_chunks(pages, max_tokens=budget) == pages
+
+
+def test_large_page_is_split_by_paragraphs():
+    page = "\n\n".join(paragraph(i) for i in range(6))
+    budget = 2 * count_tokens(paragraph(0)) + 5
+    chunks = split_into_chunks([page], max_tokens=budget)
+    assert len(chunks) == 3
+    assert all(count_tokens(chunk) <= budget for chunk in chunks)
+    assert "\n\n".join(chunks) == page
+
+
+def test_oversized_paragraph_is_cut_within_budget():
+    text = " ".join(f"word{n}" for n in range(2000))
+    chunks = split_into_chunks(text, max_tokens=100)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
+    assert "".join(chunks) == text # Cięcie na sztywno, bez dodanych separatorów
+
+
+def test_empty_pages_are_skipped():
+    assert split_into_chunks(["", "  \n", "Text."], max_tokens=100) == ["Text."]
+    assert split_into_chunks("", max_tokens=100) == []
+
+
+def test_chunk_parts_track_source_pages():
+    pages = ["Page zero.", "", "\n\n".join(paragraph(i) for i in range(3)), "Page three."]
+    budget = count_tokens(paragraph(0)) + 10
+    chunks = split_pages_into_chunks(pages, max_tokens=budget)
+    assert [chunk for chunk, _ in chunks] == split_into_chunks(pages, max_tokens=budget)
+    for chunk, parts in chunks:
+        assert "\n\n".join(text for _, text in parts) == chunk
+    assert [index for _, parts in chunks for index, _ in parts] == [0, 2, 2, 2, 3]
+
+
+# --- ChunkedTranslator na serwerze mock ---
+
+def make_translator(llm, url, **kwargs):
+    kwargs.setdefault("max_chunk_tokens", count_tokens(paragraph(0)) + 5) # Jeden akapit na fragment
+    return ChunkedTranslator("sk-test", "Polish", "Translate.", base_url=url, model="primary",
+                             llm_client=llm(max_retries=0, hedge_after=0), **kwargs)
+
+
+def read(stream):
+    return "".join(event_text(event) for event in stream)
+
+
+def test_chunks_are_returned_in_document_order(mock_server, llm):
+    # Losowo połowa zapytań zaczyna odpowiadać później - fragmenty kończą się w innej kolejności
+    _, url = mock_server(markdown_fence=False, slow_rate=0.5, slow_ttft=0.3)
+    translator = make_translator(llm, url, max_concurrency=4)
+    paragraphs = [paragraph(i) for i in range(8)]
+    outcome = {}
+    text = read(translator.submit(paragraphs, outcome))
+    assert text == "\n\n".join(f"[Polish] {p}" for p in paragraphs)
+    assert [parts for parts, _ in outcome["chunks"]] == [[(i, p)] for i, p in enumerate(paragraphs)]
+    assert outcome["models"] == {"primary"} and not outcome["truncated"]
+    assert len(translator.usage) == 8
+    translator.close()
+
+
+def test_close_unblocks_consumers(mock_server, llm):
+    _, url = mock_server(markdown_fence=False, ttft=5.0)
+    translator = make_translator(llm, url, max_concurrency=1)
+    streams = [translator.submit("\n\n".join(paragraph(i) for i in range(3))) for _ in range(2)]
+    errors = []
+
+    def consume(stream):
+        try:
+            read(stream)
+        except TranslationCancelled as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=consume, args=(stream,), daemon=True) for stream in streams]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    started = time.perf_counter()
+    translator.close()
+    for thread in threads:
+        thread.join(timeout=2)
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(errors) == 2 and time.perf_counter() - started < 2
+
+
+def test_translation_memory_skips_api(mock_server, llm):
+    server, url = mock_server(markdown_fence=False)
+    memory = TranslationMemory(":memory:")
+    paragraphs = [paragraph(i) for i in range(3)]
+    first = make_translator(llm, url, translation_memory=memory)
+    expected = read(first.submit(paragraphs))
+    assert server["requests"] == 3 and memory.stats()["segments"] == 3
+
+    second = make_translator(llm, url, translation_memory=memory)
+    assert read(second.submit(paragraphs)) == expected
+    assert server["requests"] == 3 # Wszystko z pamięci
+    assert second.memory_hits == 3 and second.memory_misses == 0
+    first.close()
+    second.close()
+
+
+def test_fallback_translation_is_not_stored_under_primary_model(mock_server, llm):
+    _, broken_url = mock_server(error_rate=1.0, error_status=400)
+    _, healthy_url = mock_server(markdown_fence=False)
+    memory = TranslationMemory(":memory:")
+    translator = make_translator(llm, broken_url, translation_memory=memory)
+    translator.endpoints = [(broken_url, "primary"), (healthy_url, "fallback")]
+    outcome = {}
+    assert read(translator.submit(paragraph(0), outcome)) == f"[Polish] {paragraph(0)}"
+    assert outcome["models"] == {"fallback"}
+    assert memory.stats()["segments"] == 0
+    translator.close()
+
+
+def test_api_error_ends_stream_with_error(mock_server, llm):
+    _, url = mock_server(error_rate=1.0, error_status=400)
+    translator = make_translator(llm, url)
+    with pytest.raises(openai.BadRequestError):
+        read(translator.submit(paragraph(0)))
+    assert translator.usage[0]["status"] != "ok"
+    translator.close()
@@ -0,0 +1,121 @@
+"""Budżet tokenów zapytań tłumaczenia: liczenie tokenów, dobór wielkości fragmentów i limity.
+
+Tokeny liczy tokenizer tiktoken (jeśli jest zainstalowany i ma dostępny słownik),
+a w przeciwnym razie przybliżenie znakowe. Tokenizer modelu (np. Gemma) różni się
+nieco od tiktoken, dlatego budżet zostawia zapas TOKEN_SAFETY_MARGIN.
+"""
+
+import functools
+import math
+import os
+
+try:
+    import tiktoken
+except ImportError: # Opcjonalna zależność
+    tiktoken = None
+
+# --- Konfiguracja ---
+
+# Okno kontekstu modelu (prompt + odpowiedź) w tokenach
+MODEL_CONTEXT_TOKENS = int(os.environ.get("TRANSLATION_CONTEXT_TOKENS", 32768))
+# Przewidywana długość tłumaczenia względem tekstu źródłowego (w tokenach)
+OUTPUT_TOKEN_RATIO = float(os.environ.get("TRANSLATION_OUTPUT_RATIO", 1.5))
+# Zapas na różnice między tokenizerem tiktoken a tokenizerem modelu
+TOKEN_SAFETY_MARGIN = float(os.environ.get("TRANSLATION_TOKEN_MARGIN", 0.1))
+# Limit tokenów tekstu źródłowego na dokument (0 = bez limitu)
+MAX_DOCUMENT_TOKENS = int(os.environ.get("TRANSLATION_MAX_DOCUMENT_TOKENS", 0))
+# Najmniejszy sensowny fragment - poniżej tego komunikat systemowy zajmuje cały kontekst
+MIN_CHUNK_TOKENS = 200
+
+TOKENIZER_ENCODING = os.environ.get("TOKENIZER_ENCODING", "o200k_base")
+CHARS_PER_TOKEN = 4 # Przybliżenie dla tekstów łacińskich (gdy brak tokenizera)
+MESSAGE_OVERHEAD_TOKENS = 4 # Znaczniki roli i separatory na każdą wiadomość
+
+
+class PromptBudgetError(ValueError):
+    """Zapytanie nie mieści się w oknie kontekstu lub dokument przekracza limit tokenów."""
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception: # Np. brak słownika w trybie offline - zostaje przybliżenie znakowe
+        return None
+
+
+def tokenizer_name():
+    """Nazwa użytego sposobu liczenia tokenów (do logów i interfejsu)."""
+    return f"tiktoken:{TOKENIZER_ENCODING}" if _encoding() is not None else f"znaki/{CHARS_PER_TOKEN}"
+
+
+def count_tokens(text):
+    """Liczba tokenów tekstu."""
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages):
+    """Liczba tokenów listy wiadomości czatu (treść + narzut na wiadomość)."""
+    return sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+class TokenBudget:
+    """Limity tokenów jednego tłumacza: wielkość fragmentu, kontrola zapytania i dokumentu."""
+
+    def __init__(self, context_tokens=MODEL_CONTEXT_TOKENS, output_ratio=OUTPUT_TOKEN_RATIO,
+                 safety_margin=TOKEN_SAFETY_MARGIN, max_document_tokens=MAX_DOCUMENT_TOKENS):
+        self.context_tokens = context_tokens
+        self.output_ratio = output_ratio
+        self.max_document_tokens = max_document_tokens
+        self.usable_tokens = int(context_tokens * (1 - safety_margin))
+
+    def max_chunk_tokens(self, base_prompt_tokens, limit):
+        """Największy fragment tekstu, dla którego prompt i przewidywana odpowiedź mieszczą się w kontekście.
+
+        base_prompt_tokens to tokeny zapytania bez tekstu (komunikat systemowy + szablon).
+        Zgłasza PromptBudgetError, jeśli na tekst nie zostaje miejsca.
+        """
+        chunk_tokens = int((self.usable_tokens - base_prompt_tokens) / (1 + self.output_ratio))
+        if chunk_tokens < MIN_CHUNK_TOKENS:
+            raise PromptBudgetError(
+                f"Komunikat systemowy ({base_prompt_tokens} tokenów) nie zostawia miejsca na tekst "
+                f"w oknie kontekstu {self.context_tokens} tokenów (TRANSLATION_CONTEXT_TOKENS)."
+            )
+        return min(limit, chunk_tokens)
+
+    def check_prompt(self, prompt_tokens):
+        """Odrzuca zapytanie, które samo (bez odpowiedzi) nie mieści się w kontekście."""
+        if prompt_tokens > self.usable_tokens:
+            raise PromptBudgetError(
+                f"Zapytanie ma {prompt_tokens} tokenów, a okno kontekstu pozwala na {self.usable_tokens}."
+            )
+
+    def check_document(self, document_tokens):
+        """Odrzuca dokument, którego tekst przekracza limit TRANSLATION_MAX_DOCUMENT_TOKENS."""
+        if self.max_document_tokens and document_tokens > self.max_document_tokens:
+            raise PromptBudgetError(
+                f"Dokument przekracza limit {self.max_document_tokens} tokenów tekstu źródłowego "
+                f"(TRANSLATION_MAX_DOCUMENT_TOKENS)."
+            )
+
+
+def summarize_usage(records):
+    """Sumuje zużycie tokenów i czasy zapytań (rekordy z ChunkedTranslator.usage)."""
+    records = list(records) # Lista jest uzupełniana równolegle przez wątek tłumacza
+    done = [r for r in records if r["status"] == "ok" and r["latency_s"] is not None]
+    latency = sum(r["latency_s"] for r in done)
+    return {
+        "requests": len(records),
+        "failed": sum(1 for r in records if r["status"] != "ok"),
+        "prompt_tokens": sum(r["prompt_tokens"] or 0 for r in records),
+        "completion_tokens": sum(r["completion_tokens"] or 0 for r in records),
+        "latency_s": round(latency, 3),
+        "avg_latency_s": round(latency / len(done), 3) if done else None,
+        "estimated": any(r["usage_source"] == "estimate" for r in records),
+        "truncated": sum(1 for r in records if r["finish_reason"] == "length"),
+    }
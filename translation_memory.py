@@ -0,0 +1,108 @@
+"""Pamięć tłumaczeń (SQLite) - ponowne użycie wcześniej przetłumaczonych segmentów.
+
+Klucz to skrót z: znormalizowanego tekstu segmentu, języka źródłowego i docelowego,
+nazwy modelu oraz skrótu komunikatu systemowego. Zmiana promptu systemowego lub
+modelu automatycznie unieważnia stare wpisy.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# --- Konfiguracja ---
+
+TRANSLATION_MEMORY_PATH = os.environ.get(
+    "TRANSLATION_MEMORY_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "pdf-translator", "translation_memory.sqlite3"),
+)
+TRANSLATION_MEMORY_ENABLED = os.environ.get("TRANSLATION_MEMORY_ENABLED", "1") != "0"
+
+
+def normalize_segment(text):
+    """Normalizuje segment: ujednolica białe znaki w liniach i puste linie między akapitami."""
+    paragraphs = [re.sub(r"\s+", " ", p).strip() for p in re.split(r"\n\s*\n", text)]
+    return "\n\n".join(p for p in paragraphs if p)
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def segment_key(segment, source_lang, target_lang, model, system_message):
+    """Buduje klucz pamięci tłumaczeń dla segmentu."""
+    raw = json.dumps([normalize_segment(segment), source_lang, target_lang, model, text_hash(system_message)])
+    return text_hash(raw)
+
+
+class TranslationMemory:
+    """Magazyn segment -> tłumaczenie w bazie SQLite (bezpieczny dla wątków)."""
+
+    def __init__(self, path=TRANSLATION_MEMORY_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS segments (
+                    key TEXT PRIMARY KEY,
+                    source_lang TEXT,
+                    target_lang TEXT,
+                    model TEXT,
+                    source TEXT,
+                    translation TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )"""
+            )
+
+    def get(self, key):
+        """Zwraca zapisane tłumaczenie segmentu lub None."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT translation FROM segments WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE segments SET hits = hits + 1, last_used_at = ? WHERE key = ?", (time.time(), key)
+            )
+            return row[0]
+
+    def put(self, key, source, translation, source_lang=None, target_lang=None, model=None):
+        """Zapisuje (lub nadpisuje) tłumaczenie segmentu."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO segments
+                   (key, source_lang, target_lang, model, source, translation, hits, created_at, last_used_at)
+                   VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)""",
+                (key, source_lang, target_lang, model, normalize_segment(source), translation, now, now),
+            )
+
+    def stats(self):
+        """Zwraca liczbę segmentów i łączną liczbę trafień."""
+        with self._lock:
+            count, hits = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM segments").fetchone()
+        return {"segments": count, "hits": hits}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+@functools.lru_cache(maxsize=1)
+def get_translation_memory():
+    """Współdzielona instancja pamięci tłumaczeń (None, jeśli wyłączona lub niedostępna)."""
+    if not TRANSLATION_MEMORY_ENABLED:
+        return None
+    try:
+        return TranslationMemory()
+    except (OSError, sqlite3.Error):
+        return None
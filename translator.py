@@ -0,0 +1,361 @@
+"""Tłumaczenie podzielone na fragmenty, wysyłane współbieżnie (asyncio) i składane w kolejności.
+
+Zapytania działają we wspólnej pętli asyncio klienta API (llm_client - pula połączeń,
+ponawianie, hedging, failover); wyniki każdego fragmentu trafiają do
+osobnej kolejki, więc konsument (zadanie w tle) odbiera na żywo pierwszy
+fragment, a kolejne - tłumaczone w tle - oddaje natychmiast po jego zakończeniu.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import re
+import time
+
+from llm_client import build_endpoints, get_llm_client
+from structured_log import get_logger, log_event
+from telemetry import REQUESTS, TOKENS, TOKENS_PER_SECOND, observe, timed_wrap
+from token_budget import TokenBudget, count_message_tokens, count_tokens, tokenizer_name
+from translation_memory import segment_key
+
+# --- Konfiguracja ---
+
+# Lokalny serwer zgodny z OpenAI: OPENROUTER_BASE_URL=http://172.17.0.1:8000/v1
+OPENROUTER_BASE_URL = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+TRANSLATION_MODEL = os.environ.get("TRANSLATION_MODEL", "google/gemma-3-27b-it")
+
+# Budżet tokenów tekstu źródłowego na jeden fragment (zapytanie)
+MAX_CHUNK_TOKENS = int(os.environ.get("TRANSLATION_CHUNK_TOKENS", 2000))
+# Maksymalna liczba równoczesnych zapytań do API
+MAX_CONCURRENCY = int(os.environ.get("TRANSLATION_CONCURRENCY", 4))
+# Prośba o zużycie tokenów w ostatnim zdarzeniu strumienia (stream_options.include_usage)
+STREAM_USAGE = os.environ.get("TRANSLATION_STREAM_USAGE", "1") != "0"
+
+_END = object() # Znacznik końca strumienia fragmentu
+
+logger = get_logger("translator")
+
+
+class TranslationCancelled(RuntimeError):
+    """Tłumaczenie fragmentu przerwane przez close() tłumacza, zanim się zakończyło."""
+
+
+def event_text(event):
+    """Zwraca tekst zdarzenia strumienia (obiekt OpenAI lub zwykły tekst)."""
+    if isinstance(event, str):
+        return event
+    try:
+        return event.choices[0].delta.content or ""
+    except (AttributeError, IndexError, TypeError):
+        return ""
+
+
+def _hard_split(line, max_tokens):
+    """Tnie linię bez podziałów na kawałki mieszczące się w budżecie tokenów."""
+    parts = []
+    while line:
+        tokens = count_tokens(line)
+        if tokens <= max_tokens:
+            parts.append(line)
+            break
+        # Cięcie proporcjonalne do liczby tokenów - działa też dla pism z wieloma tokenami na znak
+        cut = max(1, int(len(line) * max_tokens / tokens * 0.95))
+        while cut > 1 and count_tokens(line[:cut]) > max_tokens:
+            cut = int(cut * 0.9)
+        parts.append(line[:cut])
+        line = line[cut:]
+    return parts
+
+
+def _split_oversized(text, max_tokens):
+    """Dzieli zbyt długi akapit po liniach, a w ostateczności na sztywno."""
+    parts, current, current_tokens = [], "", 0
+    for line in text.split("\n"):
+        for piece in _hard_split(line, max_tokens) if line else [line]:
+            piece_tokens = count_tokens(piece)
+            if current and current_tokens + piece_tokens + 1 > max_tokens:
+                parts.append(current)
+                current, current_tokens = piece, piece_tokens
+            else:
+                current = f"{current}\n{piece}" if current else piece
+                current_tokens += piece_tokens + (1 if current_tokens else 0)
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_into_chunks(pages, max_tokens=MAX_CHUNK_TOKENS):
+    """Dzieli tekst (lub listę tekstów stron) na fragmenty mieszczące się w budżecie tokenów.
+
+    Granice stron mają pierwszeństwo; strona przekraczająca budżet jest dzielona
+    po akapitach (pustych liniach). Kolejność tekstu jest zachowana.
+    """
+    return [chunk for chunk, _ in split_pages_into_chunks(pages, max_tokens)]
+
+
+def split_pages_into_chunks(pages, max_tokens=MAX_CHUNK_TOKENS):
+    """Jak split_into_chunks, ale z pochodzeniem tekstu: lista par (fragment, części).
+
+    Części to pary (indeks strony w pages, tekst) w kolejności fragmentu - fragment
+    może łączyć kilka małych stron albo zawierać tylko część dużej strony.
+    """
+    if isinstance(pages, str):
+        pages = [pages]
+
+    units = [] # (indeks strony, tekst)
+    for index, page in enumerate(pages):
+        page = page.strip()
+        if not page:
+            continue
+        if count_tokens(page) <= max_tokens:
+            units.append((index, page))
+            continue
+        for paragraph in re.split(r"\n\s*\n", page):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if count_tokens(paragraph) <= max_tokens:
+                units.append((index, paragraph))
+            else:
+                units.extend((index, part) for part in _split_oversized(paragraph, max_tokens))
+
+    chunks, current, parts = [], "", []
+    for index, unit in units:
+        candidate = f"{current}\n\n{unit}" if current else unit
+        if current and count_tokens(candidate) > max_tokens:
+            chunks.append((current, parts))
+            current, parts = unit, [(index, unit)]
+        else:
+            current = candidate
+            parts.append((index, unit))
+    if current:
+        chunks.append((current, parts))
+    return chunks
+
+
+def build_translation_messages(text, target_lang_llm, system_message):
+    """Buduje listę wiadomości (system + prompt użytkownika) dla zapytania tłumaczenia."""
+    prompt = f"Translate below text to {target_lang_llm}:\n\n{text}\n\nTranslation to {target_lang_llm} in MARKDOWN FORMAT:"
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": prompt},
+    ]
+
+
+class ChunkedTranslator:
+    """Współbieżny tłumacz fragmentów z zachowaniem kolejności wyników.
+
+    wrap_fn(stream) jest stosowany do strumienia każdego fragmentu osobno
+    (np. wrap_stream_for_markdown usuwający blok ```markdown ... ``` otaczający odpowiedź).
+    Jeśli podano translation_memory, fragmenty przetłumaczone wcześniej są oddawane
+    od razu z pamięci, a do API trafiają tylko brakujące.
+
+    Wielkość fragmentu wynika z budżetu tokenów (TokenBudget) - komunikat systemowy
+    zajmuje część okna kontekstu. Każde zapytanie do API jest zapisywane w self.usage
+    (tokeny promptu i odpowiedzi, czas do pierwszego tokenu, czas całkowity) i logowane
+    jako zdarzenie JSON; czasy trafiają też do metryk i osi czasu timeline (telemetry).
+    """
+
+    def __init__(self, api_key, target_lang_llm, system_message, base_url=OPENROUTER_BASE_URL,
+                 model=TRANSLATION_MODEL, max_concurrency=MAX_CONCURRENCY,
+                 max_chunk_tokens=MAX_CHUNK_TOKENS, wrap_fn=None, source_lang=None,
+                 translation_memory=None, budget=None, timeline=None, llm_client=None):
+        self.api_key = api_key
+        self.target_lang_llm = target_lang_llm
+        self.system_message = system_message
+        self.base_url = base_url
+        self.model = model
+        self.endpoints = build_endpoints(base_url, model) # Podstawowy + TRANSLATION_FALLBACKS
+        self.budget = budget or TokenBudget()
+        # Zgłasza PromptBudgetError, jeśli komunikat systemowy nie zostawia miejsca na tekst
+        base_prompt_tokens = count_message_tokens(build_translation_messages("", target_lang_llm, system_message))
+        self.max_chunk_tokens = self.budget.max_chunk_tokens(base_prompt_tokens, max_chunk_tokens)
+        self.wrap_fn = wrap_fn or (lambda stream: stream)
+        self.source_lang = source_lang
+        self.translation_memory = translation_memory
+        self.memory_hits = 0
+        self.memory_misses = 0
+        self.document_tokens = 0 # Tokeny tekstu źródłowego przekazanego do submit()
+        self.usage = [] # Rekord na każde zapytanie do API (patrz _translate_chunk)
+        self.timeline = timeline # Oś czasu zadania (telemetry.Timeline) lub None
+
+        self._futures = [] # (future zapytania, kolejka wyników fragmentu)
+        self._closed = False
+        self._llm = llm_client or get_llm_client() # Wspólna pętla i połączenia HTTP procesu
+        self._run(self._setup(max(1, max_concurrency))).result()
+
+    def _run(self, coro):
+        return self._llm.run(coro)
+
+    async def _setup(self, max_concurrency):
+        # Semafor tworzony wewnątrz pętli, w której będzie używany (limit na tłumacza)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _translate_chunk(self, text, out_queue, served):
+        """Tłumaczy jeden fragment, przekazując kolejne zdarzenia strumienia do kolejki."""
+        messages = build_translation_messages(text, self.target_lang_llm, self.system_message)
+        record = {
+            "request": len(self.usage) + 1, "model": self.model, "status": "ok", "error": None,
+            "prompt_tokens": count_message_tokens(messages), "completion_tokens": None,
+            "usage_source": "estimate", "tokenizer": tokenizer_name(),
+            "finish_reason": None, "latency_s": None, "ttft_s": None, "tokens_per_s": None,
+            "attempts": 0, "retries": 0, "failovers": 0, "hedged": False,
+        }
+        self.usage.append(record)
+        completion = []
+        first_token_at = None
+        try:
+            self.budget.check_prompt(record["prompt_tokens"])
+            # Semafor jest FIFO, więc fragmenty startują w kolejności dokumentu
+            async with self._semaphore:
+                started = time.perf_counter()
+                extra = {"stream_options": {"include_usage": True}} if STREAM_USAGE else {}
+                stats = {}
+                try:
+                    endpoint, stream, events = await self._llm.open_stream(
+                        self.api_key, self.endpoints, messages, stats, temperature=0.1, top_p=0.95, **extra)
+                finally:
+                    record.update(stats) # Próby, ponowienia, failover, hedging
+                record["model"] = served["model"] = endpoint[1]
+                try:
+                    async for event in events:
+                        usage = getattr(event, "usage", None)
+                        if usage is not None:
+                            # Ostatnie zdarzenie z faktycznym zużyciem tokenów według API
+                            record.update(prompt_tokens=usage.prompt_tokens,
+                                          completion_tokens=usage.completion_tokens, usage_source="api")
+                        if not getattr(event, "choices", None):
+                            continue # Zdarzenie tylko z zużyciem - nie przekazujemy go dalej
+                        record["finish_reason"] = event.choices[0].finish_reason or record["finish_reason"]
+                        completion.append(event_text(event))
+                        if first_token_at is None and completion[-1]:
+                            first_token_at = time.perf_counter()
+                        out_queue.put(event)
+                finally:
+                    await stream.close() # Zwraca połączenie do puli także po anulowaniu
+        except asyncio.CancelledError:
+            record["status"] = "cancelled" # close() tłumacza - np. anulowane zadanie
+            raise
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+            out_queue.put(e)
+        finally:
+            if record["usage_source"] == "estimate":
+                record["completion_tokens"] = count_tokens("".join(completion))
+            if record["status"] == "ok":
+                self._record_timings(record, started, first_token_at)
+            TOKENS.inc(record["prompt_tokens"] or 0, kind="prompt")
+            TOKENS.inc(record["completion_tokens"] or 0, kind="completion")
+            REQUESTS.inc(status=record["status"])
+            level = logging.WARNING if record["status"] != "ok" or record["finish_reason"] == "length" else logging.INFO
+            log_event(logger, "translation_request", level=level, target_lang=self.target_lang_llm, **record)
+            served["finish_reason"] = record["finish_reason"]
+            out_queue.put(_END)
+
+    def _record_timings(self, record, started, first_token_at):
+        """Czas całkowity, czas do pierwszego tokenu (TTFT) i szybkość generowania zapytania."""
+        now = time.perf_counter()
+        record["latency_s"] = round(now - started, 3)
+        observe("translate", now - started, self.timeline, request=record["request"])
+        if first_token_at is None:
+            return
+        record["ttft_s"] = round(first_token_at - started, 3)
+        observe("ttft", first_token_at - started, self.timeline, end=first_token_at, request=record["request"])
+        if record["completion_tokens"] and now > first_token_at:
+            rate = record["completion_tokens"] / (now - first_token_at)
+            record["tokens_per_s"] = round(rate, 1)
+            TOKENS_PER_SECOND.observe(rate)
+
+    @staticmethod
+    def _iter_queue(out_queue):
+        while True:
+            item = out_queue.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def submit(self, text, outcome=None):
+        """Dzieli tekst na fragmenty i od razu planuje ich tłumaczenie (bezpieczne dla wątków).
+
+        Zwraca generator zdarzeń strumienia w kolejności fragmentów; fragmenty
+        oddzielone są separatorem akapitu. text może być listą tekstów stron. Opcjonalny
+        słownik outcome jest uzupełniany w trakcie strumienia: outcome["models"] - modele,
+        które przetłumaczyły fragmenty, outcome["truncated"] - czy któraś odpowiedź została
+        ucięta limitem tokenów modelu, outcome["chunks"] - pary (części fragmentu jak
+        w split_pages_into_chunks, tłumaczenie) dla fragmentów oddanych do tej pory.
+        """
+        self.document_tokens += count_tokens(text if isinstance(text, str) else "\n\n".join(text))
+        self.budget.check_document(self.document_tokens) # Limit kosztu całego dokumentu
+        parts = []
+        for chunk, pages in split_pages_into_chunks(text, self.max_chunk_tokens):
+            key = self._memory_key(chunk)
+            cached = self.translation_memory.get(key) if key else None
+            if cached is not None:
+                self.memory_hits += 1
+                parts.append((chunk, pages, key, cached))
+                continue
+            self.memory_misses += 1
+            out_queue = queue.Queue()
+            served = {} # Model, który faktycznie przetłumaczył fragment (po failoverze może być inny)
+            self._futures.append((self._run(self._translate_chunk(chunk, out_queue, served)), out_queue))
+            parts.append((chunk, pages, key, (out_queue, served)))
+        return self._iter_chunks(parts, outcome if outcome is not None else {})
+
+    def _memory_key(self, chunk):
+        if self.translation_memory is None:
+            return None
+        return segment_key(chunk, self.source_lang, self.target_lang_llm, self.model, self.system_message)
+
+    def _iter_chunks(self, parts, outcome):
+        models = outcome.setdefault("models", set())
+        outcome.setdefault("truncated", False)
+        chunks = outcome.setdefault("chunks", [])
+        for i, (chunk, pages, key, source) in enumerate(parts):
+            if i:
+                yield "\n\n"
+            if isinstance(source, str):
+                # Trafienie w pamięci tłumaczeń - tekst jest już po wrap_fn
+                models.add(self.model)
+                yield source
+                chunks.append((pages, source))
+                continue
+            out_queue, served = source
+            translated = []
+            for event in timed_wrap(self.wrap_fn, self._iter_queue(out_queue), timeline=self.timeline):
+                translated.append(event_text(event))
+                yield event
+            models.add(served.get("model"))
+            chunks.append((pages, "".join(translated)))
+            truncated = served.get("finish_reason") == "length"
+            outcome["truncated"] = outcome["truncated"] or truncated
+            # Zapisujemy dopiero kompletne tłumaczenie (błąd strumienia przerywa przed zapisem,
+            # odpowiedź uciętą limitem tokenów pomijamy); tłumaczenia z modelu zapasowego
+            # nie trafiają pod klucz modelu podstawowego
+            if key and not truncated and served.get("model") == self.model:
+                self.translation_memory.put(key, chunk, "".join(translated), self.source_lang,
+                                            self.target_lang_llm, self.model)
+
+    def translate_stream(self, text):
+        """Tłumaczy cały tekst i zamyka tłumacza po skonsumowaniu strumienia."""
+        try:
+            yield from self.submit(text)
+        finally:
+            self.close()
+
+    def close(self):
+        """Anuluje niedokończone fragmenty (klient API i jego połączenia zostają dla kolejnych tłumaczeń).
+
+        Korutyna anulowana przed startem nie dochodzi do finally, więc nie zamknęłaby kolejki -
+        każdy niedokończony fragment dostaje TranslationCancelled, a jego odbiorca kończy
+        strumień błędem zamiast czekać bez końca (i nie zapisuje częściowego tłumaczenia).
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for future, out_queue in self._futures:
+            if not future.done():
+                future.cancel()
+                out_queue.put(TranslationCancelled("Tłumaczenie przerwane (close)"))